@@ -1,7 +1,12 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import Depends
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 
 
 def get_db_dep(db: Session = Depends(get_db)):
     return db
+
+
+def get_async_db_dep(db: AsyncSession = Depends(get_async_db)):
+    return db
@@ -1 +1 @@
-from . import chat, sessions, setup, tts, metrics, users  # noqa
+from . import chat, sessions, setup, tts, metrics, users, ops  # noqa
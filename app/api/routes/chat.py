@@ -1,115 +1,365 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import json
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-from app.api.deps import get_db_dep
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_async_db_dep
 from app.db import models
+from app.db.session import AsyncSessionLocal
 from app.schemas.chat import (
     GeneralChatRequest,
     SessionChatRequest,
     ChatMessageOut,
     ChatResponse,
+    ChatAudioStatus,
 )
 from app.db.models import ChatType
-from app.services.llm import generate_arnold_response
-from app.services.elevenlabs_client import tts_generate_audio_url
+from app.services.llm import (
+    FALLBACK_RESPONSE,
+    generate_arnold_response,
+    is_fallback_response,
+    stream_arnold_response,
+)
+from app.services.chat_context import (
+    build_chat_context,
+    build_standalone_context,
+    has_conversation_history,
+    profile_block,
+)
+from app.services.elevenlabs_client import tts_cached_audio_url, tts_is_configured
+from app.services.response_cache import is_standalone_question, response_cache
 from app.services.session_coach import adjust_session_based_on_feedback
+from app.services.tts_cache import tts_cache
+from app.services.tts_jobs import (
+    TTS_PENDING,
+    TTS_READY,
+    TTS_UNAVAILABLE,
+    tts_jobs,
+)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Cuánto espera el stream SSE al audio antes de cerrar con status "pending"
+_STREAM_AUDIO_WAIT_SECONDS = 60.0
+
+
+async def _get_user_or_404(db: AsyncSession, user_id: int) -> models.User:
+    user = await db.get(models.User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+async def _get_session_or_404(db: AsyncSession, session_id: int, user_id: int) -> models.WorkoutSession:
+    session = await db.get(models.WorkoutSession, session_id)
+    # la sesión de otro usuario responde igual que una que no existe
+    if not session or session.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+async def _save_message(
+    db: AsyncSession,
+    user_id: int,
+    session_id: Optional[int],
+    chat_type: ChatType,
+    role: str,
+    text: str,
+    audio_url: Optional[str] = None,
+) -> models.ChatMessage:
+    """
+    Guarda un mensaje del chat. Lo usan tanto las rutas normales como las de streaming,
+    así ambas persisten exactamente lo mismo.
+    id y timestamp se llenan en el flush: con expire_on_commit=False no hace falta refresh.
+    """
+    msg = models.ChatMessage(
+        user_id=user_id,
+        session_id=session_id,
+        chat_type=chat_type,
+        role=role,
+        text=text,
+        audio_url=audio_url,
+    )
+    db.add(msg)
+    await db.commit()
+    return msg
+
+
+async def _save_arnold_reply(
+    db: AsyncSession,
+    user_id: int,
+    session_id: Optional[int],
+    chat_type: ChatType,
+    text: str,
+) -> Tuple[models.ChatMessage, str]:
+    """
+    Guarda la respuesta de Arnold sin esperar al TTS:
+    - si el audio ya está en caché, se guarda directamente (status "ready"),
+    - si no, se encola la síntesis en segundo plano (status "pending").
+    """
+    audio_url = await tts_cached_audio_url(text)
+    arnold_msg = await _save_message(db, user_id, session_id, chat_type, "arnold", text, audio_url)
+
+    if audio_url:
+        return arnold_msg, TTS_READY
+    if not tts_is_configured():
+        return arnold_msg, TTS_UNAVAILABLE
+
+    job = tts_jobs.enqueue(arnold_msg.id, text)
+    return arnold_msg, TTS_PENDING if job else TTS_UNAVAILABLE
+
+
+async def _cacheable_profile(db: AsyncSession, user: models.User, question: str) -> Optional[str]:
+    """
+    Perfil con el que se busca y guarda la respuesta en response_cache, o None si no se cachea:
+    una continuación ("sí", "¿y mañana?") con historial previo depende de la conversación.
+    Se llama antes de guardar el mensaje del usuario.
+    """
+    if not response_cache.is_cacheable(question):
+        return None
+    if not is_standalone_question(question) and await db.run_sync(
+        has_conversation_history, user.id, ChatType.GENERAL
+    ):
+        return None
+    return profile_block(user)
+
+
+async def _general_context(
+    db: AsyncSession, user: models.User, question: str, cache_profile: Optional[str]
+) -> List[Dict[str, str]]:
+    if cache_profile is None:
+        # Perfil + historial reciente (dentro del presupuesto de tokens) + resumen de lo viejo
+        return await db.run_sync(build_chat_context, user, ChatType.GENERAL)
+    # la respuesta va al caché: sin historial, y en el caché global sin el perfil de nadie
+    return build_standalone_context(user, question, include_profile=not response_cache.shared_across_users)
+
+
+def _sse(event: str, data) -> str:
+    """
+    Formatea un evento server-sent events.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _stream_arnold_reply(
+    user_id: int,
+    session_id: Optional[int],
+    chat_type: ChatType,
+    messages: List[Dict[str, str]],
+    cached_text: Optional[str] = None,
+    cache_as: Optional[Tuple[str, str]] = None,
+) -> AsyncIterator[str]:
+    """
+    Eventos que recibe el cliente:
+    - token: trozos de texto del LLM a medida que llegan (un solo token si venía del caché)
+    - message: el ChatMessage de Arnold ya guardado (audio_url puede estar vacío)
+    - audio: status y audio_url cuando termina el job TTS (o null)
+    - done / error
+    cache_as: (perfil, pregunta) con que se guarda la respuesta en response_cache (None = no se guarda).
+    """
+    mode = "general" if chat_type == ChatType.GENERAL else "session"
+
+    if cached_text is not None:
+        arnold_text = cached_text
+        yield _sse("token", {"text": cached_text})
+    else:
+        parts = []
+        started = time.perf_counter()
+        try:
+            async for token in stream_arnold_response(messages=messages, mode=mode):
+                parts.append(token)
+                yield _sse("token", {"text": token})
+        except Exception as e:
+            yield _sse("error", {"detail": f"LLM error: {e}"})
+            return
+
+        arnold_text = "".join(parts) or FALLBACK_RESPONSE
+        if cache_as is not None and not is_fallback_response(arnold_text):
+            profile, question = cache_as
+            response_cache.store(user_id, profile, question, arnold_text, time.perf_counter() - started)
+
+    # La sesión de la request ya se cerró cuando empieza el stream,
+    # así que usamos una propia para guardar la respuesta.
+    async with AsyncSessionLocal() as db:
+        arnold_msg, audio_status = await _save_arnold_reply(
+            db, user_id, session_id, chat_type, arnold_text
+        )
+    message_id, audio_url = arnold_msg.id, arnold_msg.audio_url
+    yield _sse("message", ChatMessageOut.model_validate(arnold_msg).model_dump(mode="json"))
+
+    if audio_status == TTS_PENDING:
+        job = await tts_jobs.wait(message_id, _STREAM_AUDIO_WAIT_SECONDS)
+        if job:
+            audio_status, audio_url = job.status, job.audio_url
+    yield _sse(
+        "audio",
+        {"message_id": message_id, "status": audio_status, "audio_url": audio_url},
+    )
+
+    yield _sse("done", {})
+
+
+def _event_stream_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @router.post("/general", response_model=ChatResponse)
 async def general_chat(
     payload: GeneralChatRequest,
-    db: Session = Depends(get_db_dep),
+    db: AsyncSession = Depends(get_async_db_dep),
 ):
-    user = db.query(models.User).filter(models.User.id == payload.user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = await _get_user_or_404(db, payload.user_id)
+    cache_profile = await _cacheable_profile(db, user, payload.text)
 
     # Guardamos el mensaje del usuario
-    user_msg = models.ChatMessage(
-        user_id=user.id,
-        session_id=None,
-        chat_type=ChatType.GENERAL,
-        role="user",
-        text=payload.text,
+    await _save_message(db, user.id, None, ChatType.GENERAL, "user", payload.text)
+
+    # Preguntas frecuentes que abren la conversación: respuesta (y audio) del caché sin llamar al LLM
+    arnold_text = (
+        response_cache.lookup(user.id, cache_profile, payload.text) if cache_profile is not None else None
     )
-    db.add(user_msg)
-    db.commit()
-    db.refresh(user_msg)
-
-    # Para el MVP, enviamos solo el mensaje actual al LLM
-    arnold_text = await generate_arnold_response(
-        messages=[{"role": "user", "content": payload.text}],
-        mode="general",
+    if arnold_text is None:
+        started = time.perf_counter()
+        messages = await _general_context(db, user, payload.text, cache_profile)
+        # cerrar la transacción de lectura devuelve la conexión al pool mientras el LLM responde
+        await db.commit()
+        arnold_text = await generate_arnold_response(messages=messages, mode="general")
+        if cache_profile is not None and not is_fallback_response(arnold_text):
+            response_cache.store(
+                user.id, cache_profile, payload.text, arnold_text, time.perf_counter() - started
+            )
+
+    arnold_msg, audio_status = await _save_arnold_reply(
+        db, user.id, None, ChatType.GENERAL, arnold_text
+    )
+
+    return ChatResponse(
+        message=ChatMessageOut.model_validate(arnold_msg),
+        audio_status=audio_status,
     )
 
-    audio_url = await tts_generate_audio_url(arnold_text)
 
-    arnold_msg = models.ChatMessage(
-        user_id=user.id,
-        session_id=None,
-        chat_type=ChatType.GENERAL,
-        role="arnold",
-        text=arnold_text,
-        audio_url=audio_url,
+@router.post("/general/stream")
+async def general_chat_stream(
+    payload: GeneralChatRequest,
+    db: AsyncSession = Depends(get_async_db_dep),
+):
+    """
+    Variante SSE de /chat/general: los tokens llegan mientras el LLM los genera.
+    """
+    user = await _get_user_or_404(db, payload.user_id)
+    cache_profile = await _cacheable_profile(db, user, payload.text)
+
+    await _save_message(db, user.id, None, ChatType.GENERAL, "user", payload.text)
+    cached_text = (
+        response_cache.lookup(user.id, cache_profile, payload.text) if cache_profile is not None else None
+    )
+    messages = (
+        [] if cached_text is not None
+        else await _general_context(db, user, payload.text, cache_profile)
     )
-    db.add(arnold_msg)
-    db.commit()
-    db.refresh(arnold_msg)
+    # get_async_db cierra la sesión recién al terminar la respuesta: la liberamos ya
+    # para no tener una conexión del pool tomada mientras dura el stream
+    await db.close()
 
-    return ChatResponse(message=ChatMessageOut.model_validate(arnold_msg))
+    return _event_stream_response(
+        _stream_arnold_reply(
+            user.id,
+            None,
+            ChatType.GENERAL,
+            messages,
+            cached_text=cached_text,
+            cache_as=(cache_profile, payload.text) if cache_profile is not None else None,
+        )
+    )
 
 
 @router.post("/session", response_model=ChatResponse)
 async def session_chat(
     payload: SessionChatRequest,
-    db: Session = Depends(get_db_dep),
+    db: AsyncSession = Depends(get_async_db_dep),
 ):
-    user = db.query(models.User).filter(models.User.id == payload.user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    session = (
-        db.query(models.WorkoutSession)
-        .filter(models.WorkoutSession.id == payload.session_id)
-        .first()
-    )
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    user = await _get_user_or_404(db, payload.user_id)
+    session = await _get_session_or_404(db, payload.session_id, user.id)
 
     # Guardamos mensaje del usuario
-    user_msg = models.ChatMessage(
-        user_id=user.id,
-        session_id=session.id,
-        chat_type=ChatType.SESSION,
-        role="user",
-        text=payload.text,
-    )
-    db.add(user_msg)
-    db.commit()
-    db.refresh(user_msg)
+    await _save_message(db, user.id, session.id, ChatType.SESSION, "user", payload.text)
 
     # Aplicar lógica de ajuste de sesión según feedback
-    adjust_session_based_on_feedback(db, session, payload.text)
+    await db.run_sync(adjust_session_based_on_feedback, session, payload.text)
 
-    arnold_text = await generate_arnold_response(
-        messages=[{"role": "user", "content": payload.text}],
-        mode="session",
+    # el contexto se arma después del ajuste, así Arnold ve los pesos ya corregidos
+    messages = await db.run_sync(build_chat_context, user, ChatType.SESSION, session)
+    await db.commit()
+    arnold_text = await generate_arnold_response(messages=messages, mode="session")
+
+    arnold_msg, audio_status = await _save_arnold_reply(
+        db, user.id, session.id, ChatType.SESSION, arnold_text
     )
 
-    audio_url = await tts_generate_audio_url(arnold_text)
+    return ChatResponse(
+        message=ChatMessageOut.model_validate(arnold_msg),
+        audio_status=audio_status,
+    )
 
-    arnold_msg = models.ChatMessage(
-        user_id=user.id,
-        session_id=session.id,
-        chat_type=ChatType.SESSION,
-        role="arnold",
-        text=arnold_text,
-        audio_url=audio_url,
+
+@router.post("/session/stream")
+async def session_chat_stream(
+    payload: SessionChatRequest,
+    db: AsyncSession = Depends(get_async_db_dep),
+):
+    """
+    Variante SSE de /chat/session. El ajuste de la sesión se aplica antes de empezar a streamear.
+    """
+    user = await _get_user_or_404(db, payload.user_id)
+    session = await _get_session_or_404(db, payload.session_id, user.id)
+
+    await _save_message(db, user.id, session.id, ChatType.SESSION, "user", payload.text)
+
+    await db.run_sync(adjust_session_based_on_feedback, session, payload.text)
+    messages = await db.run_sync(build_chat_context, user, ChatType.SESSION, session)
+    await db.close()
+
+    return _event_stream_response(
+        _stream_arnold_reply(user.id, session.id, ChatType.SESSION, messages)
     )
-    db.add(arnold_msg)
-    db.commit()
-    db.refresh(arnold_msg)
 
-    return ChatResponse(message=ChatMessageOut.model_validate(arnold_msg))
+
+@router.get("/messages/{message_id}/audio", response_model=ChatAudioStatus)
+async def get_message_audio(
+    message_id: int,
+    wait: float = Query(0, ge=0, le=30, description="Segundos a esperar si el audio sigue pendiente (long polling)"),
+    db: AsyncSession = Depends(get_async_db_dep),
+):
+    """
+    Estado del audio de un mensaje de Arnold. Con wait>0 la petición espera
+    a que termine el job TTS, así el cliente no tiene que hacer polling agresivo.
+    """
+    msg = await db.get(models.ChatMessage, message_id)
+    if not msg:
+        raise HTTPException(status_code=404, detail="Message not found")
+    # el long polling no necesita la BD: la conexión vuelve al pool
+    await db.close()
+
+    if msg.audio_url:
+        if await tts_cache.ahas_url(msg.audio_url):
+            return ChatAudioStatus(message_id=msg.id, status=TTS_READY, audio_url=msg.audio_url)
+        # el caché de audio desalojó el MP3: se vuelve a sintetizar (el job reescribe audio_url)
+        job = tts_jobs.get(message_id)
+        if job is None or job.status != TTS_PENDING:
+            job = tts_jobs.enqueue(msg.id, msg.text) if tts_is_configured() else None
+        if job is None:
+            return ChatAudioStatus(message_id=msg.id, status=TTS_UNAVAILABLE)
+
+    job = await tts_jobs.wait(message_id, wait)
+    if job is None:
+        return ChatAudioStatus(message_id=msg.id, status=TTS_UNAVAILABLE)
+
+    return ChatAudioStatus(message_id=msg.id, status=job.status, audio_url=job.audio_url)
@@ -1,46 +1,35 @@
 # app/api/routes/metrics.py
-from datetime import datetime, timedelta
-from typing import Dict, List
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db_dep
+from app.api.deps import get_async_db_dep
 from app.db import models
+from app.services.exercise_catalog import exercise_catalog
+from app.services.rollups import (
+    get_best_e1rm_per_day,
+    get_muscle_group_totals,
+    get_sessions_per_iso_week,
+    get_total_volume,
+)
+from app.services.training_stats import get_session_counts
 
 router = APIRouter(prefix="/users", tags=["metrics"])
 
 
-def _get_user_or_404(db: Session, user_id: int) -> models.User:
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def _get_user_or_404(db: AsyncSession, user_id: int) -> models.User:
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
-def _compute_set_volume(workout_set: models.WorkoutSet) -> float:
-    """
-    Volumen simple de un set:
-    - Si hay peso (actual o target): weight * reps.
-    - Si no hay peso (ej. flexiones): usamos solo reps.
-    """
-    reps = workout_set.actual_reps or workout_set.target_reps or 0
-    weight = workout_set.actual_weight or workout_set.target_weight
-
-    if reps is None or reps <= 0:
-        return 0.0
-
-    if weight is None:
-        # bodyweight u otros sin peso explícito: tomamos reps como volumen
-        return float(reps)
-
-    return float(weight) * float(reps)
-
-
 # ---------------- Stats generales ----------------
 
 @router.get("/{user_id}/stats")
-async def get_user_stats(user_id: int, db: Session = Depends(get_db_dep)):
+async def get_user_stats(user_id: int, db: AsyncSession = Depends(get_async_db_dep)):
     """
     Stats generales del usuario:
     - total_sessions
@@ -49,38 +38,25 @@ async def get_user_stats(user_id: int, db: Session = Depends(get_db_dep)):
     - total_volume (solo sesiones completadas)
     - last_session_date
     """
-    _get_user_or_404(db, user_id)
+    await _get_user_or_404(db, user_id)
 
-    sessions = (
-        db.query(models.WorkoutSession)
-        .filter(models.WorkoutSession.user_id == user_id)
-        .all()
+    # Los helpers de training_stats / rollups son sync: run_sync los corre
+    # sobre la misma conexión async, sin bloquear el event loop
+    total_sessions, completed_sessions, last_session_date = await db.run_sync(
+        get_session_counts, user_id
     )
 
-    total_sessions = len(sessions)
-    completed_sessions = [
-        s for s in sessions if s.status == models.SessionStatus.COMPLETED
-    ]
-
-    # Volumen total de sesiones completadas
-    total_volume = 0.0
-    last_session_date = None
-
-    for s in completed_sessions:
-        if s.started_at and (last_session_date is None or s.started_at > last_session_date):
-            last_session_date = s.started_at
-
-        for wset in s.sets:
-            total_volume += _compute_set_volume(wset)
+    # Volumen total de sesiones completadas (rollups)
+    total_volume = await db.run_sync(get_total_volume, user_id)
 
     completion_rate = (
-        len(completed_sessions) / total_sessions if total_sessions > 0 else 0.0
+        completed_sessions / total_sessions if total_sessions > 0 else 0.0
     )
 
     return {
         "user_id": user_id,
         "total_sessions": total_sessions,
-        "completed_sessions": len(completed_sessions),
+        "completed_sessions": completed_sessions,
         "completion_rate": completion_rate,
         "total_volume": total_volume,
         "last_session_date": last_session_date,
@@ -90,72 +66,50 @@ async def get_user_stats(user_id: int, db: Session = Depends(get_db_dep)):
 # ---------------- Progreso de fuerza ----------------
 
 @router.get("/{user_id}/strength-progression")
-async def get_strength_progression(user_id: int, db: Session = Depends(get_db_dep)):
+async def get_strength_progression(
+    user_id: int,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    exercise_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db_dep),
+):
     """
     Progreso de fuerza estimado por ejercicio, usando 1RM estimado:
     1RM ≈ peso * (1 + reps/30)
-    Se toma el mejor set de cada sesión por ejercicio.
+    Se toma el mejor set de cada día por ejercicio (rollups de sesiones completadas).
+    Filtros opcionales: from / to (fechas, inclusivas) y exercise_id.
     """
-    _get_user_or_404(db, user_id)
-
-    # Sets con peso y reps de sesiones completadas
-    sessions = (
-        db.query(models.WorkoutSession)
-        .filter(
-            models.WorkoutSession.user_id == user_id,
-            models.WorkoutSession.status == models.SessionStatus.COMPLETED,
-        )
-        .all()
-    )
+    await _get_user_or_404(db, user_id)
 
     # exercise_id -> { "name": ..., "points": [ {date, est_1rm}, ... ] }
     progression: Dict[int, Dict] = {}
 
-    for session in sessions:
-        if not session.started_at:
-            continue
-
-        # Para cada sesión, queremos el mejor set por ejercicio
-        # ejercicio -> mejor 1RM en esa sesión
-        best_in_session: Dict[int, float] = {}
-
-        for wset in session.sets:
-            # necesitamos reps y peso reales o target
-            reps = wset.actual_reps or wset.target_reps
-            weight = wset.actual_weight or wset.target_weight
-
-            if not reps or not weight or reps <= 0 or weight <= 0:
-                continue
-
-            est_1rm = float(weight) * (1.0 + float(reps) / 30.0)
-
-            current_best = best_in_session.get(wset.exercise_id)
-            if current_best is None or est_1rm > current_best:
-                best_in_session[wset.exercise_id] = est_1rm
-
-        # Registrar en progression
-        for ex_id, best_1rm in best_in_session.items():
-            ex = db.query(models.Exercise).filter(models.Exercise.id == ex_id).first()
-            if not ex:
-                continue
-
-            if ex_id not in progression:
-                progression[ex_id] = {
-                    "exercise_id": ex_id,
-                    "exercise_name": ex.name,
-                    "data": [],
-                }
+    rows = await db.run_sync(
+        lambda sync_db: get_best_e1rm_per_day(
+            sync_db,
+            user_id,
+            date_from=date_from,
+            date_to=date_to,
+            exercise_id=exercise_id,
+        )
+    )
 
-            progression[ex_id]["data"].append(
-                {
-                    "date": session.started_at,
-                    "estimated_1rm": best_1rm,
-                }
-            )
+    # Las filas ya vienen ordenadas por ejercicio y fecha
+    for day, ex_id, best_1rm in rows:
+        if ex_id not in progression:
+            ex = await db.run_sync(exercise_catalog.get, ex_id)
+            progression[ex_id] = {
+                "exercise_id": ex_id,
+                "exercise_name": ex.name if ex else None,
+                "data": [],
+            }
 
-    # Ordenar por fecha cada serie
-    for ex_id in progression:
-        progression[ex_id]["data"].sort(key=lambda p: p["date"])
+        progression[ex_id]["data"].append(
+            {
+                "date": day,
+                "estimated_1rm": best_1rm,
+            }
+        )
 
     return {
         "user_id": user_id,
@@ -166,38 +120,20 @@ async def get_strength_progression(user_id: int, db: Session = Depends(get_db_de
 # ---------------- Consistencia semanal ----------------
 
 @router.get("/{user_id}/consistency-analysis")
-async def get_consistency_analysis(user_id: int, db: Session = Depends(get_db_dep)):
+async def get_consistency_analysis(user_id: int, db: AsyncSession = Depends(get_async_db_dep)):
     """
     Analiza consistencia en las últimas 6 semanas:
-    - sesiones por semana (usando ISO week)
+    - sesiones completadas por semana (usando ISO week)
     - promedio semanal
     - etiqueta: 'low', 'medium', 'high'
     """
-    _get_user_or_404(db, user_id)
+    await _get_user_or_404(db, user_id)
 
     today = datetime.utcnow().date()
     cutoff = today - timedelta(weeks=6)
 
-    sessions = (
-        db.query(models.WorkoutSession)
-        .filter(
-            models.WorkoutSession.user_id == user_id,
-            models.WorkoutSession.started_at.isnot(None),
-            models.WorkoutSession.started_at >= datetime.combine(cutoff, datetime.min.time()),
-        )
-        .all()
-    )
-
     # (year, week) -> count
-    per_week: Dict[tuple, int] = {}
-
-    for s in sessions:
-        if not s.started_at:
-            continue
-        dt = s.started_at.date()
-        iso = dt.isocalendar()  # (year, week, weekday)
-        key = (iso.year, iso.week)
-        per_week[key] = per_week.get(key, 0) + 1
+    per_week = await db.run_sync(get_sessions_per_iso_week, user_id, cutoff)
 
     # Convertir a lista ordenada
     weeks_data = []
@@ -207,7 +143,7 @@ async def get_consistency_analysis(user_id: int, db: Session = Depends(get_db_de
         )
 
     num_weeks = len(weeks_data) if weeks_data else 0
-    total_sessions = len(sessions)
+    total_sessions = sum(per_week.values())
     avg_sessions = total_sessions / num_weeks if num_weeks > 0 else 0.0
 
     if avg_sessions >= 4:
@@ -230,51 +166,30 @@ async def get_consistency_analysis(user_id: int, db: Session = Depends(get_db_de
 # ---------------- Frecuencia por grupo muscular ----------------
 
 @router.get("/{user_id}/muscle-group-frequency")
-async def get_muscle_group_frequency(user_id: int, db: Session = Depends(get_db_dep)):
+async def get_muscle_group_frequency(user_id: int, db: AsyncSession = Depends(get_async_db_dep)):
     """
     Frecuencia de entrenamiento por grupo muscular en los últimos 28 días.
-    Cuenta en cuántas sesiones apareció cada grupo muscular.
+    Cuenta en cuántas sesiones completadas apareció cada grupo muscular.
     """
-    _get_user_or_404(db, user_id)
+    await _get_user_or_404(db, user_id)
 
     today = datetime.utcnow().date()
     cutoff = today - timedelta(days=28)
 
-    # Traer sets + session + exercise en la ventana
-    sessions = (
-        db.query(models.WorkoutSession)
-        .filter(
-            models.WorkoutSession.user_id == user_id,
-            models.WorkoutSession.started_at.isnot(None),
-            models.WorkoutSession.started_at >= datetime.combine(cutoff, datetime.min.time()),
-        )
-        .all()
-    )
-
-    # muscle_group -> set(session_ids)
-    mg_sessions: Dict[str, set] = {}
-
-    for s in sessions:
-        for wset in s.sets:
-            ex = wset.exercise
-            if not ex:
-                continue
-            mg = ex.muscle_group or "unknown"
-            if mg not in mg_sessions:
-                mg_sessions[mg] = set()
-            mg_sessions[mg].add(s.id)
+    # muscle_group -> (nº de sesiones, volumen), desde los rollups
+    mg_totals = await db.run_sync(get_muscle_group_totals, user_id, cutoff)
 
     results = []
-    for mg, sess_ids in mg_sessions.items():
+    for mg, (count, _volume) in mg_totals.items():
         results.append(
             {
                 "muscle_group": mg,
-                "sessions_count": len(sess_ids),
+                "sessions_count": count,
             }
         )
 
     # ordenar por sesiones descendente
-    results.sort(key=lambda x: x["sessions_count"], reverse=True)
+    results.sort(key=lambda x: (-x["sessions_count"], x["muscle_group"]))
 
     return {
         "user_id": user_id,
@@ -286,38 +201,19 @@ async def get_muscle_group_frequency(user_id: int, db: Session = Depends(get_db_
 # ---------------- Volumen por grupo muscular ----------------
 
 @router.get("/{user_id}/volume-analysis")
-async def get_volume_analysis(user_id: int, db: Session = Depends(get_db_dep)):
+async def get_volume_analysis(user_id: int, db: AsyncSession = Depends(get_async_db_dep)):
     """
     Análisis de volumen de entrenamiento por grupo muscular en los últimos 28 días.
     - volumen = peso * reps (o solo reps si no hay peso)
     - porcentaje relativo de volumen por grupo muscular
     """
-    _get_user_or_404(db, user_id)
+    await _get_user_or_404(db, user_id)
 
     today = datetime.utcnow().date()
     cutoff = today - timedelta(days=28)
 
-    sessions = (
-        db.query(models.WorkoutSession)
-        .filter(
-            models.WorkoutSession.user_id == user_id,
-            models.WorkoutSession.started_at.isnot(None),
-            models.WorkoutSession.started_at >= datetime.combine(cutoff, datetime.min.time()),
-            models.WorkoutSession.status == models.SessionStatus.COMPLETED,
-        )
-        .all()
-    )
-
-    mg_volume: Dict[str, float] = {}
-
-    for s in sessions:
-        for wset in s.sets:
-            ex = wset.exercise
-            if not ex:
-                continue
-            mg = ex.muscle_group or "unknown"
-            vol = _compute_set_volume(wset)
-            mg_volume[mg] = mg_volume.get(mg, 0.0) + vol
+    mg_totals = await db.run_sync(get_muscle_group_totals, user_id, cutoff)
+    mg_volume = {mg: volume for mg, (_count, volume) in mg_totals.items()}
 
     total_volume = sum(mg_volume.values()) or 0.0
 
@@ -333,7 +229,7 @@ async def get_volume_analysis(user_id: int, db: Session = Depends(get_db_dep)):
         )
 
     # ordenar por volumen
-    results.sort(key=lambda x: x["volume"], reverse=True)
+    results.sort(key=lambda x: (-x["volume"], x["muscle_group"]))
 
     return {
         "user_id": user_id,
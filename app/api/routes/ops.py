@@ -0,0 +1,49 @@
+from fastapi import APIRouter
+
+from app.db.session import (
+    SQLITE_SINGLE_WRITER,
+    async_pool_stats,
+    async_writer_pool_stats,
+    sync_pool_stats,
+    sync_writer_pool_stats,
+)
+from app.services.chat_context import summary_cache
+from app.services.elevenlabs_client import tts_resilience
+from app.services.exercise_catalog import exercise_catalog
+from app.services.llm import llm_resilience
+from app.services.plan_cache import plan_cache
+from app.services.rate_limit import llm_rate_limit, tts_rate_limit
+from app.services.response_cache import response_cache
+from app.services.shared_state import shared_state_info
+from app.services.single_flight import llm_flights, tts_flights
+from app.services.tts_cache import tts_cache
+from app.services.tts_jobs import tts_jobs
+
+router = APIRouter(prefix="/ops", tags=["ops"])
+
+
+@router.get("/stats")
+def get_ops_stats():
+    """
+    Contadores internos del proceso (cachés, colas, etc.) para monitoreo.
+    """
+    db_pool = {"sync": sync_pool_stats.stats(), "async": async_pool_stats.stats()}
+    if SQLITE_SINGLE_WRITER:
+        db_pool.update(
+            sync_writer=sync_writer_pool_stats.stats(),
+            async_writer=async_writer_pool_stats.stats(),
+        )
+
+    return {
+        "tts_cache": tts_cache.stats(),
+        "tts_jobs": tts_jobs.stats(),
+        "plan_cache": plan_cache.stats(),
+        "exercise_catalog": exercise_catalog.stats(),
+        "chat_summaries": summary_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "resilience": {"llm": llm_resilience.stats(), "tts": tts_resilience.stats()},
+        "single_flight": {"llm": llm_flights.stats(), "tts": tts_flights.stats()},
+        "rate_limit": {"llm": llm_rate_limit.stats(), "tts": tts_rate_limit.stats()},
+        "shared_state": shared_state_info(),
+        "db_pool": db_pool,
+    }
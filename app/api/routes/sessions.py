@@ -7,8 +7,17 @@ from app.db import models
 from app.schemas.workout import (
     WorkoutSessionCreate,
     WorkoutSessionOut,
+    WorkoutSetResultsBatch,
+    WorkoutSetResultsOut,
+)
+from app.services.plan_cache import plan_cache
+from app.services.rollups import refresh_rollups_for_session
+from app.services.workout_sessions import (
+    InvalidSetResultsError,
+    OperationConflictError,
+    apply_set_results,
+    create_session_with_sets,
 )
-from app.services.planner import generate_session_plan_for_today
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
@@ -26,31 +35,11 @@ def create_session_auto(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    sets_plan = generate_session_plan_for_today(db, user)
-
-    session = models.WorkoutSession(
-        user_id=user.id,
-        status=models.SessionStatus.PLANNED,
-    )
-    db.add(session)
-    db.commit()
-    db.refresh(session)
-
-    # Crear sets
-    for s in sets_plan:
-        ws = models.WorkoutSet(
-            session_id=session.id,
-            exercise_id=s.exercise_id,
-            exercise_order=s.exercise_order,
-            set_number=s.set_number,
-            target_reps=s.target_reps,
-            target_weight=s.target_weight,
-        )
-        db.add(ws)
-    db.commit()
-    db.refresh(session)
+    # el plan de hoy solo cambia al completar una sesión: se sirve del caché
+    sets_plan = plan_cache.get_plan(db, user)
 
-    return WorkoutSessionOut.model_validate(session)
+    # sesión + sets en una transacción y un INSERT masivo
+    return create_session_with_sets(db, user.id, sets_plan)
 
 
 @router.post("/", response_model=WorkoutSessionOut)
@@ -65,31 +54,14 @@ def create_session_manual(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    session = models.WorkoutSession(
-        user_id=user.id,
-        status=models.SessionStatus.PLANNED,
+    return create_session_with_sets(
+        db,
+        user.id,
+        payload.sets,
         fatigue_before=payload.fatigue_before,
         sleep_hours_last_night=payload.sleep_hours_last_night,
         notes=payload.notes,
     )
-    db.add(session)
-    db.commit()
-    db.refresh(session)
-
-    for s in payload.sets:
-        ws = models.WorkoutSet(
-            session_id=session.id,
-            exercise_id=s.exercise_id,
-            exercise_order=s.exercise_order,
-            set_number=s.set_number,
-            target_reps=s.target_reps,
-            target_weight=s.target_weight,
-        )
-        db.add(ws)
-    db.commit()
-    db.refresh(session)
-
-    return WorkoutSessionOut.model_validate(session)
 
 
 @router.get("/{session_id}", response_model=WorkoutSessionOut)
@@ -115,9 +87,16 @@ def start_session(
     session = db.query(models.WorkoutSession).filter_by(id=session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
+    was_completed = session.status == models.SessionStatus.COMPLETED
+    previous_started_at = session.started_at
     session.status = models.SessionStatus.IN_PROGRESS
     session.started_at = datetime.utcnow()
+    if was_completed:
+        # re-abrir una sesión completada la saca de los rollups de su día
+        refresh_rollups_for_session(db, session, previous_started_at)
     db.commit()
+    if was_completed:
+        plan_cache.invalidate_user(session.user_id)
     db.refresh(session)
     return WorkoutSessionOut.model_validate(session)
 
@@ -132,6 +111,31 @@ def finish_session(
         raise HTTPException(status_code=404, detail="Session not found")
     session.status = models.SessionStatus.COMPLETED
     session.finished_at = datetime.utcnow()
+    refresh_rollups_for_session(db, session)
     db.commit()
+    plan_cache.invalidate_user(session.user_id)
     db.refresh(session)
     return WorkoutSessionOut.model_validate(session)
+
+
+@router.post("/{session_id}/sets/results", response_model=WorkoutSetResultsOut)
+def record_set_results(
+    session_id: int,
+    payload: WorkoutSetResultsBatch,
+    db: Session = Depends(get_db_dep),
+):
+    """
+    Registra en lote los resultados (reps, peso, RPE, comentario) de varios sets de la sesión.
+    Pensado para clientes offline: pueden reenviar el mismo lote con el mismo
+    operation_id sin que se aplique dos veces.
+    """
+    session = db.query(models.WorkoutSession).filter_by(id=session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    try:
+        return apply_set_results(db, session, payload)
+    except OperationConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except InvalidSetResultsError as e:
+        raise HTTPException(status_code=422, detail=str(e))
@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 
 from app.api.deps import get_db_dep
 from app.db import models
+from app.services.exercise_catalog import exercise_catalog
+from app.services.plan_cache import plan_cache
 
 router = APIRouter(prefix="/setup", tags=["setup"])
 
@@ -53,6 +55,10 @@ def seed_data(db: Session = Depends(get_db_dep)):
 
     if created:
         db.commit()
+        # el catálogo cambió: recargar la copia en memoria (en todos los workers) y
+        # descartar planes cacheados que pueden apuntar a otros ejercicios
+        exercise_catalog.changed(db)
+        plan_cache.invalidate_all()
 
     return {
         "message": "Seed completed",
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db_dep
-from app.services.elevenlabs_client import tts_generate_audio_url
-from app.core.config import settings
+from app.services.elevenlabs_client import (
+    tts_cached_audio_path,
+    tts_generate_audio_url,
+    tts_is_configured,
+    tts_open_audio_stream,
+)
 
 router = APIRouter(prefix="/tts", tags=["tts"])
 
@@ -22,7 +27,7 @@ async def tts_test(
     payload: TTSRequest,
     db: Session = Depends(get_db_dep),  # no lo usamos, pero mantiene la firma consistente
 ):
-    if not settings.ELEVENLABS_API_KEY or not settings.ELEVENLABS_VOICE_ID:
+    if not tts_is_configured():
         raise HTTPException(
             status_code=400,
             detail="ElevenLabs no está configurado. Revisa ELEVENLABS_API_KEY y ELEVENLABS_VOICE_ID en el .env",
@@ -36,3 +41,31 @@ async def tts_test(
         )
 
     return TTSResponse(audio_url=audio_url)
+
+
+
+@router.post("/stream")
+async def tts_stream(payload: TTSRequest):
+    """
+    Proxy de streaming: reenvía el MP3 de ElevenLabs al cliente a medida que llega,
+    y lo deja en el caché de /media para los replays.
+    Si el audio ya está en caché se sirve directo desde disco.
+    """
+    if not tts_is_configured():
+        raise HTTPException(
+            status_code=400,
+            detail="ElevenLabs no está configurado. Revisa ELEVENLABS_API_KEY y ELEVENLABS_VOICE_ID en el .env",
+        )
+
+    cached_path = await tts_cached_audio_path(payload.text)
+    if cached_path:
+        return FileResponse(cached_path, media_type="audio/mpeg")
+
+    chunks = await tts_open_audio_stream(payload.text)
+    if chunks is None:
+        raise HTTPException(
+            status_code=502,
+            detail="Falló el streaming de audio con ElevenLabs. Revisa logs del servidor.",
+        )
+
+    return StreamingResponse(chunks, media_type="audio/mpeg")
@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db_dep
+from app.api.deps import get_async_db_dep
 from app.db import models
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.get("/{user_id}")
-async def get_user_profile(user_id: int, db: Session = Depends(get_db_dep)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def get_user_profile(user_id: int, db: AsyncSession = Depends(get_async_db_dep)):
+    user = await db.get(models.User, user_id)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
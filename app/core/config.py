@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -10,14 +12,131 @@ class Settings(BaseSettings):
 
     PROJECT_NAME: str = "Arnold Coach API"
     DATABASE_URL: str = "sqlite:///./arnold.db"
+    # URL del engine async; por defecto DATABASE_URL con aiosqlite / asyncpg
+    ASYNC_DATABASE_URL: str | None = None
+    # Pool de conexiones (cada engine, sync y async, tiene el suyo)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # espera máxima por una conexión libre antes de fallar
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    # conexiones más viejas que esto se reabren al sacarlas del pool (-1 = nunca)
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    # SELECT 1 antes de entregar una conexión: descarta las que cortó el servidor
+    DB_POOL_PRE_PING: bool = True
+
+    # SQLite (archivo): WAL + PRAGMAs + un solo escritor; no aplica a otras BDs.
+    # Opt-in: WAL queda guardado en el archivo y deja de ser un único .db para copiar/respaldar
+    SQLITE_HIGH_CONCURRENCY: bool = False
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL"] = "NORMAL"
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_MMAP_SIZE_BYTES: int = 256 * 1024 * 1024
+    # cuánto espera una conexión por el lock de escritura antes de "database is locked"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5_000
+
+    # Arranque: esquema + demo en el lifespan (False = se corre aparte con python -m app.db.bootstrap)
+    DB_AUTO_BOOTSTRAP: bool = True
+    SEED_DEMO_DATA: bool = True
+    # lock entre workers para el bootstrap (en Postgres se usa pg_advisory_lock)
+    BOOTSTRAP_LOCK_FILE: str = "./.arnold_bootstrap.lock"
 
     # LLM / IA
     LLM_API_KEY: str | None = None
     LLM_MODEL: str = "gpt-4.1-mini"
+    # base_url alternativo (proxy, Azure, stub local para pruebas)
+    LLM_BASE_URL: str | None = None
+    # pool HTTP compartido y límites del cliente LLM
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    LLM_MAX_RETRIES: int = 1
+    # hedging: si la llamada tarda más que esto se lanza una segunda en paralelo (None = apagado)
+    LLM_HEDGE_AFTER_SECONDS: float | None = None
 
     # ElevenLabs
     ELEVENLABS_API_KEY: str | None = None
     ELEVENLABS_VOICE_ID: str | None = None
+    ELEVENLABS_MODEL_ID: str = "eleven_multilingual_v2"
+    ELEVENLABS_BASE_URL: str = "https://api.elevenlabs.io"
+    TTS_TIMEOUT_SECONDS: float = 60.0
+    TTS_MAX_CONNECTIONS: int = 10
+    # reintentos de cada llamada HTTP a ElevenLabs (los jobs TTS tienen además los suyos)
+    TTS_CALL_MAX_RETRIES: int = 1
+    TTS_HEDGE_AFTER_SECONDS: float | None = None
+    # tamaño de los chunks que se reenvían en /tts/stream
+    TTS_STREAM_CHUNK_BYTES: int = 16 * 1024
+
+    # Caché de audio TTS en MEDIA_DIR (LRU por tamaño total)
+    TTS_CACHE_MAX_BYTES: int = 500 * 1024 * 1024
+
+    # Cola de jobs TTS en segundo plano
+    TTS_WORKERS: int = 2
+    TTS_QUEUE_MAX_SIZE: int = 100
+    TTS_MAX_RETRIES: int = 2
+    TTS_RETRY_BACKOFF_SECONDS: float = 1.0
+
+    # Contexto de conversación para el LLM (tokens estimados como caracteres / 4)
+    CHAT_CONTEXT_MAX_MESSAGES: int = 30
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 1500
+    CHAT_SUMMARY_MAX_TOKENS: int = 300
+
+    # Caché de respuestas del chat general (exacta + similitud por trigramas)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL_SECONDS: float = 24 * 60 * 60
+    RESPONSE_CACHE_MAX_ENTRIES: int = 5_000
+    # 1.0 = solo preguntas idénticas; por debajo también las parecidas (mismos números y negaciones)
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD: float = 1.0
+    # "user": cada usuario tiene sus respuestas; "global": se comparten entre usuarios
+    RESPONSE_CACHE_SCOPE: Literal["user", "global"] = "user"
+
+    # Proveedores: los reales o stubs locales deterministas (benchmarks / pruebas sin red)
+    LLM_BACKEND: Literal["openai", "stub"] = "openai"
+    TTS_BACKEND: Literal["elevenlabs", "stub"] = "elevenlabs"
+    # semilla de los stubs (latencias y errores reproducibles); None = aleatoria
+    STUB_SEED: int | None = None
+    # latencia log-normal: mediana en ms y sigma (0 = fija)
+    STUB_LLM_LATENCY_MS: float = 300.0
+    STUB_LLM_LATENCY_JITTER: float = 0.3
+    STUB_LLM_TOKENS_PER_SECOND: float = 50.0
+    STUB_LLM_RESPONSE_TOKENS: int = 40
+    STUB_LLM_ERROR_RATE: float = 0.0
+    STUB_TTS_LATENCY_MS: float = 500.0
+    STUB_TTS_LATENCY_JITTER: float = 0.3
+    # ~1 KB por carácter es lo que pesa un MP3 de voz a 128 kbps
+    STUB_TTS_BYTES_PER_CHAR: int = 1_000
+    STUB_TTS_STREAM_BYTES_PER_SECOND: float = 64_000.0
+    STUB_TTS_ERROR_RATE: float = 0.0
+
+    # Resiliencia frente a LLM / ElevenLabs: backoff con jitter y circuit breaker por proveedor
+    RETRY_BACKOFF_BASE_SECONDS: float = 0.2
+    RETRY_BACKOFF_MAX_SECONDS: float = 2.0
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 30.0
+
+    # Llamadas idénticas en curso (LLM / TTS) que se comparten; con la tabla llena no se deduplica
+    SINGLE_FLIGHT_MAX_IN_FLIGHT: int = 1_000
+    # con estado compartido: cuánto dura el lease de la llamada entre workers (> timeout del proveedor)
+    SINGLE_FLIGHT_LEASE_SECONDS: float = 90.0
+
+    # Rate limit global (todos los workers) de llamadas al proveedor por minuto (None = sin límite)
+    LLM_RATE_LIMIT_PER_MINUTE: int | None = None
+    TTS_RATE_LIMIT_PER_MINUTE: int | None = None
+    # si el minuto ya está lleno se espera al siguiente como mucho esto; después se degrada
+    RATE_LIMIT_MAX_WAIT_SECONDS: float = 5.0
+
+    # Despliegue: workers de uvicorn (python -m app.main) y dónde vive el estado compartido.
+    # Con más de un worker (o varios nodos) "memory" duplica cachés y llamadas: usar "sqlite"
+    # (misma máquina) o un backend de red.
+    WORKERS: int = 1
+    SHARED_STATE_BACKEND: Literal["memory", "sqlite"] = "memory"
+    SHARED_STATE_SQLITE_PATH: str = "./arnold_shared_state.db"
+    # backend sqlite: espera máxima por el lock desde el event loop antes de degradar (miss / no escribe)
+    SHARED_STATE_BUSY_TIMEOUT_MS: int = 20
+
+    # Caché del plan de hoy por usuario (POST /sessions/auto)
+    PLAN_CACHE_TTL_SECONDS: float = 6 * 60 * 60
+    PLAN_CACHE_MAX_ENTRIES: int = 10_000
 
     # Media
     MEDIA_DIR: str = "./media"
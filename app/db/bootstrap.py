@@ -0,0 +1,105 @@
+"""
+Preparación de la BD: esquema al día + datos demo.
+
+Corre una vez por arranque y no al importar la app. Lo lanza el lifespan
+(DB_AUTO_BOOTSTRAP) o se corre a mano antes de levantar los workers:
+
+    python -m app.db.bootstrap [--no-demo]
+
+Un lock entre procesos evita que varios workers hagan el DDL y el seed a la vez:
+pg_advisory_lock en Postgres y un lock de archivo (BOOTSTRAP_LOCK_FILE) en el resto.
+"""
+import argparse
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# clave arbitraria pero fija para pg_advisory_lock
+_ADVISORY_LOCK_KEY = 0x41524E4F4C44
+
+_done = False
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    try:
+        import fcntl
+    except ImportError:  # Windows: un solo proceso, sin lock
+        yield
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def bootstrap_lock(engine: Engine) -> Iterator[None]:
+    """
+    Lock exclusivo entre procesos (y entre nodos si la BD es Postgres).
+    """
+    if engine.dialect.name != "postgresql":
+        with _file_lock(settings.BOOTSTRAP_LOCK_FILE):
+            yield
+        return
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+            conn.commit()
+
+
+def bootstrap_database(seed_demo: bool = True) -> Dict[str, object]:
+    """
+    Deja el esquema al día y siembra la demo (idempotente) bajo el lock.
+    Dentro de un mismo proceso solo corre la primera vez.
+    """
+    global _done
+
+    if _done:
+        return {"skipped": True}
+
+    # imports aquí: quien solo importa la app no carga migraciones ni el seed
+    from app.db.migrations import upgrade
+    from app.db.session import SessionLocal, engine
+    from app.initial_data import create_demo_data
+
+    started = time.perf_counter()
+    with bootstrap_lock(engine):
+        created: List[str] = upgrade(engine)
+        if seed_demo:
+            db = SessionLocal()
+            try:
+                create_demo_data(db)
+            finally:
+                db.close()
+    _done = True
+
+    elapsed = time.perf_counter() - started
+    logger.info("BD lista en %.3fs (índices creados: %s)", elapsed, created or "ninguno")
+    return {"skipped": False, "indexes_created": created, "seconds": round(elapsed, 3)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Esquema al día y datos demo")
+    parser.add_argument("--no-demo", action="store_true", help="No sembrar los datos demo")
+    args = parser.parse_args()
+
+    result = bootstrap_database(seed_demo=not args.no_demo)
+    print(f"BD lista en {result['seconds']}s, índices creados: {result['indexes_created'] or 'ninguno'}")
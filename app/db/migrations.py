@@ -0,0 +1,73 @@
+"""
+Migraciones ligeras del esquema.
+
+create_all solo crea tablas que no existen, así que los índices nuevos de
+tablas ya existentes se añaden aquí. Las tablas de rollup que se crean sobre
+una BD con historial se llenan desde ese historial en la misma migración.
+`python -m app.db.migrations` lo aplica a mano.
+"""
+import logging
+from typing import List
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.db import models  # noqa: F401  (registra los modelos en Base.metadata)
+from app.db.session import Base
+from app.services.rollups import ROLLUP_MODELS, rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_indexes(engine: Engine) -> List[str]:
+    """
+    Crea los índices declarados en los modelos que falten en la BD.
+    Devuelve los nombres de los índices creados.
+    """
+    inspector = inspect(engine)
+    created = []
+
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name in existing:
+                continue
+            index.create(bind=engine)
+            created.append(index.name)
+
+    return created
+
+
+def upgrade(engine: Engine) -> List[str]:
+    """
+    Deja el esquema al día: tablas nuevas + índices nuevos.
+    Si falta alguna tabla de rollup, después de crearla se reconstruyen los rollups
+    desde las sesiones (si no, las métricas darían cero hasta un backfill a mano).
+    Devuelve los nombres de los índices creados.
+    """
+    inspector = inspect(engine)
+    new_rollups = [m.__tablename__ for m in ROLLUP_MODELS if not inspector.has_table(m.__tablename__)]
+
+    Base.metadata.create_all(bind=engine)
+    created = ensure_indexes(engine)
+
+    if new_rollups:
+        with Session(bind=engine) as db:
+            counts = rebuild_rollups(db)
+        logger.info("tablas de rollup nuevas %s, backfill: %s", new_rollups, counts)
+    return created
+
+
+if __name__ == "__main__":
+    from app.db.session import engine
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    created = upgrade(engine)
+    if created:
+        for name in created:
+            print(f"índice creado: {name}")
+    else:
+        print("esquema al día")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date, Text, Enum, Boolean, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.session import Base
@@ -47,6 +47,10 @@ class Exercise(Base):
 
 class WorkoutSession(Base):
     __tablename__ = "workout_sessions"
+    __table_args__ = (
+        # métricas, rollups y planner: sesiones de un usuario por estado y ventana de fechas
+        Index("ix_workout_sessions_user_status_started", "user_id", "status", "started_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -66,6 +70,11 @@ class WorkoutSession(Base):
 
 class WorkoutSet(Base):
     __tablename__ = "workout_sets"
+    __table_args__ = (
+        # joins sesión -> sets y "sets sin resultado" de session_coach
+        Index("ix_workout_sets_session_actual_reps", "session_id", "actual_reps"),
+        Index("ix_workout_sets_exercise_id", "exercise_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("workout_sessions.id"), nullable=False)
@@ -93,6 +102,11 @@ class WorkoutSet(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # historial reciente por usuario / por sesión
+        Index("ix_chat_messages_user_type_timestamp", "user_id", "chat_type", "timestamp"),
+        Index("ix_chat_messages_session_timestamp", "session_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -107,3 +121,69 @@ class ChatMessage(Base):
 
     user = relationship("User", back_populates="messages")
     session = relationship("WorkoutSession", back_populates="messages")
+
+
+# ---------------- Rollups de entrenamiento ----------------
+# Agregados por usuario y día de las sesiones COMPLETADAS. Se mantienen de forma
+# incremental (app/services/rollups.py) y son lo que leen los endpoints de métricas.
+
+
+class DailyTrainingRollup(Base):
+    __tablename__ = "daily_training_rollups"
+    __table_args__ = (UniqueConstraint("user_id", "day", name="uq_daily_training_rollup"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+
+    session_count = Column(Integer, nullable=False, default=0)
+    set_count = Column(Integer, nullable=False, default=0)
+    volume = Column(Float, nullable=False, default=0.0)
+
+
+class DailyMuscleGroupRollup(Base):
+    __tablename__ = "daily_muscle_group_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", "muscle_group", name="uq_daily_muscle_group_rollup"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    muscle_group = Column(String, nullable=False)
+
+    session_count = Column(Integer, nullable=False, default=0)
+    set_count = Column(Integer, nullable=False, default=0)
+    volume = Column(Float, nullable=False, default=0.0)
+
+
+class DailyExerciseBest(Base):
+    __tablename__ = "daily_exercise_bests"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", "exercise_id", name="uq_daily_exercise_best"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    exercise_id = Column(Integer, ForeignKey("exercises.id"), nullable=False)
+
+    best_e1rm = Column(Float, nullable=False)
+
+
+# ---------------- Idempotencia ----------------
+
+
+class SetResultsOperation(Base):
+    """
+    Lotes de resultados de sets ya aplicados, por operation_id del cliente.
+    Un replay del mismo lote (cliente offline reintentando) no vuelve a escribir.
+    """
+
+    __tablename__ = "set_results_operations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    operation_id = Column(String, nullable=False, unique=True)
+    session_id = Column(Integer, ForeignKey("workout_sessions.id"), nullable=False)
+    updated_sets = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
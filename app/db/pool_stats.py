@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Type
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool
+
+# Ventana de esperas recientes sobre la que se calculan los percentiles
+_RECENT_WAITS = 1_000
+# Esperas más largas que esto cuentan como "lentas" (el pool estaba agotado)
+_SLOW_WAIT_SECONDS = 0.05
+
+_CONNECTED_AT = "pool_stats_connected_at"
+_CHECKED_OUT_AT = "pool_stats_checked_out_at"
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class PoolStats:
+    """
+    Contadores de un pool de conexiones:
+    - checkouts / checkins, conexiones abiertas, cerradas e invalidadas
+    - espera por una conexión libre (total, máximo, p50/p95/p99 de las últimas) y timeouts
+    - uso del overflow (pico de conexiones por encima de pool_size)
+    - vida de las conexiones cerradas (recycle, pre-ping fallido, dispose)
+    Los eventos del pool llegan desde varios hilos (rutas sync en el threadpool), de ahí el lock.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._pool: Optional[Pool] = None
+        self._recent_waits: Deque[float] = deque(maxlen=_RECENT_WAITS)
+
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.slow_waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+        self.held_total = 0.0
+        self.held_max = 0.0
+        self.lifetime_total = 0.0
+        self.lifetime_max = 0.0
+
+    # ---- llamados desde el pool instrumentado ----
+
+    def record_wait(self, pool: Pool, seconds: float) -> None:
+        with self._lock:
+            self._pool = pool
+            self._recent_waits.append(seconds)
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if seconds >= _SLOW_WAIT_SECONDS:
+                self.slow_waits += 1
+
+    def record_timeout(self, seconds: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self._recent_waits.append(seconds)
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    # ---- eventos del pool ----
+
+    def _on_connect(self, dbapi_connection, record) -> None:
+        record.info[_CONNECTED_AT] = time.monotonic()
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, record, proxy) -> None:
+        record.info[_CHECKED_OUT_AT] = time.monotonic()
+        pool = self._pool
+        with self._lock:
+            self.checkouts += 1
+            if pool is not None and hasattr(pool, "checkedout"):
+                self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+                self.peak_overflow = max(self.peak_overflow, pool.overflow())
+
+    def _on_checkin(self, dbapi_connection, record) -> None:
+        checked_out_at = record.info.pop(_CHECKED_OUT_AT, None)
+        with self._lock:
+            self.checkins += 1
+            if checked_out_at is not None:
+                held = time.monotonic() - checked_out_at
+                self.held_total += held
+                self.held_max = max(self.held_max, held)
+
+    def _on_close(self, dbapi_connection, record) -> None:
+        connected_at = record.info.pop(_CONNECTED_AT, None)
+        with self._lock:
+            self.closes += 1
+            if connected_at is not None:
+                lifetime = time.monotonic() - connected_at
+                self.lifetime_total += lifetime
+                self.lifetime_max = max(self.lifetime_max, lifetime)
+
+    def _on_invalidate(self, dbapi_connection, record, exception) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def listen(self, engine) -> None:
+        """
+        Engancha los eventos al engine (sync; para uno async, su sync_engine).
+        Registrados en el engine siguen activos cuando dispose() recrea el pool.
+        """
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "close", self._on_close)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self._pool
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            closed = self.closes
+            checkins = self.checkins
+            data: Dict[str, Any] = {
+                "checkouts": self.checkouts,
+                "checkins": checkins,
+                "connects": self.connects,
+                "closes": closed,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "slow_waits": self.slow_waits,
+                "wait_ms": {
+                    "total": round(self.wait_total * 1000, 2),
+                    "max": round(self.wait_max * 1000, 2),
+                    "p50": round(_percentile(waits, 50) * 1000, 2),
+                    "p95": round(_percentile(waits, 95) * 1000, 2),
+                    "p99": round(_percentile(waits, 99) * 1000, 2),
+                },
+                "held_ms": {
+                    "mean": round(self.held_total / checkins * 1000, 2) if checkins else 0.0,
+                    "max": round(self.held_max * 1000, 2),
+                },
+                "connection_lifetime_s": {
+                    "mean": round(self.lifetime_total / closed, 2) if closed else 0.0,
+                    "max": round(self.lifetime_max, 2),
+                },
+                "peak_checked_out": self.peak_checked_out,
+                "peak_overflow": self.peak_overflow,
+            }
+        if pool is not None and hasattr(pool, "checkedout"):
+            data.update(
+                pool_size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                # SQLAlchemy lo da negativo mientras no se llena pool_size
+                overflow=max(pool.overflow(), 0),
+            )
+        return data
+
+
+def instrumented_pool_class(base: Type[Pool], stats: PoolStats) -> Type[Pool]:
+    """
+    Subclase del pool que cronometra la espera de cada checkout. SQLAlchemy no tiene
+    un evento "antes del checkout", así que se mide _do_get. La clase lleva su
+    PoolStats: dispose() recrea el pool con la misma clase y los contadores siguen.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = base._do_get(self)
+        except PoolTimeoutError:
+            stats.record_timeout(time.perf_counter() - started)
+            raise
+        stats.record_wait(self, time.perf_counter() - started)
+        return record
+
+    return type(f"Instrumented{base.__name__}", (base,), {"_do_get": _do_get})
@@ -1,13 +1,65 @@
+from typing import Any, AsyncIterator, Dict, Type
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
 from app.core.config import settings
+from app.db.pool_stats import PoolStats, instrumented_pool_class
+from app.db.sqlite import WriterRoutingSession, install_sqlite_pragmas, is_sqlite_file
+
+sync_pool_stats = PoolStats("sync")
+async_pool_stats = PoolStats("async")
+# solo se usan en el modo SQLite de alta concurrencia (un escritor por engine)
+sync_writer_pool_stats = PoolStats("sync_writer")
+async_writer_pool_stats = PoolStats("async_writer")
+
+SQLITE_SINGLE_WRITER = settings.SQLITE_HIGH_CONCURRENCY and is_sqlite_file(settings.DATABASE_URL)
+
+
+def _pool_options(url: str, base: Type[Pool], stats: PoolStats, **overrides: Any) -> Dict[str, Any]:
+    """
+    Parámetros del pool desde Settings. SQLite en memoria se queda con el pool
+    de una sola conexión que elige SQLAlchemy (cada conexión sería otra BD).
+    """
+    if url.startswith("sqlite") and not is_sqlite_file(url):
+        return {}
+    options = {
+        "poolclass": instrumented_pool_class(base, stats),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    options.update(overrides)
+    return options
+
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {},
-)
+def _create_engine(stats: PoolStats, **overrides: Any):
+    sync_engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {},
+        **_pool_options(settings.DATABASE_URL, QueuePool, stats, **overrides),
+    )
+    stats.listen(sync_engine)
+    if SQLITE_SINGLE_WRITER:
+        install_sqlite_pragmas(sync_engine)
+    return sync_engine
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+engine = _create_engine(sync_pool_stats)
+
+if SQLITE_SINGLE_WRITER:
+    # una sola conexión de escritura: las transacciones que escriben hacen cola en su pool
+    writer_engine = _create_engine(sync_writer_pool_stats, pool_size=1, max_overflow=0)
+    SessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, bind=engine,
+        class_=WriterRoutingSession, writer=writer_engine,
+    )
+else:
+    writer_engine = None
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
@@ -18,3 +70,60 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ---------------- Async ----------------
+# Las rutas async (chat, métricas, usuarios) usan este engine para no bloquear
+# el event loop mientras la BD responde. El engine sync queda para scripts
+# (initial_data, rollups, migraciones) y las rutas sync.
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """
+    Misma BD que DATABASE_URL con el driver async equivalente
+    (sqlite -> aiosqlite, postgresql -> asyncpg). Si ya trae un driver async se deja igual.
+    """
+    scheme, sep, rest = url.partition("://")
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+_async_url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+# ASYNC_DATABASE_URL puede apuntar a otra BD que no sea SQLite
+_ASYNC_SINGLE_WRITER = SQLITE_SINGLE_WRITER and is_sqlite_file(_async_url)
+
+
+def _create_async_engine(stats: PoolStats, **overrides: Any):
+    new_engine = create_async_engine(
+        _async_url,
+        **_pool_options(_async_url, AsyncAdaptedQueuePool, stats, **overrides),
+    )
+    stats.listen(new_engine.sync_engine)
+    if _ASYNC_SINGLE_WRITER:
+        install_sqlite_pragmas(new_engine.sync_engine)
+    return new_engine
+
+
+async_engine = _create_async_engine(async_pool_stats)
+
+# expire_on_commit=False: después del commit los objetos se siguen leyendo
+# sin otro SELECT (en async un lazy load implícito sería un error)
+if _ASYNC_SINGLE_WRITER:
+    async_writer_engine = _create_async_engine(async_writer_pool_stats, pool_size=1, max_overflow=0)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False,
+        sync_session_class=WriterRoutingSession, writer=async_writer_engine.sync_engine,
+    )
+else:
+    async_writer_engine = None
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
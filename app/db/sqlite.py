@@ -0,0 +1,80 @@
+"""
+Modo de alta concurrencia para SQLite.
+
+- WAL: los lectores no bloquean al escritor ni al revés.
+- PRAGMAs en cada conexión nueva: synchronous, cache_size, mmap_size y busy_timeout.
+- Un solo escritor: las transacciones que escriben van por un engine de una
+  conexión; mientras está ocupada las demás esperan su turno en el pool en vez de
+  chocar con "database is locked". Las lecturas siguen en paralelo en el pool normal.
+
+La cola es por engine: el escritor sync (rutas sync, scripts) y el async (rutas
+async) son dos conexiones al mismo archivo y entre ellas el lock se sigue
+resolviendo con busy_timeout, igual que entre workers. bench_sqlite mide ese caso
+con el modo "wal_writer_mixed".
+"""
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, make_url
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+_WRITING = "sqlite_writer"
+
+
+def is_sqlite_file(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    return {
+        "journal_mode": "WAL",
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        # negativo = tamaño en KiB en vez de número de páginas
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,
+        "mmap_size": settings.SQLITE_MMAP_SIZE_BYTES,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+    }
+
+
+def install_sqlite_pragmas(engine: Engine, pragmas: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Aplica los PRAGMAs al abrir cada conexión (para un engine async, pasar su sync_engine).
+    """
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+class WriterRoutingSession(Session):
+    """
+    Session que lee del engine normal y escribe por el engine del escritor.
+    Desde la primera escritura (flush o INSERT/UPDATE/DELETE directo) todo lo que
+    queda de la transacción va también por el escritor, así las lecturas ven lo ya
+    escrito y los read-modify-write (rollups) no leen un snapshot viejo.
+    Con AsyncSession se usa como sync_session_class y `writer` es el sync_engine del async.
+    """
+
+    def __init__(self, *args: Any, writer: Engine, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.writer = writer
+        event.listen(self, "after_transaction_end", self._release_writer)
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get(_WRITING) or self._flushing or getattr(clause, "is_dml", False):
+            self.info[_WRITING] = True
+            return self.writer
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+    def _release_writer(self, session: Session, transaction) -> None:
+        if transaction.parent is None:
+            self.info.pop(_WRITING, None)
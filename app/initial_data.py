@@ -4,6 +4,9 @@ from sqlalchemy.orm import Session
 
 from app.db import models
 from app.db.models import ChatType, SessionStatus
+from app.services.rollups import rebuild_rollups
+
+DEMO_USER_NAME = "Julian Pinto"
 
 
 def create_demo_data(db: Session) -> None:
@@ -15,7 +18,7 @@ def create_demo_data(db: Session) -> None:
     # 1) Usuario demo
     user = (
         db.query(models.User)
-        .filter(models.User.name == "Demo Athlete")
+        .filter(models.User.name == DEMO_USER_NAME)
         .first()
     )
 
@@ -24,7 +27,7 @@ def create_demo_data(db: Session) -> None:
         return
 
     user = models.User(
-        name="Julian Pinto",
+        name=DEMO_USER_NAME,
         goal="Build Muscle",
         experience_level="beginner",
         weight_kg=75.0,
@@ -284,3 +287,6 @@ def create_demo_data(db: Session) -> None:
             db.add(msg)
 
     db.commit()
+
+    # 5) Rollups de métricas para las sesiones completadas del demo
+    rebuild_rollups(db, user_id=user.id)
@@ -1,16 +1,21 @@
+import logging
 import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
 from app.core.config import settings
-from app.db.session import Base, SessionLocal, engine
-from app.api.routes import chat, sessions, setup, tts, metrics, users
+from app.db.bootstrap import bootstrap_database
+from app.db.session import SessionLocal, async_engine, async_writer_engine
+from app.api.routes import chat, sessions, setup, tts, metrics, users, ops
+from app.services.llm import close_llm_client, init_llm_client
+from app.services.elevenlabs_client import close_tts_client, init_tts_client
+from app.services.tts_jobs import tts_jobs
+from app.services.exercise_catalog import exercise_catalog
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.initial_data import create_demo_data
-
-# 👉 Esto crea todas las tablas en la BD
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
 # Crear carpeta media si no existe
 os.makedirs(settings.MEDIA_DIR, exist_ok=True)
@@ -21,18 +26,50 @@ origins = [
     # añade aquí la IP de tu máquina en la red local si pruebas en dispositivo físico
     "*"
 ]
-def init_demo_data() -> None:
+
+
+def load_exercise_catalog() -> None:
     """
-    Inicializa los datos de demostración.
+    Carga el catálogo de ejercicios en memoria (planner y métricas lo leen de ahí).
     """
     db = SessionLocal()
     try:
-        create_demo_data(db)
+        exercise_catalog.reload(db)
     finally:
         db.close()
-init_demo_data()
 
-app = FastAPI(title=settings.PROJECT_NAME)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.WORKERS > 1 and settings.SHARED_STATE_BACKEND == "memory":
+        # cada worker tendría sus propios cachés, cupos y single-flight
+        logger.warning(
+            "WORKERS=%s con SHARED_STATE_BACKEND=memory: el estado no se comparte entre workers",
+            settings.WORKERS,
+        )
+    # Esquema + demo una sola vez por arranque (con lock entre workers), no al importar
+    if settings.DB_AUTO_BOOTSTRAP:
+        bootstrap_database(seed_demo=settings.SEED_DEMO_DATA)
+    # Clientes compartidos del proceso (pools HTTP) viven lo mismo que la app
+    if settings.LLM_BACKEND == "openai" and settings.LLM_API_KEY:
+        # sin API key el cliente se crea (y falla) en la primera llamada, no en el arranque
+        init_llm_client()
+    if settings.TTS_BACKEND == "elevenlabs" and settings.ELEVENLABS_API_KEY:
+        init_tts_client()
+    tts_jobs.start()
+    load_exercise_catalog()
+    try:
+        yield
+    finally:
+        await tts_jobs.stop()
+        await close_tts_client()
+        await close_llm_client()
+        await async_engine.dispose()
+        if async_writer_engine is not None:
+            await async_writer_engine.dispose()
+
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -55,4 +92,12 @@ app.include_router(sessions.router)
 app.include_router(setup.router)
 app.include_router(tts.router)
 app.include_router(metrics.router)
-app.include_router(users.router)
\ No newline at end of file
+app.include_router(users.router)
+app.include_router(ops.router)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # python -m app.main: levanta WORKERS procesos (con estado compartido ver SHARED_STATE_BACKEND)
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, workers=settings.WORKERS)
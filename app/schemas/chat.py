@@ -33,3 +33,11 @@ class ChatMessageOut(BaseModel):
 
 class ChatResponse(BaseModel):
     message: ChatMessageOut
+    # "ready" | "pending" | "failed" | "unavailable": el audio se genera en segundo plano
+    audio_status: Optional[str] = None
+
+
+class ChatAudioStatus(BaseModel):
+    message_id: int
+    status: str
+    audio_url: Optional[str] = None
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, List
 from app.db.models import SessionStatus
@@ -51,6 +51,28 @@ class WorkoutSessionCreate(BaseModel):
     sets: List[WorkoutSetCreate]
 
 
+class WorkoutSetResult(BaseModel):
+    set_id: int
+    # solo se actualizan los campos que vengan en el payload
+    actual_reps: Optional[int] = None
+    actual_weight: Optional[float] = None
+    rpe: Optional[float] = None
+    comment: Optional[str] = None
+
+
+class WorkoutSetResultsBatch(BaseModel):
+    # id generado por el cliente; reenviar el mismo lote no lo aplica dos veces
+    operation_id: str = Field(..., min_length=1, max_length=128)
+    results: List[WorkoutSetResult] = Field(..., min_length=1)
+
+
+class WorkoutSetResultsOut(BaseModel):
+    operation_id: str
+    session_id: int
+    updated_sets: int
+    replayed: bool
+
+
 class WorkoutSessionOut(BaseModel):
     id: int
     user_id: int
@@ -0,0 +1,289 @@
+import math
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.db.models import ChatType
+from app.services.exercise_catalog import exercise_catalog
+from app.services.shared_state import SharedStateBackend, shared_state
+
+# Tokens extra por mensaje (rol, separadores) en la estimación
+_MESSAGE_OVERHEAD_TOKENS = 4
+# Cada línea del resumen guarda como mucho esto del mensaje original
+_SUMMARY_LINE_CHARS = 160
+_MAX_SUMMARIES = 10_000
+# una conversación sin actividad por una semana vuelve a empezar su resumen
+_SUMMARY_TTL_SECONDS = 7 * 24 * 60 * 60
+
+_ROLE_TO_LLM = {"user": "user", "arnold": "assistant"}
+_ROLE_LABEL = {"user": "Usuario", "arnold": "Arnold"}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimación local y rápida (~4 caracteres por token), sin tokenizer real.
+    """
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def _message_tokens(text: str) -> int:
+    return estimate_tokens(text) + _MESSAGE_OVERHEAD_TOKENS
+
+
+class RollingSummaryCache:
+    """
+    Resumen extractivo de la parte vieja de cada conversación, en el estado compartido.
+    Guarda hasta qué mensaje ya se resumió, así cada request solo agrega
+    los mensajes que acaban de salir de la ventana (aunque la anterior la haya atendido otro worker).
+    """
+
+    def __init__(self, backend: SharedStateBackend, max_tokens: int):
+        self.backend = backend
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _backend_key(key: Tuple) -> str:
+        return ":".join(str(part) for part in key)
+
+    def folded_up_to(self, key: Tuple) -> int:
+        """
+        Id del último mensaje que ya está en el resumen (0 si no hay resumen).
+        """
+        stored = self.backend.get(self._backend_key(key))
+        return stored[0] if stored is not None else 0
+
+    def fold(self, key: Tuple, messages: List[models.ChatMessage]) -> Optional[str]:
+        """
+        Agrega al resumen los mensajes (viejos -> nuevos) que todavía no estaban
+        y devuelve el texto del resumen (o None si no hay nada).
+        """
+        backend_key = self._backend_key(key)
+        with self._lock:
+            stored = self.backend.get(backend_key)
+            last_id, lines = stored if stored is not None else (0, [])
+            lines = list(lines)
+            for msg in messages:
+                if msg.id <= last_id:
+                    continue
+                text = " ".join(msg.text.split())
+                if len(text) > _SUMMARY_LINE_CHARS:
+                    text = text[: _SUMMARY_LINE_CHARS - 1] + "…"
+                lines.append(f"{_ROLE_LABEL.get(msg.role, msg.role)}: {text}")
+                last_id = msg.id
+
+            # Se queda con las líneas más recientes que entran en el presupuesto del resumen
+            kept: List[str] = []
+            used = 0
+            for line in reversed(lines):
+                cost = estimate_tokens(line) + 1
+                if used + cost > self.max_tokens:
+                    break
+                kept.append(line)
+                used += cost
+            kept.reverse()
+
+            if lines or stored is not None:
+                self.backend.set(backend_key, [last_id, kept], _SUMMARY_TTL_SECONDS)
+
+        return "\n".join(kept) if kept else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "entries": self.backend.size(),
+            "max_tokens": self.max_tokens,
+        }
+
+
+summary_cache = RollingSummaryCache(
+    shared_state("chat_summary", _MAX_SUMMARIES), settings.CHAT_SUMMARY_MAX_TOKENS
+)
+
+
+def _conversation_query(
+    db: Session,
+    user_id: int,
+    chat_type: ChatType,
+    session_id: Optional[int],
+):
+    # siempre filtrado por usuario: un session_id ajeno no trae mensajes de otro
+    q = db.query(models.ChatMessage).filter(models.ChatMessage.user_id == user_id)
+    if session_id is not None:
+        return q.filter(models.ChatMessage.session_id == session_id)
+    return q.filter(models.ChatMessage.chat_type == chat_type)
+
+
+def _newest_first(q, limit: int) -> List[models.ChatMessage]:
+    rows = (
+        q.order_by(models.ChatMessage.timestamp.desc(), models.ChatMessage.id.desc())
+        .limit(limit)
+        .all()
+    )
+    rows.reverse()
+    return rows
+
+
+def _recent_messages(
+    db: Session,
+    user_id: int,
+    chat_type: ChatType,
+    session_id: Optional[int],
+    limit: int,
+) -> List[models.ChatMessage]:
+    """
+    Últimos `limit` mensajes de la conversación, de más viejo a más nuevo.
+    Usa ix_chat_messages_session_timestamp / ix_chat_messages_user_type_timestamp.
+    """
+    return _newest_first(_conversation_query(db, user_id, chat_type, session_id), limit)
+
+
+def _messages_to_fold(
+    db: Session,
+    user_id: int,
+    chat_type: ChatType,
+    session_id: Optional[int],
+    after_id: int,
+    before: models.ChatMessage,
+) -> List[models.ChatMessage]:
+    """
+    Mensajes todavía sin resumir y más viejos que el primero que queda en el contexto,
+    de más viejo a más nuevo: los que salen por presupuesto y los que ya quedaron
+    fuera de CHAT_CONTEXT_MAX_MESSAGES.
+    Cada línea del resumen cuesta al menos 2 tokens, así que más de
+    CHAT_SUMMARY_MAX_TOKENS // 2 mensajes no entrarían de todos modos.
+    """
+    q = _conversation_query(db, user_id, chat_type, session_id).filter(
+        models.ChatMessage.id > after_id,
+        or_(
+            models.ChatMessage.timestamp < before.timestamp,
+            and_(
+                models.ChatMessage.timestamp == before.timestamp,
+                models.ChatMessage.id < before.id,
+            ),
+        ),
+    )
+    return _newest_first(q, max(settings.CHAT_SUMMARY_MAX_TOKENS // 2, 1))
+
+
+def profile_block(user: models.User) -> str:
+    parts = [f"Nombre: {user.name}"]
+    if user.goal:
+        parts.append(f"objetivo: {user.goal}")
+    if user.experience_level:
+        parts.append(f"nivel: {user.experience_level}")
+    if user.weight_kg:
+        parts.append(f"peso: {user.weight_kg:g} kg")
+    if user.height_cm:
+        parts.append(f"altura: {user.height_cm:g} cm")
+    return "Perfil del usuario: " + ", ".join(parts) + "."
+
+
+def _session_block(db: Session, user_id: int, session: models.WorkoutSession) -> str:
+    sets = (
+        db.query(models.WorkoutSet)
+        .join(models.WorkoutSession, models.WorkoutSession.id == models.WorkoutSet.session_id)
+        .filter(models.WorkoutSet.session_id == session.id, models.WorkoutSession.user_id == user_id)
+        .order_by(models.WorkoutSet.exercise_order, models.WorkoutSet.set_number)
+        .all()
+    )
+    status = session.status.value if session.status else "planned"
+    lines = [f"Sesión actual ({status}):"]
+    for s in sets:
+        ex = exercise_catalog.get(db, s.exercise_id)
+        name = ex.name if ex else f"ejercicio {s.exercise_id}"
+        target = f"{s.target_reps} reps" + (f" x {s.target_weight:g} kg" if s.target_weight else "")
+        line = f"- {name} serie {s.set_number}: objetivo {target}"
+        if s.actual_reps is not None:
+            done = f"{s.actual_reps} reps" + (f" x {s.actual_weight:g} kg" if s.actual_weight else "")
+            if s.rpe is not None:
+                done += f", RPE {s.rpe:g}"
+            line += f"; hecho {done}"
+        lines.append(line)
+    if not sets:
+        lines.append("- (sin sets)")
+    return "\n".join(lines)
+
+
+def has_conversation_history(db: Session, user_id: int, chat_type: ChatType) -> bool:
+    """
+    True si el usuario ya tiene mensajes en esa conversación (antes de guardar el nuevo).
+    """
+    return db.query(_conversation_query(db, user_id, chat_type, None).exists()).scalar()
+
+
+def build_standalone_context(
+    user: models.User, question: str, include_profile: bool = True
+) -> List[Dict[str, str]]:
+    """
+    Contexto de una pregunta que va al response_cache: solo el perfil y la pregunta,
+    sin historial ni resumen, así la respuesta vale en cualquier punto de la conversación.
+    """
+    context = [{"role": "system", "content": profile_block(user)}] if include_profile else []
+    context.append({"role": "user", "content": question})
+    return context
+
+
+def build_chat_context(
+    db: Session,
+    user: models.User,
+    chat_type: ChatType,
+    session: Optional[models.WorkoutSession] = None,
+) -> List[Dict[str, str]]:
+    """
+    Mensajes para generate_arnold_response, dentro de CHAT_CONTEXT_TOKEN_BUDGET:
+    - un mensaje system con el perfil, la sesión actual (sets) y el resumen de lo viejo,
+    - los últimos mensajes de la conversación que entren en el presupuesto.
+    El mensaje del usuario ya tiene que estar guardado: es el último del historial
+    y siempre se incluye. Lo que no entra se pliega al resumen.
+    """
+    if session is not None and session.user_id != user.id:
+        raise ValueError(f"la sesión {session.id} no es del usuario {user.id}")
+    session_id = session.id if session is not None else None
+    history = _recent_messages(
+        db, user.id, chat_type, session_id, settings.CHAT_CONTEXT_MAX_MESSAGES
+    )
+
+    blocks = [profile_block(user)]
+    if session is not None:
+        blocks.append(_session_block(db, user.id, session))
+    # el resumen tiene su propio tope, reservado dentro del presupuesto
+    budget = (
+        settings.CHAT_CONTEXT_TOKEN_BUDGET
+        - settings.CHAT_SUMMARY_MAX_TOKENS
+        - sum(_message_tokens(b) for b in blocks)
+    )
+
+    # Del más nuevo hacia atrás mientras quepa (el último siempre entra)
+    kept: List[models.ChatMessage] = []
+    for i, msg in enumerate(reversed(history)):
+        cost = _message_tokens(msg.text)
+        if i > 0 and cost > budget:
+            break
+        kept.append(msg)
+        budget -= cost
+    kept.reverse()
+
+    # Al resumen va todo lo que quedó antes del primer mensaje del contexto,
+    # no solo lo que salió de la ventana por presupuesto
+    summary_key = (user.id, chat_type.value, session_id)
+    folded = (
+        _messages_to_fold(
+            db, user.id, chat_type, session_id, summary_cache.folded_up_to(summary_key), kept[0]
+        )
+        if kept
+        else []
+    )
+    summary = summary_cache.fold(summary_key, folded)
+    if summary:
+        blocks.append("Resumen de la conversación anterior:\n" + summary)
+
+    context = [{"role": "system", "content": "\n\n".join(blocks)}] if blocks else []
+    context.extend(
+        {"role": _ROLE_TO_LLM.get(msg.role, "user"), "content": msg.text} for msg in kept
+    )
+    return context
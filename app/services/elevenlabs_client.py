@@ -1,9 +1,228 @@
-import uuid
+import asyncio
+import logging
 import os
-from typing import Optional
-import httpx
+from typing import TYPE_CHECKING, AsyncIterator, Optional
 
 from app.core.config import settings
+from app.services.rate_limit import RateLimitedError, tts_rate_limit
+from app.services.resilience import CircuitOpenError, ResilientCaller
+from app.services.single_flight import tts_flights
+from app.services.tts_cache import make_tts_cache_key, tts_cache
+
+if TYPE_CHECKING:
+    # httpx se importa al crear el cliente: no pesa en el arranque con backend stub
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.8,
+    "style": 0.0,
+    "use_speaker_boost": True,
+}
+
+# Cliente HTTP compartido para ElevenLabs (mismo ciclo de vida que el del LLM)
+_client: Optional["httpx.AsyncClient"] = None
+
+
+def init_tts_client() -> "httpx.AsyncClient":
+    global _client
+
+    if _client is None:
+        import httpx
+
+        _client = httpx.AsyncClient(
+            base_url=settings.ELEVENLABS_BASE_URL,
+            timeout=httpx.Timeout(settings.TTS_TIMEOUT_SECONDS, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=settings.TTS_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.TTS_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+async def close_tts_client() -> None:
+    global _client
+
+    if _client is None:
+        return
+    client, _client = _client, None
+    await client.aclose()
+
+
+def get_tts_client() -> "httpx.AsyncClient":
+    return _client if _client is not None else init_tts_client()
+
+
+def _is_retryable_tts_error(exc: BaseException) -> bool:
+    return get_tts_backend().is_retryable(exc)
+
+
+tts_resilience = ResilientCaller(
+    "tts",
+    timeout_seconds=settings.TTS_TIMEOUT_SECONDS,
+    max_retries=settings.TTS_CALL_MAX_RETRIES,
+    is_retryable=_is_retryable_tts_error,
+    hedge_after_seconds=settings.TTS_HEDGE_AFTER_SECONDS,
+)
+
+
+def _request_headers() -> dict:
+    return {
+        "xi-api-key": settings.ELEVENLABS_API_KEY,
+        "Content-Type": "application/json",
+    }
+
+
+def _request_payload(text: str) -> dict:
+    return {
+        "text": text,
+        "model_id": settings.ELEVENLABS_MODEL_ID,
+        "voice_settings": VOICE_SETTINGS,
+    }
+
+
+class TTSBackend:
+    """
+    Proveedor de TTS. Solo hace la llamada; caché, single-flight, reintentos
+    y breaker quedan por fuera, así los stubs pasan por el mismo camino.
+    voice_id / model_id entran en la key del caché de audio.
+    """
+
+    name = "base"
+    voice_id: Optional[str] = None
+    model_id: Optional[str] = None
+
+    def is_configured(self) -> bool:
+        return True
+
+    async def synthesize(self, text: str) -> bytes:
+        raise NotImplementedError
+
+    async def open_stream(self, text: str) -> AsyncIterator[bytes]:
+        """
+        Abre el audio en streaming y devuelve un iterador de chunks MP3.
+        Los errores al abrir se lanzan aquí (antes de iterar) para poder reintentarlos;
+        cerrar el iterador (aclose) libera la conexión.
+        """
+        raise NotImplementedError
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        return False
+
+
+class ElevenLabsTTSBackend(TTSBackend):
+    name = "elevenlabs"
+
+    @property
+    def voice_id(self) -> Optional[str]:
+        return settings.ELEVENLABS_VOICE_ID
+
+    @property
+    def model_id(self) -> Optional[str]:
+        return settings.ELEVENLABS_MODEL_ID
+
+    def is_configured(self) -> bool:
+        return bool(settings.ELEVENLABS_API_KEY and settings.ELEVENLABS_VOICE_ID)
+
+    async def synthesize(self, text: str) -> bytes:
+        # Endpoint oficial TTS HTTP (no streaming)
+        resp = await get_tts_client().post(
+            f"/v1/text-to-speech/{self.voice_id}",
+            headers=_request_headers(),
+            json=_request_payload(text),
+        )
+        resp.raise_for_status()
+        return resp.content
+
+    async def open_stream(self, text: str) -> AsyncIterator[bytes]:
+        client = get_tts_client()
+        request = client.build_request(
+            "POST",
+            f"/v1/text-to-speech/{self.voice_id}/stream",
+            headers=_request_headers(),
+            json=_request_payload(text),
+        )
+        resp = await client.send(request, stream=True)
+        if resp.is_error:
+            await resp.aclose()
+            resp.raise_for_status()
+
+        async def chunks() -> AsyncIterator[bytes]:
+            try:
+                async for chunk in resp.aiter_bytes(settings.TTS_STREAM_CHUNK_BYTES):
+                    yield chunk
+            finally:
+                await resp.aclose()
+
+        return chunks()
+
+
+def _discard(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        # red / timeouts, 429 y 5xx: transitorios; el resto (401, 422...) no mejora reintentando
+        import httpx
+
+        if isinstance(exc, httpx.TransportError):
+            return True
+        if isinstance(exc, httpx.HTTPStatusError):
+            status = exc.response.status_code
+            return status == 429 or status >= 500
+        return False
+
+
+_backend: Optional[TTSBackend] = None
+
+
+def get_tts_backend() -> TTSBackend:
+    """
+    Backend elegido con TTS_BACKEND ("elevenlabs" o "stub" para pruebas sin red).
+    """
+    global _backend
+
+    if _backend is None:
+        if settings.TTS_BACKEND == "stub":
+            from app.services.stub_providers import StubTTSBackend
+
+            _backend = StubTTSBackend()
+        else:
+            _backend = ElevenLabsTTSBackend()
+    return _backend
+
+
+def tts_is_configured() -> bool:
+    return get_tts_backend().is_configured()
+
+
+def _cache_key(text: str) -> str:
+    backend = get_tts_backend()
+    return make_tts_cache_key(text, backend.voice_id, backend.model_id, VOICE_SETTINGS)
+
+
+async def tts_cached_audio_url(text: str) -> Optional[str]:
+    """
+    URL del audio si ya está en el caché, sin llamar a ElevenLabs.
+    """
+    if not tts_is_configured():
+        return None
+    return await tts_cache.alookup(_cache_key(text), record_miss=False)
+
+
+async def tts_cached_audio_path(text: str) -> Optional[str]:
+    """
+    Igual que tts_cached_audio_url pero devuelve la ruta en disco.
+    """
+    if not tts_is_configured():
+        return None
+    key = _cache_key(text)
+    if await tts_cache.alookup(key) is None:
+        return None
+    return tts_cache.path_for(key)
 
 
 async def tts_generate_audio_url(text: str) -> Optional[str]:
@@ -11,48 +230,83 @@ async def tts_generate_audio_url(text: str) -> Optional[str]:
     Llama a ElevenLabs para generar un MP3 con la respuesta de Arnold.
     - Si no hay API key o voice_id configurados, devuelve None.
     - Si falla la llamada a ElevenLabs, devuelve None (para no romper el flujo del chat).
-    - Si funciona, guarda el audio en MEDIA_DIR y devuelve la URL relativa (/media/xxx.mp3).
+    - Si funciona, guarda el audio en MEDIA_DIR y devuelve la URL relativa (/media/<hash>.mp3).
+    - El audio se cachea por hash de (texto, voz, modelo, voice_settings): un texto repetido
+      devuelve el mismo archivo sin llamar a ElevenLabs.
     """
-    if not settings.ELEVENLABS_API_KEY or not settings.ELEVENLABS_VOICE_ID:
+    if not tts_is_configured():
         # No está configurado ElevenLabs, seguimos solo con texto
         return None
 
-    # Endpoint oficial TTS HTTP (no streaming)
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{settings.ELEVENLABS_VOICE_ID}"
+    cache_key = _cache_key(text)
+    cached_url = await tts_cache.alookup(cache_key)
+    if cached_url:
+        return cached_url
 
-    headers = {
-        "xi-api-key": settings.ELEVENLABS_API_KEY,
-        "Content-Type": "application/json",
-    }
+    # El mismo texto sintetizándose a la vez (mismo cache_key) comparte una sola llamada
+    return await tts_flights.do(cache_key, lambda: _synthesize(text, cache_key))
 
-    payload = {
-        "text": text,
-        "model_id": "eleven_multilingual_v2",
-        "voice_settings": {
-            "stability": 0.5,
-            "similarity_boost": 0.8,
-            "style": 0.0,
-            "use_speaker_boost": True,
-        },
-    }
 
+async def _synthesize(text: str, cache_key: str) -> Optional[str]:
     try:
-        async with httpx.AsyncClient(timeout=60) as client:
-            resp = await client.post(url, headers=headers, json=payload)
-            resp.raise_for_status()
-            audio_bytes = resp.content
+        await tts_rate_limit.acquire()
+        audio_bytes = await tts_resilience.call(lambda: get_tts_backend().synthesize(text))
+    except (CircuitOpenError, RateLimitedError):
+        # ElevenLabs caído o sin cupo: respuesta solo texto, sin esperar timeouts
+        return None
     except Exception as e:
-        # Puedes loguear si quieres
-        print(f"[ElevenLabs] Error generando audio: {e}")
+        logger.warning("[ElevenLabs] Error generando audio: %r", e)
         return None
 
-    # Guardar audio en disco
-    os.makedirs(settings.MEDIA_DIR, exist_ok=True)
-    filename = f"{uuid.uuid4()}.mp3"
-    filepath = os.path.join(settings.MEDIA_DIR, filename)
+    # Guardar audio en disco (caché). URL que el front puede usar: BASE_URL + audio_url
+    return await tts_cache.astore(cache_key, audio_bytes)
+
+
+async def tts_open_audio_stream(text: str) -> Optional[AsyncIterator[bytes]]:
+    """
+    Abre el streaming de audio del backend TTS y devuelve un iterador de chunks MP3.
+    - Devuelve None si el proveedor responde con error (antes de enviar nada al cliente).
+    - Cada chunk se escribe también a disco (tee); al terminar, el archivo entra al caché
+      y los replays salen de /media sin volver a llamar a ElevenLabs.
+    - En memoria solo vive un chunk a la vez, sin importar lo largo del audio.
+    """
+    if not tts_is_configured():
+        return None
+
+    cache_key = _cache_key(text)
+
+    try:
+        await tts_rate_limit.acquire()
+        # sin hedging: dos streams abiertos para el mismo audio no tienen sentido
+        upstream = await tts_resilience.call(
+            lambda: get_tts_backend().open_stream(text), hedge=False
+        )
+    except (CircuitOpenError, RateLimitedError):
+        return None
+    except Exception as e:
+        logger.warning("[ElevenLabs] Error abriendo stream de audio: %r", e)
+        return None
+
+    async def chunks() -> AsyncIterator[bytes]:
+        tmp_path = tts_cache.temp_path_for(cache_key)
+        completed = False
+        try:
+            with open(tmp_path, "wb") as f:
+                async for chunk in upstream:
+                    f.write(chunk)
+                    yield chunk
+            completed = True
+        finally:
+            await upstream.aclose()
+            if completed:
+                await tts_cache.astore_file(cache_key, tmp_path)
+            else:
+                # stream cortado (cliente se fue o falló ElevenLabs): no cacheamos audio a medias
+                await asyncio.to_thread(_discard, tmp_path)
+
+    return chunks()
 
-    with open(filepath, "wb") as f:
-        f.write(audio_bytes)
 
-    # URL que el front puede usar: BASE_URL + audio_url
-    return f"/media/{filename}"
+def _discard(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,162 @@
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.services.shared_state import SharedStateBackend, shared_state
+
+# Versión del catálogo en el estado compartido: cada escritura al catálogo la sube
+_VERSION_KEY = "version"
+_VERSION_TTL_SECONDS = 365 * 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class CatalogExercise:
+    """
+    Copia de solo lectura de un Exercise (no depende de ninguna sesión de BD).
+    """
+
+    id: int
+    name: str
+    muscle_group: Optional[str]
+    equipment: Optional[str]
+    level: Optional[str]
+
+    @classmethod
+    def from_model(cls, ex: models.Exercise) -> "CatalogExercise":
+        return cls(
+            id=ex.id,
+            name=ex.name,
+            muscle_group=ex.muscle_group,
+            equipment=ex.equipment,
+            level=ex.level,
+        )
+
+
+class _CatalogIndex:
+    """
+    Índices inmutables del catálogo; reload() construye uno nuevo y lo reemplaza entero.
+    """
+
+    def __init__(self, exercises: List[CatalogExercise]):
+        self.by_id: Dict[int, CatalogExercise] = {}
+        self.by_muscle_group: Dict[Optional[str], List[CatalogExercise]] = {}
+        self.by_equipment: Dict[Optional[str], List[CatalogExercise]] = {}
+        self.by_level: Dict[Optional[str], List[CatalogExercise]] = {}
+        # todas las listas quedan ordenadas por id (el mismo orden que devolvía la BD)
+        for ex in sorted(exercises, key=lambda e: e.id):
+            self.by_id[ex.id] = ex
+            self.by_muscle_group.setdefault(ex.muscle_group, []).append(ex)
+            self.by_equipment.setdefault(ex.equipment, []).append(ex)
+            self.by_level.setdefault(ex.level, []).append(ex)
+
+
+class ExerciseCatalog:
+    """
+    Catálogo de ejercicios en memoria, indexado por id, muscle_group, equipment y level.
+    - Se carga al arrancar la app y se recarga después de cualquier escritura al catálogo
+      (por ejemplo /setup/seed).
+    - Es read-through: si se pide un id que no está (otro proceso lo acaba de crear),
+      se busca en la BD y se agrega.
+    - Si nadie lo cargó (scripts, consola), la primera lectura lo carga con la sesión recibida.
+    - Con estado compartido, changed() sube una versión común y cada lectura la compara
+      con la que cargó: los otros workers recargan antes de armar un plan nuevo.
+    """
+
+    def __init__(self, versions: Optional[SharedStateBackend] = None):
+        self.versions = versions
+        self._index: Optional[_CatalogIndex] = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+        self.loads = 0
+        self.read_through = 0
+        self.stale_reloads = 0
+
+    def _shared_version(self) -> int:
+        if self.versions is None:
+            return 0
+        return self.versions.get(_VERSION_KEY) or 0
+
+    def reload(self, db: Session) -> int:
+        """
+        Lee todo el catálogo de la BD y reemplaza los índices. Devuelve cuántos ejercicios hay.
+        """
+        # la versión se lee antes: un cambio que llegue durante la carga fuerza otra recarga
+        version = self._shared_version()
+        exercises = [CatalogExercise.from_model(ex) for ex in db.query(models.Exercise).all()]
+        index = _CatalogIndex(exercises)
+        with self._lock:
+            self._index = index
+            self._version = version
+            self.loads += 1
+        return len(exercises)
+
+    def changed(self, db: Session) -> int:
+        """
+        Después de escribir al catálogo: avisa a los demás workers y recarga este.
+        """
+        if self.versions is not None:
+            self.versions.incr(_VERSION_KEY, 1, _VERSION_TTL_SECONDS)
+        return self.reload(db)
+
+    def _get_index(self, db: Session) -> _CatalogIndex:
+        index = self._index
+        if index is None:
+            self.reload(db)
+            index = self._index
+        elif self.versions is not None and self._shared_version() != self._version:
+            # otro worker cambió el catálogo
+            self.stale_reloads += 1
+            self.reload(db)
+            index = self._index
+        return index
+
+    def get(self, db: Session, exercise_id: int) -> Optional[CatalogExercise]:
+        ex = self._get_index(db).by_id.get(exercise_id)
+        if ex is not None:
+            return ex
+
+        row = db.query(models.Exercise).filter(models.Exercise.id == exercise_id).first()
+        if row is None:
+            return None
+        # apareció un ejercicio nuevo: recargamos para que entre también a los otros índices
+        with self._lock:
+            self.read_through += 1
+        self.reload(db)
+        return CatalogExercise.from_model(row)
+
+    def all(self, db: Session) -> List[CatalogExercise]:
+        return list(self._get_index(db).by_id.values())
+
+    def by_muscle_group(self, db: Session, muscle_group: Optional[str]) -> List[CatalogExercise]:
+        return list(self._get_index(db).by_muscle_group.get(muscle_group, []))
+
+    def by_equipment(self, db: Session, equipment: Optional[str]) -> List[CatalogExercise]:
+        return list(self._get_index(db).by_equipment.get(equipment, []))
+
+    def by_level(self, db: Session, level: Optional[str]) -> List[CatalogExercise]:
+        return list(self._get_index(db).by_level.get(level, []))
+
+    def stats(self) -> Dict[str, Any]:
+        index = self._index
+        return {
+            "loaded": index is not None,
+            "exercises": len(index.by_id) if index is not None else 0,
+            "muscle_groups": len(index.by_muscle_group) if index is not None else 0,
+            "loads": self.loads,
+            "read_through": self.read_through,
+            "version": self._version,
+            "stale_reloads": self.stale_reloads,
+        }
+
+
+def _make_catalog() -> ExerciseCatalog:
+    # en memoria no hay otros workers a los que avisar
+    backend = shared_state("exercise_catalog", 4)
+    return ExerciseCatalog(versions=backend if backend.shared else None)
+
+
+exercise_catalog = _make_catalog()
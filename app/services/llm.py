@@ -1,8 +1,17 @@
-from typing import Any, Dict, List
-import openai
+import asyncio
+import logging
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional
+
 from app.core.config import settings
+from app.services.rate_limit import RateLimitedError, llm_rate_limit
+from app.services.resilience import CircuitOpenError, ResilientCaller
+from app.services.single_flight import llm_flights, make_flight_key
+
+if TYPE_CHECKING:
+    # openai (y httpx) tardan en importarse: se cargan al crear el cliente, no al arrancar
+    import openai
 
-openai.api_key = settings.LLM_API_KEY
+logger = logging.getLogger(__name__)
 
 
 SYSTEM_PROMPT_GENERAL = """
@@ -28,6 +37,186 @@ No des planes completos aquí, solo micro-ajustes y motivación para la siguient
 Siempre responde en español.
 """
 
+FALLBACK_RESPONSE = "No tengo una buena respuesta ahora mismo."
+# Respuesta enlatada cuando el LLM no está disponible (circuito abierto, timeouts, errores)
+CANNED_RESPONSE = (
+    "Ahora mismo no puedo pensar con claridad, campeón. "
+    "Sigue con tu plan, cuida la técnica y pregúntame de nuevo en un momento."
+)
+
+
+def is_fallback_response(text: str) -> bool:
+    """
+    True si el texto no salió del LLM (no se debe cachear).
+    """
+    return text in (FALLBACK_RESPONSE, CANNED_RESPONSE)
+
+
+def _is_retryable_llm_error(exc: BaseException) -> bool:
+    return get_llm_backend().is_retryable(exc)
+
+
+llm_resilience = ResilientCaller(
+    "llm",
+    timeout_seconds=settings.LLM_TIMEOUT_SECONDS,
+    max_retries=settings.LLM_MAX_RETRIES,
+    is_retryable=_is_retryable_llm_error,
+    hedge_after_seconds=settings.LLM_HEDGE_AFTER_SECONDS,
+)
+
+
+# Cliente compartido por todo el proceso: se crea en el arranque de la app
+# (lifespan) y se cierra al apagarla, así reutilizamos el pool de conexiones HTTP.
+_client: Optional["openai.AsyncOpenAI"] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def init_llm_client() -> "openai.AsyncOpenAI":
+    """
+    Crea el cliente async de OpenAI con un pool HTTP acotado.
+    Es idempotente: si ya existe, devuelve el mismo.
+    """
+    global _client
+
+    if _client is not None:
+        return _client
+
+    import httpx
+    import openai
+
+    timeout = httpx.Timeout(
+        settings.LLM_TIMEOUT_SECONDS,
+        connect=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+    )
+    http_client = openai.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+        timeout=timeout,
+    )
+    _client = openai.AsyncOpenAI(
+        api_key=settings.LLM_API_KEY,
+        base_url=settings.LLM_BASE_URL,
+        timeout=timeout,
+        # los reintentos (con jitter y circuit breaker) los hace llm_resilience
+        max_retries=0,
+        http_client=http_client,
+    )
+    _get_semaphore()
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # existe aunque el cliente todavía no (sin API key el cliente falla en la llamada, no aquí)
+    global _semaphore
+
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def close_llm_client() -> None:
+    """
+    Cierra el cliente compartido (y su pool de conexiones).
+    """
+    global _client, _semaphore
+
+    if _client is None:
+        return
+    client, _client, _semaphore = _client, None, None
+    await client.close()
+
+
+def get_llm_client() -> "openai.AsyncOpenAI":
+    """
+    Devuelve el cliente compartido, creándolo si la app no pasó por el lifespan
+    (scripts, consola, etc.).
+    """
+    return _client if _client is not None else init_llm_client()
+
+
+class LLMBackend:
+    """
+    Proveedor del LLM. Recibe los mensajes ya armados (system prompt incluido);
+    timeouts, reintentos, breaker, semáforo y single-flight quedan por fuera,
+    así los stubs pasan por el mismo camino que el proveedor real.
+    """
+
+    name = "base"
+
+    async def complete(self, messages: List[Dict[str, str]]) -> str:
+        raise NotImplementedError
+
+    async def open_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Abre la generación en streaming y devuelve un iterador de tokens.
+        Los errores al abrir se lanzan aquí (antes de iterar) para poder reintentarlos.
+        """
+        raise NotImplementedError
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        return False
+
+
+class OpenAILLMBackend(LLMBackend):
+    name = "openai"
+
+    async def complete(self, messages: List[Dict[str, str]]) -> str:
+        resp = await get_llm_client().chat.completions.create(
+            model=settings.LLM_MODEL,
+            messages=messages,  # type: ignore
+            temperature=0.7,
+            max_tokens=200,
+        )
+        return resp.choices[0].message.content or FALLBACK_RESPONSE
+
+    async def open_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        stream = await get_llm_client().chat.completions.create(
+            model=settings.LLM_MODEL,
+            messages=messages,  # type: ignore
+            temperature=0.7,
+            max_tokens=200,
+            stream=True,
+        )
+
+        async def deltas() -> AsyncIterator[str]:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+
+        return deltas()
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        # conexión, timeouts, 429 y 5xx: vale la pena reintentar; 4xx no
+        import openai
+
+        if isinstance(exc, (openai.APIConnectionError, openai.RateLimitError)):
+            return True
+        return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+_backend: Optional[LLMBackend] = None
+
+
+def get_llm_backend() -> LLMBackend:
+    """
+    Backend elegido con LLM_BACKEND ("openai" o "stub" para pruebas sin red).
+    """
+    global _backend
+
+    if _backend is None:
+        if settings.LLM_BACKEND == "stub":
+            from app.services.stub_providers import StubLLMBackend
+
+            _backend = StubLLMBackend()
+        else:
+            _backend = OpenAILLMBackend()
+    return _backend
+
 
 async def generate_arnold_response(
     messages: List[Dict[str, str]],
@@ -40,15 +229,57 @@ async def generate_arnold_response(
 
     system_prompt = SYSTEM_PROMPT_GENERAL if mode == "general" else SYSTEM_PROMPT_SESSION
 
-    # Adaptado a openai>=1.0, pero simple
-    client = openai.OpenAI(api_key=settings.LLM_API_KEY)
+    chat_messages = [{"role": "system", "content": system_prompt}] + messages
+
+    async def call_llm() -> str:
+        # El semáforo limita cuántas llamadas concurrentes hace este worker al LLM
+        async with _get_semaphore():
+            return await get_llm_backend().complete(chat_messages)
+
+    async def call_upstream() -> str:
+        # el cupo por minuto es de todos los workers: solo lo gasta la llamada que sí sale
+        await llm_rate_limit.acquire()
+        return await llm_resilience.call(call_llm)
+
+    # Prompts idénticos en vuelo al mismo tiempo comparten una sola llamada
+    # (con sus timeouts, reintentos y circuit breaker)
+    key = make_flight_key(settings.LLM_MODEL, mode, messages)
+    try:
+        return await llm_flights.do(key, call_upstream)
+    except (CircuitOpenError, RateLimitedError):
+        return CANNED_RESPONSE
+    except Exception as e:
+        logger.error("LLM no disponible: %r", e)
+        return CANNED_RESPONSE
+
+
+async def stream_arnold_response(
+    messages: List[Dict[str, str]],
+    mode: str = "general",
+) -> AsyncIterator[str]:
+    """
+    Igual que generate_arnold_response, pero va devolviendo los tokens
+    a medida que el LLM los genera (stream=True).
+    """
+
+    system_prompt = SYSTEM_PROMPT_GENERAL if mode == "general" else SYSTEM_PROMPT_SESSION
 
     chat_messages = [{"role": "system", "content": system_prompt}] + messages
 
-    resp = client.chat.completions.create(
-        model=settings.LLM_MODEL,
-        messages=chat_messages,  # type: ignore
-        temperature=0.7,
-        max_tokens=200,
-    )
-    return resp.choices[0].message.content or "No tengo una buena respuesta ahora mismo."
+    async with _get_semaphore():
+        # Solo la apertura pasa por reintentos/breaker (sin hedging: no se duplican streams)
+        try:
+            await llm_rate_limit.acquire()
+            tokens = await llm_resilience.call(
+                lambda: get_llm_backend().open_stream(chat_messages), hedge=False
+            )
+        except (CircuitOpenError, RateLimitedError):
+            yield CANNED_RESPONSE
+            return
+        except Exception as e:
+            logger.error("LLM no disponible: %r", e)
+            yield CANNED_RESPONSE
+            return
+
+        async for delta in tokens:
+            yield delta
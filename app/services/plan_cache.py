@@ -0,0 +1,95 @@
+import threading
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.schemas.workout import WorkoutSetCreate
+from app.services.planner import generate_session_plan_for_today
+from app.services.shared_state import SharedStateBackend, shared_state
+
+
+class PlanCache:
+    """
+    Caché del plan de hoy por usuario para POST /sessions/auto.
+    - El plan solo cambia cuando el usuario completa una sesión o cambia el catálogo,
+      así que se guarda con TTL y se invalida explícitamente en esos dos casos.
+    - La entrada recuerda el día en que se generó: al cambiar de día es un miss.
+    - Vive en el estado compartido: el plan generado por un worker lo sirven todos.
+    """
+
+    def __init__(self, backend: SharedStateBackend, ttl_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return str(user_id)
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.utcnow().date().isoformat()
+
+    def get_plan(self, db: Session, user: models.User) -> List[WorkoutSetCreate]:
+        """
+        Plan de hoy del usuario: del caché si existe, si no lo genera el planner y se guarda.
+        """
+        key = self._key(user.id)
+        today = self._today()
+        cached = self.backend.get(key)
+        if cached is not None and cached.get("day") == today:
+            with self._lock:
+                self.hits += 1
+            return [WorkoutSetCreate.model_validate(s) for s in cached["sets"]]
+
+        with self._lock:
+            self.misses += 1
+        sets_plan = generate_session_plan_for_today(db, user)
+        self.backend.set(
+            key,
+            {"day": today, "sets": [s.model_dump(mode="json") for s in sets_plan]},
+            self.ttl_seconds,
+        )
+        return sets_plan
+
+    def invalidate_user(self, user_id: int) -> None:
+        """
+        Llamar cuando cambia el historial de sesiones completadas del usuario.
+        """
+        self.backend.delete(self._key(user_id))
+        with self._lock:
+            self.invalidations += 1
+
+    def invalidate_all(self) -> None:
+        """
+        Llamar cuando cambia el catálogo de ejercicios (afecta a todos los planes).
+        """
+        self.backend.clear()
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend.name,
+                "entries": self.backend.size(),
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+plan_cache = PlanCache(
+    shared_state("plan", settings.PLAN_CACHE_MAX_ENTRIES),
+    settings.PLAN_CACHE_TTL_SECONDS,
+)
@@ -1,10 +1,11 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from typing import List
 from datetime import datetime, timedelta
 
 from app.db import models
 from app.schemas.workout import WorkoutSetCreate
+from app.services.exercise_catalog import exercise_catalog
+from app.services.training_stats import get_muscle_group_volume
 
 
 def _get_least_trained_muscle_group(db: Session, user_id: int) -> str:
@@ -16,33 +17,15 @@ def _get_least_trained_muscle_group(db: Session, user_id: int) -> str:
 
     seven_days_ago = datetime.utcnow() - timedelta(days=7)
 
-    # join entre WorkoutSet, WorkoutSession y Exercise
-    q = (
-        db.query(
-            models.Exercise.muscle_group,
-            func.sum(
-                (models.WorkoutSet.actual_weight or models.WorkoutSet.target_weight or 0)
-                * (models.WorkoutSet.actual_reps or models.WorkoutSet.target_reps or 0)
-            ).label("volume"),
-        )
-        .join(models.WorkoutSession, models.WorkoutSession.id == models.WorkoutSet.session_id)
-        .join(models.Exercise, models.Exercise.id == models.WorkoutSet.exercise_id)
-        .filter(
-            models.WorkoutSession.user_id == user_id,
-            models.WorkoutSession.started_at >= seven_days_ago,
-            models.WorkoutSession.status == models.SessionStatus.COMPLETED,
-        )
-        .group_by(models.Exercise.muscle_group)
-    )
-
-    volumes = q.all()
+    # Una query agrupada con la misma fórmula de volumen que las métricas
+    # (COALESCE/CASE en SQL, bodyweight cuenta reps); usa el índice (user_id, status, started_at)
+    volumes = get_muscle_group_volume(db, user_id, since=seven_days_ago)
 
     if not volumes:
         return "full_body"
 
-    # Encontrar grupo con menor volumen
-    least = min(volumes, key=lambda x: x.volume or 0)
-    return least.muscle_group
+    # Encontrar grupo con menor volumen (empate: orden alfabético, para que sea determinista)
+    return min(volumes, key=lambda group: (volumes[group], group))
 
 
 def generate_session_plan_for_today(
@@ -57,33 +40,26 @@ def generate_session_plan_for_today(
 
     target_group = _get_least_trained_muscle_group(db, user.id)
 
+    # El catálogo vive en memoria: elegir ejercicios no cuesta queries
     if target_group == "full_body":
         # Tomar 3 ejercicios variados
-        exercises = (
-            db.query(models.Exercise)
-            .order_by(models.Exercise.muscle_group)
-            .limit(3)
-            .all()
-        )
+        exercises = sorted(
+            exercise_catalog.all(db),
+            key=lambda ex: (ex.muscle_group is not None, ex.muscle_group or "", ex.id),
+        )[:3]
     else:
         # Priorizar el grupo menos trabajado, y llenar con otros
-        main_ex = (
-            db.query(models.Exercise)
-            .filter(models.Exercise.muscle_group == target_group)
-            .limit(2)
-            .all()
-        )
-        others = (
-            db.query(models.Exercise)
-            .filter(models.Exercise.muscle_group != target_group)
-            .limit(1)
-            .all()
-        )
+        main_ex = exercise_catalog.by_muscle_group(db, target_group)[:2]
+        others = [
+            ex
+            for ex in exercise_catalog.all(db)
+            if ex.muscle_group is not None and ex.muscle_group != target_group
+        ][:1]
         exercises = main_ex + others
 
     if not exercises:
         # fallback por si acaso
-        exercises = db.query(models.Exercise).limit(3).all()
+        exercises = exercise_catalog.all(db)[:3]
 
     sets: List[WorkoutSetCreate] = []
 
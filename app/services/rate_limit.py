@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.services.shared_state import SharedStateBackend, shared_state
+
+logger = logging.getLogger(__name__)
+
+_WINDOW_SECONDS = 60
+
+
+class RateLimitedError(Exception):
+    """Se acabó el cupo por minuto del proveedor y no alcanzaba a liberarse a tiempo."""
+
+
+class RateLimiter:
+    """
+    Límite de llamadas por minuto a un proveedor, contado en el estado compartido:
+    con varios workers el cupo es uno solo para todos, no uno por proceso.
+    - Ventana fija de un minuto (un contador por minuto de reloj de pared).
+    - Sin cupo se espera a la ventana siguiente si llega en `max_wait_seconds`;
+      si no, RateLimitedError y quien llama degrada como con el proveedor caído.
+    - per_minute None = sin límite.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        per_minute: Optional[int],
+        backend: SharedStateBackend,
+        max_wait_seconds: float,
+    ):
+        self.name = name
+        self.per_minute = per_minute
+        self.backend = backend
+        self.max_wait_seconds = max_wait_seconds
+
+        self.allowed = 0
+        self.waited = 0
+        self.rejected = 0
+
+    async def acquire(self) -> None:
+        if self.per_minute is None:
+            return
+
+        deadline = time.time() + self.max_wait_seconds
+        while True:
+            now = time.time()
+            window = int(now // _WINDOW_SECONDS)
+            # el contador dura dos ventanas para que un reloj algo corrido entre workers no lo pierda
+            count = await self.backend.aincr(f"{self.name}:{window}", 1, 2 * _WINDOW_SECONDS)
+            if count <= self.per_minute:
+                self.allowed += 1
+                return
+
+            next_window = (window + 1) * _WINDOW_SECONDS
+            if next_window > deadline:
+                self.rejected += 1
+                logger.warning("rate limit %s: sin cupo (%s/min)", self.name, self.per_minute)
+                raise RateLimitedError(self.name)
+            self.waited += 1
+            await asyncio.sleep(next_window - now)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "per_minute": self.per_minute,
+            "allowed": self.allowed,
+            "waited": self.waited,
+            "rejected": self.rejected,
+        }
+
+
+_rate_state = shared_state("rate", 64)
+
+llm_rate_limit = RateLimiter(
+    "llm", settings.LLM_RATE_LIMIT_PER_MINUTE, _rate_state, settings.RATE_LIMIT_MAX_WAIT_SECONDS
+)
+tts_rate_limit = RateLimiter(
+    "tts", settings.TTS_RATE_LIMIT_PER_MINUTE, _rate_state, settings.RATE_LIMIT_MAX_WAIT_SECONDS
+)
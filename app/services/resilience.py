@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """El proveedor está marcado como caído: no se intenta la llamada."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por proveedor.
+    - closed: las llamadas pasan; `failure_threshold` fallos seguidos lo abren.
+    - open: todo falla rápido durante `reset_seconds`.
+    - half_open: deja pasar una sola llamada de prueba; si funciona se cierra, si no vuelve a abrirse.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+        self.transitions: Dict[str, int] = {}
+
+    def _move(self, state: str) -> None:
+        if state == self.state:
+            return
+        key = f"{self.state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        logger.warning("circuito %s: %s", self.name, key)
+        self.state = state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._move(HALF_OPEN)
+            # half_open: solo una prueba a la vez
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self._move(CLOSED)
+
+    def release_probe(self) -> None:
+        """La llamada de prueba se canceló sin resultado: otra podrá intentarlo."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._move(OPEN)
+
+
+class ResilientCaller:
+    """
+    Envoltorio común para llamadas a proveedores externos (LLM, TTS):
+    timeout por intento, reintentos con backoff exponencial y jitter completo
+    (solo para errores transitorios), circuit breaker y hedging opcional
+    (si el primer intento tarda más de `hedge_after_seconds` se lanza un segundo
+    en paralelo y gana el primero que termine bien).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout_seconds: float,
+        max_retries: int,
+        is_retryable: Callable[[BaseException], bool],
+        hedge_after_seconds: Optional[float] = None,
+    ):
+        self.name = name
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.is_retryable = is_retryable
+        self.hedge_after_seconds = hedge_after_seconds
+        self.breaker = CircuitBreaker(
+            name, settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS
+        )
+
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.short_circuits = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _retryable(self, exc: BaseException) -> bool:
+        return isinstance(exc, asyncio.TimeoutError) or self.is_retryable(exc)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        cap = min(
+            settings.RETRY_BACKOFF_MAX_SECONDS,
+            settings.RETRY_BACKOFF_BASE_SECONDS * (2 ** attempt),
+        )
+        return random.uniform(0, cap)
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        first = asyncio.ensure_future(fn())
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.hedge_after_seconds)
+            if done:
+                return first.result()
+
+            self.hedges += 1
+            second = asyncio.ensure_future(fn())
+            tasks.add(second)
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # también cuando el timeout del intento corta la espera antes del hedge:
+            # ninguna llamada al proveedor queda corriendo suelta
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], hedge: bool) -> T:
+        if hedge and self.hedge_after_seconds is not None:
+            return await asyncio.wait_for(self._hedged(fn), self.timeout_seconds)
+        return await asyncio.wait_for(fn(), self.timeout_seconds)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], hedge: bool = True) -> T:
+        """
+        Ejecuta `fn` con timeout, reintentos y breaker.
+        Lanza CircuitOpenError si el proveedor está abierto, o el último error si se agotan los intentos.
+        `hedge=False` para llamadas que no se pueden duplicar (por ejemplo abrir un stream).
+        """
+        self.calls += 1
+        if not self.breaker.allow():
+            self.short_circuits += 1
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        is_probe = self.breaker.state == HALF_OPEN
+
+        try:
+            return await self._call_with_retries(fn, hedge)
+        except asyncio.CancelledError:
+            # cancelada en un intento o durante el backoff (cliente SSE que se fue,
+            # tts_jobs.stop()): sin soltar la prueba el breaker quedaría en half_open
+            if is_probe:
+                self.breaker.release_probe()
+            raise
+
+    async def _call_with_retries(self, fn: Callable[[], Awaitable[T]], hedge: bool) -> T:
+        attempt = 0
+        while True:
+            try:
+                result = await self._attempt(fn, hedge)
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                retryable = self._retryable(e)
+                if attempt >= self.max_retries or not retryable:
+                    self.failures += 1
+                    if retryable:
+                        self.breaker.record_failure()
+                    else:
+                        # el proveedor respondió (p. ej. un 400): no cuenta como caída
+                        self.breaker.record_success()
+                    raise
+                attempt += 1
+                self.retries += 1
+                delay = self._backoff(attempt)
+                logger.info("%s: reintento %d en %.2fs (%r)", self.name, attempt, delay, e)
+                await asyncio.sleep(delay)
+                continue
+
+            self.successes += 1
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "transitions": dict(self.breaker.transitions),
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "short_circuits": self.short_circuits,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
@@ -0,0 +1,262 @@
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.shared_state import SharedStateBackend, shared_state
+
+# Preguntas más largas casi nunca se repiten y suelen depender del contexto
+_MAX_QUESTION_CHARS = 200
+_NGRAM = 3
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+# Palabras que cambian la respuesta aunque el resto de la pregunta sea casi igual
+_NEGATIONS = frozenset(
+    ["no", "ni", "nunca", "jamas", "tampoco", "sin", "nada", "nadie", "ningun", "ninguna", "ninguno"]
+)
+# Una pregunta que se entiende sola tiene al menos esto de palabras...
+_STANDALONE_MIN_WORDS = 4
+# ...no arranca como continuación ("y mañana?", "sí, pero...")...
+_FOLLOW_UP_STARTS = frozenset(
+    ["y", "si", "no", "ok", "vale", "bueno", "entonces", "pero", "tambien", "ademas", "o", "mas", "otra", "otro"]
+)
+# ...ni apunta a algo dicho antes
+_BACK_REFERENCES = frozenset(
+    ["eso", "esto", "aquello", "ese", "esa", "esos", "esas", "anterior", "dijiste", "mencionaste", "comentaste"]
+)
+
+
+def normalize_question(text: str) -> str:
+    """
+    Minúsculas, sin tildes, sin signos de puntuación y con espacios colapsados:
+    "¿Qué como antes de entrenar?" -> "que como antes de entrenar".
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_WORD.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def _guard_tokens(normalized: str) -> FrozenSet[str]:
+    """
+    Números y negaciones de la pregunta: "si peso 70 kg" y "si peso 90 kg" se parecen
+    por trigramas pero no tienen la misma respuesta.
+    """
+    return frozenset(
+        token for token in normalized.split() if token in _NEGATIONS or any(ch.isdigit() for ch in token)
+    )
+
+
+def is_standalone_question(question: str) -> bool:
+    """
+    True si la pregunta no depende de la conversación ("¿Cuánta proteína necesito al día?"),
+    False para continuaciones ("sí", "¿y mañana?", "¿por qué eso?").
+    Heurística conservadora: ante la duda no se cachea.
+    """
+    words = normalize_question(question).split()
+    if len(words) < _STANDALONE_MIN_WORDS or words[0] in _FOLLOW_UP_STARTS:
+        return False
+    return not any(word in _BACK_REFERENCES for word in words)
+
+
+def _ngrams(normalized: str) -> FrozenSet[str]:
+    padded = f" {normalized} "
+    if len(padded) <= _NGRAM:
+        return frozenset([padded])
+    return frozenset(padded[i : i + _NGRAM] for i in range(len(padded) - _NGRAM + 1))
+
+
+class ResponseCache:
+    """
+    Caché de respuestas de Arnold para el chat general.
+    - Primero busca la pregunta normalizada exacta; si falla (y el umbral es < 1), la más
+      parecida por similitud de Jaccard entre trigramas de caracteres (índice invertido
+      en memoria), siempre que tenga los mismos números y negaciones.
+    - Solo sirve para preguntas que se entienden sin la conversación: las que la abren
+      o las que son independientes (is_standalone_question). Esas respuestas se generan
+      solo con el perfil y la pregunta, así valen para cualquier punto de la conversación
+      (ver chat.general_chat); las continuaciones no se cachean.
+    - scope "user": cada usuario tiene sus propias entradas (y cambian si cambia su perfil);
+      "global": se comparten, así que las respuestas se generan sin el perfil.
+    - Las respuestas viven en el estado compartido (TTL y desalojo los pone el backend),
+      así una respuesta generada en un worker es hit exacto en todos. El índice de
+      similitud es local: cubre las preguntas que este worker guardó o ya sirvió.
+    - El audio no se guarda aquí: el mismo texto vuelve a dar hit en el caché TTS.
+    """
+
+    def __init__(
+        self,
+        backend: SharedStateBackend,
+        enabled: bool,
+        max_entries: int,
+        ttl_seconds: float,
+        similarity_threshold: float,
+        scope: str,
+    ):
+        self.backend = backend
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.scope = scope
+        # índice local: (scope_key, pregunta) -> trigramas, del menos al más usado
+        self._entries: "OrderedDict[Tuple[Optional[str], str], FrozenSet[str]]" = OrderedDict()
+        # (scope_key, trigrama) -> preguntas que lo contienen
+        self._index: Dict[Tuple[Optional[str], str], Set[str]] = {}
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.latency_saved_seconds = 0.0
+
+    @property
+    def shared_across_users(self) -> bool:
+        return self.scope == "global"
+
+    def _scope_key(self, user_id: int, profile: str) -> Optional[str]:
+        if self.shared_across_users:
+            return None
+        return f"{user_id}.{hashlib.sha256(profile.encode('utf-8')).hexdigest()[:16]}"
+
+    @staticmethod
+    def _backend_key(key: Tuple[Optional[str], str]) -> str:
+        scope_key, normalized = key
+        return f"{'*' if scope_key is None else scope_key}:{normalized}"
+
+    def is_cacheable(self, question: str) -> bool:
+        return self.enabled and 0 < len(question) <= _MAX_QUESTION_CHARS
+
+    def _remove(self, key: Tuple[Optional[str], str]) -> None:
+        grams = self._entries.pop(key, None)
+        if grams is None:
+            return
+        scope_key, normalized = key
+        for gram in grams:
+            bucket = self._index.get((scope_key, gram))
+            if bucket is not None:
+                bucket.discard(normalized)
+                if not bucket:
+                    del self._index[(scope_key, gram)]
+
+    def _add_to_index(self, key: Tuple[Optional[str], str], grams: FrozenSet[str]) -> None:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        scope_key, normalized = key
+        self._entries[key] = grams
+        for gram in grams:
+            self._index.setdefault((scope_key, gram), set()).add(normalized)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _most_similar(
+        self, scope_key: Optional[str], normalized: str, grams: FrozenSet[str]
+    ) -> Optional[Tuple[Tuple[Optional[str], str], float]]:
+        guard = _guard_tokens(normalized)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._index.get((scope_key, gram), ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        best, best_score = None, 0.0
+        for candidate, inter in shared.items():
+            if _guard_tokens(candidate) != guard:
+                continue
+            candidate_grams = self._entries[(scope_key, candidate)]
+            score = inter / (len(grams) + len(candidate_grams) - inter)
+            if score > best_score:
+                best, best_score = candidate, score
+        if best is None:
+            return None
+        return (scope_key, best), best_score
+
+    def lookup(self, user_id: int, profile: str, question: str) -> Optional[str]:
+        """
+        Respuesta cacheada para la pregunta (exacta o suficientemente parecida) o None.
+        `profile` es el bloque de perfil con que se genera la respuesta (ver profile_block).
+        """
+        if not self.is_cacheable(question):
+            return None
+        normalized = normalize_question(question)
+        grams = _ngrams(normalized)
+        key = (self._scope_key(user_id, profile), normalized)
+
+        entry = self.backend.get(self._backend_key(key))
+        similar = False
+        if entry is None and self.similarity_threshold < 1.0:
+            with self._lock:
+                match = self._most_similar(key[0], normalized, grams)
+            if match is not None and match[1] >= self.similarity_threshold:
+                entry = self.backend.get(self._backend_key(match[0]))
+                with self._lock:
+                    if entry is None:
+                        # venció o se desalojó en el backend
+                        self._remove(match[0])
+                    else:
+                        key, similar = match[0], True
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # un hit exacto de algo que guardó otro worker entra también a este índice
+            self._add_to_index(key, grams if not similar else self._entries[key])
+            if similar:
+                self.similar_hits += 1
+            else:
+                self.exact_hits += 1
+            self.latency_saved_seconds += entry["generation_seconds"]
+            return entry["text"]
+
+    def store(
+        self, user_id: int, profile: str, question: str, answer: str, generation_seconds: float
+    ) -> None:
+        if not self.is_cacheable(question) or not answer:
+            return
+        normalized = normalize_question(question)
+        key = (self._scope_key(user_id, profile), normalized)
+
+        self.backend.set(
+            self._backend_key(key),
+            {"text": answer, "generation_seconds": generation_seconds},
+            self.ttl_seconds,
+        )
+        with self._lock:
+            self._add_to_index(key, _ngrams(normalized))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "backend": self.backend.name,
+                "entries": self.backend.size(),
+                "indexed": len(self._entries),
+                "scope": self.scope,
+                "similarity_threshold": self.similarity_threshold,
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "latency_saved_seconds": round(self.latency_saved_seconds, 3),
+            }
+
+
+response_cache = ResponseCache(
+    shared_state("response", settings.RESPONSE_CACHE_MAX_ENTRIES),
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+    scope=settings.RESPONSE_CACHE_SCOPE,
+)
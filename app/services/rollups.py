@@ -0,0 +1,311 @@
+"""
+Rollups incrementales de entrenamiento por usuario y día.
+
+- Se recalculan solo los días afectados cuando una sesión se completa o cambian sus sets.
+- `python -m app.services.rollups` reconstruye todo desde el historial (backfill).
+"""
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, or_
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.services.training_stats import (
+    as_date,
+    e1rm_filter,
+    set_e1rm_expr,
+    set_volume_expr,
+)
+
+ROLLUP_MODELS = (
+    models.DailyTrainingRollup,
+    models.DailyMuscleGroupRollup,
+    models.DailyExerciseBest,
+)
+
+
+def _completed_sessions_filter(
+    user_id: Optional[int] = None,
+    days: Optional[Iterable[date]] = None,
+) -> list:
+    conditions = [
+        models.WorkoutSession.status == models.SessionStatus.COMPLETED,
+        models.WorkoutSession.started_at.isnot(None),
+    ]
+    if user_id is not None:
+        conditions.append(models.WorkoutSession.user_id == user_id)
+    if days is not None:
+        # rangos sobre started_at (usa el índice y no depende del tipo que devuelve date())
+        conditions.append(
+            or_(
+                *[
+                    and_(
+                        models.WorkoutSession.started_at >= datetime.combine(d, datetime.min.time()),
+                        models.WorkoutSession.started_at
+                        < datetime.combine(d + timedelta(days=1), datetime.min.time()),
+                    )
+                    for d in days
+                ]
+            )
+        )
+    return conditions
+
+
+def _compute_rollups(
+    db: Session,
+    user_id: Optional[int] = None,
+    days: Optional[Iterable[date]] = None,
+) -> Tuple[List[dict], List[dict], List[dict]]:
+    """
+    Calcula las filas de las tres tablas de rollup con tres queries agrupadas.
+    """
+    if days is not None:
+        days = list(days)
+    day = func.date(models.WorkoutSession.started_at)
+    conditions = _completed_sessions_filter(user_id, days)
+
+    daily = (
+        db.query(
+            models.WorkoutSession.user_id,
+            day,
+            func.count(func.distinct(models.WorkoutSession.id)),
+            func.count(models.WorkoutSet.id),
+            func.coalesce(func.sum(set_volume_expr()), 0.0),
+        )
+        .outerjoin(models.WorkoutSet, models.WorkoutSet.session_id == models.WorkoutSession.id)
+        .filter(*conditions)
+        .group_by(models.WorkoutSession.user_id, day)
+        .all()
+    )
+
+    muscle_group = func.coalesce(models.Exercise.muscle_group, "unknown")
+    per_group = (
+        db.query(
+            models.WorkoutSession.user_id,
+            day,
+            muscle_group,
+            func.count(func.distinct(models.WorkoutSession.id)),
+            func.count(models.WorkoutSet.id),
+            func.coalesce(func.sum(set_volume_expr()), 0.0),
+        )
+        .join(models.WorkoutSet, models.WorkoutSet.session_id == models.WorkoutSession.id)
+        .join(models.Exercise, models.Exercise.id == models.WorkoutSet.exercise_id)
+        .filter(*conditions)
+        .group_by(models.WorkoutSession.user_id, day, muscle_group)
+        .all()
+    )
+
+    bests = (
+        db.query(
+            models.WorkoutSession.user_id,
+            day,
+            models.WorkoutSet.exercise_id,
+            func.max(set_e1rm_expr()),
+        )
+        .join(models.WorkoutSet, models.WorkoutSet.session_id == models.WorkoutSession.id)
+        .filter(*conditions, *e1rm_filter())
+        .group_by(models.WorkoutSession.user_id, day, models.WorkoutSet.exercise_id)
+        .all()
+    )
+
+    daily_rows = [
+        {
+            "user_id": uid,
+            "day": as_date(d),
+            "session_count": int(sessions),
+            "set_count": int(sets),
+            "volume": float(volume),
+        }
+        for uid, d, sessions, sets, volume in daily
+    ]
+    group_rows = [
+        {
+            "user_id": uid,
+            "day": as_date(d),
+            "muscle_group": mg,
+            "session_count": int(sessions),
+            "set_count": int(sets),
+            "volume": float(volume),
+        }
+        for uid, d, mg, sessions, sets, volume in per_group
+    ]
+    best_rows = [
+        {
+            "user_id": uid,
+            "day": as_date(d),
+            "exercise_id": ex_id,
+            "best_e1rm": float(best),
+        }
+        for uid, d, ex_id, best in bests
+    ]
+    return daily_rows, group_rows, best_rows
+
+
+def _insert_rollups(db: Session, rows: Tuple[List[dict], List[dict], List[dict]]) -> None:
+    for model, model_rows in zip(ROLLUP_MODELS, rows):
+        if model_rows:
+            db.execute(insert(model), model_rows)
+
+
+def refresh_user_days(db: Session, user_id: int, days: Iterable[date]) -> None:
+    """
+    Recalcula los rollups de un usuario solo para los días indicados.
+    No hace commit: se aplica en la misma transacción que el cambio que lo provoca.
+    """
+    days = sorted({d for d in days if d is not None})
+    if not days:
+        return
+
+    db.flush()
+    # Dos refresh del mismo usuario a la vez (p.ej. dos sesiones terminadas el mismo día)
+    # borrarían e insertarían las mismas filas: en Postgres el segundo chocaría con las
+    # unique constraints. Con el usuario bloqueado espera al primero y recalcula después.
+    # En SQLite no hace nada (FOR UPDATE no existe; las escrituras ya van de a una).
+    db.query(models.User.id).filter(models.User.id == user_id).with_for_update().one_or_none()
+    for model in ROLLUP_MODELS:
+        db.execute(
+            delete(model).where(model.user_id == user_id, model.day.in_(days))
+        )
+    _insert_rollups(db, _compute_rollups(db, user_id=user_id, days=days))
+
+
+def refresh_rollups_for_session(
+    db: Session,
+    session: models.WorkoutSession,
+    previous_started_at: Optional[datetime] = None,
+) -> None:
+    """
+    Actualiza los rollups del día de la sesión (y del día anterior si se movió de fecha).
+    """
+    days = [session.started_at.date() if session.started_at else None]
+    if previous_started_at is not None:
+        days.append(previous_started_at.date())
+    refresh_user_days(db, session.user_id, days)
+
+
+def rebuild_rollups(db: Session, user_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Borra y reconstruye los rollups desde el historial (todos los usuarios o uno).
+    """
+    for model in ROLLUP_MODELS:
+        stmt = delete(model)
+        if user_id is not None:
+            stmt = stmt.where(model.user_id == user_id)
+        db.execute(stmt)
+
+    rows = _compute_rollups(db, user_id=user_id)
+    _insert_rollups(db, rows)
+    db.commit()
+
+    return {model.__tablename__: len(model_rows) for model, model_rows in zip(ROLLUP_MODELS, rows)}
+
+
+# ---------------- Lecturas ----------------
+
+def get_total_volume(db: Session, user_id: int) -> float:
+    total = (
+        db.query(func.sum(models.DailyTrainingRollup.volume))
+        .filter(models.DailyTrainingRollup.user_id == user_id)
+        .scalar()
+    )
+    return float(total or 0.0)
+
+
+def get_muscle_group_totals(
+    db: Session,
+    user_id: int,
+    since: date,
+) -> Dict[str, Tuple[int, float]]:
+    """
+    muscle_group -> (sesiones, volumen) desde `since`.
+    """
+    rows = (
+        db.query(
+            models.DailyMuscleGroupRollup.muscle_group,
+            func.sum(models.DailyMuscleGroupRollup.session_count),
+            func.sum(models.DailyMuscleGroupRollup.volume),
+        )
+        .filter(
+            models.DailyMuscleGroupRollup.user_id == user_id,
+            models.DailyMuscleGroupRollup.day >= since,
+        )
+        .group_by(models.DailyMuscleGroupRollup.muscle_group)
+        .all()
+    )
+    return {mg: (int(sessions or 0), float(volume or 0.0)) for mg, sessions, volume in rows}
+
+
+def get_sessions_per_iso_week(
+    db: Session,
+    user_id: int,
+    since: date,
+) -> Dict[Tuple[int, int], int]:
+    """
+    (iso_year, iso_week) -> sesiones completadas desde `since`.
+    """
+    rows = (
+        db.query(models.DailyTrainingRollup.day, models.DailyTrainingRollup.session_count)
+        .filter(
+            models.DailyTrainingRollup.user_id == user_id,
+            models.DailyTrainingRollup.day >= since,
+        )
+        .all()
+    )
+
+    per_week: Dict[Tuple[int, int], int] = {}
+    for day, count in rows:
+        iso = day.isocalendar()
+        key = (iso.year, iso.week)
+        per_week[key] = per_week.get(key, 0) + int(count)
+    return per_week
+
+
+def get_best_e1rm_per_day(
+    db: Session,
+    user_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    exercise_id: Optional[int] = None,
+) -> List[Tuple[date, int, float]]:
+    """
+    Mejor 1RM estimado por (día, ejercicio), fechas inclusivas.
+    Filas: (day, exercise_id, best_e1rm), ordenadas por ejercicio y fecha.
+    """
+    q = db.query(
+        models.DailyExerciseBest.day,
+        models.DailyExerciseBest.exercise_id,
+        models.DailyExerciseBest.best_e1rm,
+    ).filter(models.DailyExerciseBest.user_id == user_id)
+
+    if date_from is not None:
+        q = q.filter(models.DailyExerciseBest.day >= date_from)
+    if date_to is not None:
+        q = q.filter(models.DailyExerciseBest.day <= date_to)
+    if exercise_id is not None:
+        q = q.filter(models.DailyExerciseBest.exercise_id == exercise_id)
+
+    rows = q.order_by(models.DailyExerciseBest.exercise_id, models.DailyExerciseBest.day).all()
+    return [(day, ex_id, float(best)) for day, ex_id, best in rows]
+
+
+def main() -> None:
+    from app.db.session import Base, SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Reconstruye los rollups de entrenamiento desde el historial.")
+    parser.add_argument("--user-id", type=int, default=None, help="Solo este usuario")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        counts = rebuild_rollups(db, user_id=args.user_id)
+    finally:
+        db.close()
+    for table, count in counts.items():
+        print(f"{table}: {count} filas")
+
+
+if __name__ == "__main__":
+    main()
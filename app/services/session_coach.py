@@ -1,5 +1,7 @@
 from sqlalchemy.orm import Session
 from app.db import models
+from app.services.plan_cache import plan_cache
+from app.services.rollups import refresh_rollups_for_session
 
 
 def adjust_session_based_on_feedback(
@@ -39,4 +41,11 @@ def adjust_session_based_on_feedback(
             s.target_weight = round(s.target_weight * factor, 1)
             s.auto_adjusted = True
 
+    # los sets sin resultado cuentan con su target en el volumen de una sesión completada
+    if session.status == models.SessionStatus.COMPLETED:
+        refresh_rollups_for_session(db, session)
+
     db.commit()
+
+    if session.status == models.SessionStatus.COMPLETED:
+        plan_cache.invalidate_user(session.user_id)
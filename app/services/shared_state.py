@@ -0,0 +1,363 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántas escrituras el backend SQLite limpia vencidos y recorta al máximo de entradas
+_SQLITE_PRUNE_EVERY = 256
+# Espera por el lock del archivo fuera del event loop
+_BLOCKING_TIMEOUT_SECONDS = 5.0
+
+# Operaciones que el backend SQLite degradó en el event loop por el archivo ocupado
+_busy_fallbacks = 0
+
+
+class SharedStateBackend:
+    """
+    Almacenamiento clave-valor con TTL para el estado que tiene que verse igual
+    desde todos los workers: cachés, estado de jobs TTS, leases de single-flight
+    y contadores de rate limit. Cada instancia es un namespace.
+    Los valores son serializables a JSON, así un backend compartido (Redis, tabla SQL)
+    puede implementarla sin cambiar a quien la usa.
+    Los métodos a* son las mismas operaciones para llamar desde una corutina: un
+    backend que puede bloquear (lock de archivo, red) las saca del event loop.
+    """
+
+    name = "base"
+    # True si otros procesos ven lo que se escribe aquí
+    shared = False
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        """
+        Escribe solo si la clave no existe (o venció). True si la escribió.
+        """
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int, ttl_seconds: float) -> Optional[int]:
+        """
+        Suma al contador y devuelve el valor nuevo. El TTL corre desde que se crea.
+        None si el backend estaba ocupado y no se pudo contar (ver SQLiteSharedState).
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def size(self) -> Optional[int]:
+        return None
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any, ttl_seconds: float) -> None:
+        self.set(key, value, ttl_seconds)
+
+    async def aadd(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        return self.add(key, value, ttl_seconds)
+
+    async def aincr(self, key: str, amount: int, ttl_seconds: float) -> int:
+        return self.incr(key, amount, ttl_seconds)
+
+    async def adelete(self, key: str) -> None:
+        self.delete(key)
+
+
+class InMemorySharedState(SharedStateBackend):
+    """
+    Backend por defecto: LRU en memoria del proceso con TTL por entrada.
+    Con un solo worker es todo lo que hace falta.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()  # key -> (expira, valor)
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[Tuple[float, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def _put(self, key: str, value: Any, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        with self._lock:
+            self._put(key, value, time.monotonic() + ttl_seconds)
+
+    def add(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._put(key, value, time.monotonic() + ttl_seconds)
+            return True
+
+    def incr(self, key: str, amount: int, ttl_seconds: float) -> int:
+        with self._lock:
+            entry = self._live(key)
+            expires_at, current = entry if entry is not None else (time.monotonic() + ttl_seconds, 0)
+            self._put(key, current + amount, expires_at)
+            return current + amount
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class SQLiteSharedState(SharedStateBackend):
+    """
+    Backend local compartido entre procesos: un archivo SQLite (WAL) que ven todos
+    los workers de la misma máquina. Pensado para probar el despliegue multi-worker
+    sin infraestructura extra; entre nodos hace falta un backend de red.
+    Los vencimientos usan reloj de pared (time.monotonic no se comparte entre procesos).
+
+    Las consultas son por primary key, pero una escritura de otro worker tiene el
+    lock del archivo y la espera bloquearía el event loop:
+    - Los métodos a* (leases de single-flight, contador de rate limit, estado de
+      jobs TTS) corren en un hilo con asyncio.to_thread y esperan el lock completo.
+    - Los métodos sync llamados desde el event loop (cachés) esperan a lo sumo
+      SHARED_STATE_BUSY_TIMEOUT_MS y, si el archivo sigue ocupado, degradan:
+      get -> miss, set/delete/clear -> no se hace, add -> False, incr -> None.
+    - Desde un hilo sin event loop (rutas sync, scripts) se espera como siempre.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: str, namespace: str, max_entries: int):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # una conexión por hilo; en el hilo del event loop con busy timeout corto
+        on_loop = _on_event_loop()
+        attr = "loop_conn" if on_loop else "conn"
+        conn = getattr(self._local, attr, None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            timeout = settings.SHARED_STATE_BUSY_TIMEOUT_MS / 1000 if on_loop else _BLOCKING_TIMEOUT_SECONDS
+            # autocommit: las transacciones se abren a mano con BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shared_state ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            setattr(self._local, attr, conn)
+        return conn
+
+    def _degrade(self, exc: sqlite3.OperationalError, operation: str) -> None:
+        """
+        Deja pasar un "database is locked" solo en el event loop (ver docstring);
+        cualquier otro error, o fuera del loop, se propaga.
+        """
+        global _busy_fallbacks
+        message = str(exc)
+        if not _on_event_loop() or ("locked" not in message and "busy" not in message):
+            raise exc
+        _busy_fallbacks += 1
+        logger.debug("shared state %s ocupado: %s de %s degradado", self.path, operation, self.namespace)
+
+    def _write(self, sql: str, params: tuple) -> None:
+        self._conn().execute(sql, params)
+        self._writes += 1
+        if self._writes % _SQLITE_PRUNE_EVERY == 0:
+            self._prune()
+
+    def _prune(self) -> None:
+        conn = self._conn()
+        conn.execute(
+            "DELETE FROM shared_state WHERE namespace = ? AND expires_at <= ?",
+            (self.namespace, time.time()),
+        )
+        # sobre el máximo se van primero las que vencen antes
+        conn.execute(
+            "DELETE FROM shared_state WHERE namespace = ? AND key IN ("
+            " SELECT key FROM shared_state WHERE namespace = ?"
+            " ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries),
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM shared_state WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, key, time.time()),
+            ).fetchone()
+        except sqlite3.OperationalError as exc:
+            self._degrade(exc, "get")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        try:
+            self._write(
+                "INSERT OR REPLACE INTO shared_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), time.time() + ttl_seconds),
+            )
+        except sqlite3.OperationalError as exc:
+            self._degrade(exc, "set")
+
+    def add(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        try:
+            return self._add(key, value, ttl_seconds)
+        except sqlite3.OperationalError as exc:
+            self._degrade(exc, "add")
+            return False
+
+    def _add(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM shared_state WHERE namespace = ? AND key = ? AND expires_at <= ?",
+                (self.namespace, key, now),
+            )
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO shared_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now + ttl_seconds),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def incr(self, key: str, amount: int, ttl_seconds: float) -> Optional[int]:
+        try:
+            return self._incr(key, amount, ttl_seconds)
+        except sqlite3.OperationalError as exc:
+            self._degrade(exc, "incr")
+            return None
+
+    def _incr(self, key: str, amount: int, ttl_seconds: float) -> int:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM shared_state WHERE namespace = ? AND key = ? AND expires_at <= ?",
+                (self.namespace, key, now),
+            )
+            conn.execute(
+                "INSERT INTO shared_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (namespace, key) DO UPDATE SET value = CAST(value AS INTEGER) + ?",
+                (self.namespace, key, json.dumps(amount), now + ttl_seconds, amount),
+            )
+            (value,) = conn.execute(
+                "SELECT value FROM shared_state WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return int(value)
+
+    def delete(self, key: str) -> None:
+        try:
+            self._conn().execute(
+                "DELETE FROM shared_state WHERE namespace = ? AND key = ?", (self.namespace, key)
+            )
+        except sqlite3.OperationalError as exc:
+            self._degrade(exc, "delete")
+
+    def clear(self) -> None:
+        try:
+            self._conn().execute("DELETE FROM shared_state WHERE namespace = ?", (self.namespace,))
+        except sqlite3.OperationalError as exc:
+            self._degrade(exc, "clear")
+
+    def size(self) -> Optional[int]:
+        (count,) = self._conn().execute(
+            "SELECT COUNT(*) FROM shared_state WHERE namespace = ? AND expires_at > ?",
+            (self.namespace, time.time()),
+        ).fetchone()
+        return count
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl_seconds: float) -> None:
+        await asyncio.to_thread(self.set, key, value, ttl_seconds)
+
+    async def aadd(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        return await asyncio.to_thread(self.add, key, value, ttl_seconds)
+
+    async def aincr(self, key: str, amount: int, ttl_seconds: float) -> int:
+        return await asyncio.to_thread(self.incr, key, amount, ttl_seconds)
+
+    async def adelete(self, key: str) -> None:
+        await asyncio.to_thread(self.delete, key)
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def shared_state(namespace: str, max_entries: int) -> SharedStateBackend:
+    """
+    Namespace del backend elegido con SHARED_STATE_BACKEND ("memory" o "sqlite").
+    """
+    if settings.SHARED_STATE_BACKEND == "sqlite":
+        return SQLiteSharedState(settings.SHARED_STATE_SQLITE_PATH, namespace, max_entries)
+    return InMemorySharedState(max_entries)
+
+
+def shared_state_info() -> Dict[str, Any]:
+    return {
+        "backend": settings.SHARED_STATE_BACKEND,
+        "workers": settings.WORKERS,
+        "path": settings.SHARED_STATE_SQLITE_PATH if settings.SHARED_STATE_BACKEND == "sqlite" else None,
+        "busy_fallbacks": _busy_fallbacks,
+    }
@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import json
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+from app.services.shared_state import SharedStateBackend, shared_state
+
+T = TypeVar("T")
+
+# Entre workers: cada cuánto mira un worker si el que tiene el lease ya publicó el resultado
+_REMOTE_POLL_SECONDS = 0.05
+# El resultado publicado solo tiene que durar lo que tardan en leerlo los que esperaban
+_RESULT_TTL_SECONDS = 30.0
+
+
+def make_flight_key(*parts: Any) -> str:
+    """
+    Hash estable de los parámetros de una llamada (dicts/listas incluidos).
+    """
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Deduplica llamadas idénticas que están en curso al mismo tiempo.
+    - La primera llamada con una key crea la tarea real; las siguientes esperan esa misma tarea.
+    - El resultado o la excepción le llegan a todos.
+    - La tarea corre aparte (shield): si el cliente que la inició se desconecta,
+      los demás no pierden el resultado.
+    - Si la tabla de llamadas en curso está llena, se llama directo sin deduplicar.
+    - Con estado compartido entre workers, la tarea de cada proceso toma además un lease:
+      solo el worker que lo consigue llama al proveedor; los otros esperan el resultado
+      que publica (tiene que ser serializable a JSON). Si el dueño del lease falla,
+      los que esperaban hacen la llamada ellos mismos.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_in_flight: int,
+        shared: Optional[SharedStateBackend] = None,
+        lease_seconds: float = 90.0,
+    ):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.shared = shared
+        self.lease_seconds = lease_seconds
+        self._in_flight: Dict[str, "asyncio.Task[Any]"] = {}
+
+        self.calls = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self.remote_waits = 0
+        self.remote_hits = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        if len(self._in_flight) >= self.max_in_flight:
+            self.bypassed += 1
+            return await fn()
+
+        task = asyncio.ensure_future(fn() if self.shared is None else self._across_workers(key, fn))
+        self._in_flight[key] = task
+
+        def _forget(done: "asyncio.Task[Any]") -> None:
+            if self._in_flight.get(key) is done:
+                del self._in_flight[key]
+            # marcar la excepción como leída aunque todos los que esperaban se hayan ido
+            if not done.cancelled():
+                done.exception()
+
+        task.add_done_callback(_forget)
+        return await asyncio.shield(task)
+
+    async def _across_workers(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        lease_key = f"lease:{key}"
+        token = uuid.uuid4().hex
+        if await self.shared.aadd(lease_key, token, self.lease_seconds):
+            try:
+                result = await fn()
+                await self.shared.aset(f"result:{key}:{token}", {"value": result}, _RESULT_TTL_SECONDS)
+                return result
+            finally:
+                await self.shared.adelete(lease_key)
+
+        # otro worker tiene la llamada en curso: esperamos su resultado
+        self.remote_waits += 1
+        owner = await self.shared.aget(lease_key)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.lease_seconds
+        while owner is not None and loop.time() < deadline:
+            await asyncio.sleep(_REMOTE_POLL_SECONDS)
+            published = await self.shared.aget(f"result:{key}:{owner}")
+            if published is not None:
+                self.remote_hits += 1
+                return published["value"]
+            if await self.shared.aget(lease_key) != owner:
+                # soltó el lease sin publicar nada: falló, probamos nosotros
+                break
+        return await fn()
+
+    def stats(self) -> Dict[str, Any]:
+        data = {
+            "in_flight": len(self._in_flight),
+            "max_in_flight": self.max_in_flight,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+        }
+        if self.shared is not None:
+            data.update(remote_waits=self.remote_waits, remote_hits=self.remote_hits)
+        return data
+
+
+def _make_flights(name: str) -> SingleFlight:
+    # en memoria el lease no aporta nada: el dict de tareas en curso ya deduplica el proceso
+    backend = shared_state(f"flight_{name}", settings.SINGLE_FLIGHT_MAX_IN_FLIGHT)
+    return SingleFlight(
+        name,
+        settings.SINGLE_FLIGHT_MAX_IN_FLIGHT,
+        shared=backend if backend.shared else None,
+        lease_seconds=settings.SINGLE_FLIGHT_LEASE_SECONDS,
+    )
+
+
+llm_flights = _make_flights("llm")
+tts_flights = _make_flights("tts")
@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import math
+import random
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.elevenlabs_client import TTSBackend
+from app.services.llm import LLMBackend
+
+# Vocabulario de las respuestas simuladas (cada palabra cuenta como un token)
+_WORDS = (
+    "vamos campeón hoy toca pierna pecho espalda controla la bajada respira "
+    "mantén el core firme sube el peso descansa dos minutos hidrátate bien "
+    "técnica primero buen trabajo una serie más duerme ocho horas proteína"
+).split()
+
+
+class StubProviderError(Exception):
+    """Fallo simulado de un proveedor (equivale a un 5xx: se reintenta)."""
+
+
+class LatencyModel:
+    """
+    Latencia simulada: log-normal alrededor de la mediana (`jitter` es la sigma;
+    0 = siempre la mediana). Con `seed` la secuencia es reproducible.
+    """
+
+    def __init__(self, median_ms: float, jitter: float, error_rate: float, seed: Optional[int]):
+        self.median_ms = median_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def sample_seconds(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        factor = math.exp(self._random.gauss(0, self.jitter)) if self.jitter > 0 else 1.0
+        return self.median_ms * factor / 1000
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    async def wait(self, name: str) -> None:
+        """
+        Duerme la latencia simulada y, según error_rate, falla al final (como un 5xx lento).
+        """
+        await asyncio.sleep(self.sample_seconds())
+        if self.should_fail():
+            raise StubProviderError(f"{name}: fallo simulado")
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class StubLLMBackend(LLMBackend):
+    """
+    LLM local y determinista para benchmarks sin red.
+    - La respuesta depende solo del último mensaje (mismo prompt -> mismo texto).
+    - STUB_LLM_LATENCY_MS es el tiempo hasta el primer token; después los tokens
+      salen a STUB_LLM_TOKENS_PER_SECOND (complete espera la generación entera).
+    """
+
+    name = "stub"
+
+    def __init__(self):
+        self.latency = LatencyModel(
+            settings.STUB_LLM_LATENCY_MS,
+            settings.STUB_LLM_LATENCY_JITTER,
+            settings.STUB_LLM_ERROR_RATE,
+            settings.STUB_SEED,
+        )
+
+    def _tokens(self, messages: List[Dict[str, str]]) -> List[str]:
+        digest = _digest(messages[-1]["content"] if messages else "")
+        count = max(1, settings.STUB_LLM_RESPONSE_TOKENS)
+        words = [_WORDS[digest[i % len(digest)] * (i + 1) % len(_WORDS)] for i in range(count)]
+        words[0] = words[0].capitalize()
+        return [w + (" " if i < count - 1 else ".") for i, w in enumerate(words)]
+
+    def _token_delay(self) -> float:
+        rate = settings.STUB_LLM_TOKENS_PER_SECOND
+        return 1 / rate if rate > 0 else 0.0
+
+    async def complete(self, messages: List[Dict[str, str]]) -> str:
+        await self.latency.wait("llm")
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self._token_delay() * (len(tokens) - 1))
+        return "".join(tokens)
+
+    async def open_stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        await self.latency.wait("llm")
+        tokens = self._tokens(messages)
+        delay = self._token_delay()
+
+        async def deltas() -> AsyncIterator[str]:
+            for i, token in enumerate(tokens):
+                if i and delay:
+                    await asyncio.sleep(delay)
+                yield token
+
+        return deltas()
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        return isinstance(exc, StubProviderError)
+
+
+class StubTTSBackend(TTSBackend):
+    """
+    TTS local y determinista para benchmarks sin red.
+    - El "audio" son STUB_TTS_BYTES_PER_CHAR bytes por carácter derivados del texto
+      (no es un MP3 reproducible, pero pesa como uno y pasa por el mismo caché).
+    - El streaming entrega chunks de TTS_STREAM_CHUNK_BYTES a STUB_TTS_STREAM_BYTES_PER_SECOND.
+    """
+
+    name = "stub"
+    voice_id = "stub"
+    model_id = "stub"
+
+    def __init__(self):
+        self.latency = LatencyModel(
+            settings.STUB_TTS_LATENCY_MS,
+            settings.STUB_TTS_LATENCY_JITTER,
+            settings.STUB_TTS_ERROR_RATE,
+            settings.STUB_SEED,
+        )
+
+    def _audio(self, text: str) -> bytes:
+        size = max(1, len(text) * settings.STUB_TTS_BYTES_PER_CHAR)
+        block = _digest(text)
+        return (block * (size // len(block) + 1))[:size]
+
+    async def synthesize(self, text: str) -> bytes:
+        await self.latency.wait("tts")
+        return self._audio(text)
+
+    async def open_stream(self, text: str) -> AsyncIterator[bytes]:
+        await self.latency.wait("tts")
+        audio = self._audio(text)
+        chunk_size = settings.TTS_STREAM_CHUNK_BYTES
+        rate = settings.STUB_TTS_STREAM_BYTES_PER_SECOND
+
+        async def chunks() -> AsyncIterator[bytes]:
+            for start in range(0, len(audio), chunk_size):
+                chunk = audio[start : start + chunk_size]
+                if start and rate > 0:
+                    await asyncio.sleep(len(chunk) / rate)
+                yield chunk
+
+        return chunks()
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        return isinstance(exc, StubProviderError)
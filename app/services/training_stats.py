@@ -0,0 +1,130 @@
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Float, case, cast, func
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+
+def compute_set_volume(workout_set: models.WorkoutSet) -> float:
+    """
+    Volumen simple de un set:
+    - Si hay peso (actual o target): weight * reps.
+    - Si no hay peso (ej. flexiones): usamos solo reps.
+    """
+    reps = workout_set.actual_reps or workout_set.target_reps or 0
+    weight = workout_set.actual_weight or workout_set.target_weight
+
+    if reps is None or reps <= 0:
+        return 0.0
+
+    if weight is None:
+        # bodyweight u otros sin peso explícito: tomamos reps como volumen
+        return float(reps)
+
+    return float(weight) * float(reps)
+
+
+# ---------------- Expresiones SQL ----------------
+# Replican compute_set_volume dentro de la BD. El `or` de Python salta valores
+# "falsy" (None y 0), por eso se usa NULLIF(x, 0) antes de cada COALESCE.
+
+def set_reps_expr():
+    """reps = actual_reps or target_reps or 0"""
+    return func.coalesce(
+        func.nullif(models.WorkoutSet.actual_reps, 0),
+        func.nullif(models.WorkoutSet.target_reps, 0),
+        0,
+    )
+
+
+def set_weight_expr():
+    """weight = actual_weight or target_weight (puede quedar NULL)"""
+    return func.coalesce(
+        func.nullif(models.WorkoutSet.actual_weight, 0),
+        models.WorkoutSet.target_weight,
+    )
+
+
+def set_volume_expr():
+    """
+    Volumen de un set en SQL, mismo resultado que compute_set_volume.
+    """
+    reps = set_reps_expr()
+    weight = set_weight_expr()
+    return case(
+        (reps <= 0, 0.0),
+        (weight.is_(None), cast(reps, Float)),
+        else_=cast(weight, Float) * reps,
+    )
+
+
+def set_e1rm_expr():
+    """
+    1RM estimado (Epley) de un set: weight * (1 + reps/30).
+    Solo tiene sentido si reps > 0 y weight > 0 (ver e1rm_filter).
+    """
+    reps = cast(set_reps_expr(), Float)
+    weight = cast(set_weight_expr(), Float)
+    return weight * (1.0 + reps / 30.0)
+
+
+def e1rm_filter():
+    return [set_reps_expr() > 0, set_weight_expr() > 0]
+
+
+def as_date(value) -> date:
+    # func.date devuelve str en SQLite y date en Postgres
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+# ---------------- Agregados por usuario ----------------
+
+def get_session_counts(
+    db: Session,
+    user_id: int,
+) -> Tuple[int, int, Optional[datetime]]:
+    """
+    (total_sessions, completed_sessions, fecha de la última sesión completada) en una sola query.
+    """
+    is_completed = models.WorkoutSession.status == models.SessionStatus.COMPLETED
+    row = (
+        db.query(
+            func.count(models.WorkoutSession.id),
+            func.coalesce(func.sum(case((is_completed, 1), else_=0)), 0),
+            func.max(case((is_completed, models.WorkoutSession.started_at))),
+        )
+        .filter(models.WorkoutSession.user_id == user_id)
+        .one()
+    )
+    return int(row[0]), int(row[1]), row[2]
+
+
+def get_muscle_group_volume(
+    db: Session,
+    user_id: int,
+    since: datetime,
+) -> Dict[str, float]:
+    """
+    muscle_group -> volumen de sesiones completadas desde `since`.
+    """
+    muscle_group = func.coalesce(models.Exercise.muscle_group, "unknown")
+    rows = (
+        db.query(muscle_group, func.sum(set_volume_expr()))
+        .join(models.WorkoutSession, models.WorkoutSession.id == models.WorkoutSet.session_id)
+        .join(models.Exercise, models.Exercise.id == models.WorkoutSet.exercise_id)
+        .filter(
+            models.WorkoutSession.user_id == user_id,
+            models.WorkoutSession.started_at.isnot(None),
+            models.WorkoutSession.started_at >= since,
+            models.WorkoutSession.status == models.SessionStatus.COMPLETED,
+        )
+        .group_by(muscle_group)
+        .all()
+    )
+    return {mg: float(vol or 0.0) for mg, vol in rows}
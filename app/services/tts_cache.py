@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.services.shared_state import SharedStateBackend, shared_state
+
+# Los archivos del caché se llaman <sha256>.mp3, así no tocamos otros archivos de MEDIA_DIR
+_KEY_LENGTH = 64
+_EXTENSION = ".mp3"
+# Total de bytes en el estado compartido; si vence se recalcula del disco
+_TOTAL_KEY = "total_bytes"
+_TOTAL_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+def make_tts_cache_key(
+    text: str,
+    voice_id: str,
+    model_id: str,
+    voice_settings: Dict[str, Any],
+) -> str:
+    """
+    Hash determinista de todo lo que cambia el audio generado.
+    """
+    raw = json.dumps(
+        {
+            "text": text,
+            "voice_id": voice_id,
+            "model_id": model_id,
+            "voice_settings": voice_settings,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Caché de audio en disco, direccionado por contenido.
+    - Cada entrada es MEDIA_DIR/<key>.mp3 y se sirve como /media/<key>.mp3.
+    - Desalojo LRU cuando el total supera max_bytes (el orden se guarda en el mtime
+      de los archivos, así sobrevive a reinicios).
+    - Con varios workers el directorio es el mismo: un audio que escribió otro
+      proceso se adopta en el índice la primera vez que se busca.
+    - Con estado compartido el total de bytes es uno solo para todos los workers
+      (si no, cada uno contaría sus propios archivos y el tope se pasaría N veces).
+      Al superarlo se desaloja por mtime desde el listado del directorio, que es el
+      orden común a todos; quien logra borrar el archivo es quien lo descuenta, y el
+      total se vuelve a fijar con lo que quedó en disco.
+    - Desde el event loop se usan los métodos a*: el stat/utime/replace, el listado
+      del directorio y la espera del lock corren en un hilo con asyncio.to_thread.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, shared: Optional[SharedStateBackend] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> tamaño, del más viejo al más nuevo
+        self._total_bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _is_cache_file(filename: str) -> bool:
+        stem, ext = os.path.splitext(filename)
+        if ext != _EXTENSION or len(stem) != _KEY_LENGTH:
+            return False
+        return all(c in "0123456789abcdef" for c in stem)
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        found = []
+        for filename in os.listdir(self.directory):
+            if not self._is_cache_file(filename):
+                continue
+            st = os.stat(os.path.join(self.directory, filename))
+            found.append((st.st_mtime, filename[:_KEY_LENGTH], st.st_size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._loaded = True
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{_EXTENSION}")
+
+    @staticmethod
+    def url_for(key: str) -> str:
+        return f"/media/{key}{_EXTENSION}"
+
+    def lookup(self, key: str, record_miss: bool = True) -> Optional[str]:
+        """
+        Devuelve la URL del audio si está en caché (y lo marca como usado), si no None.
+        record_miss=False sirve para consultas "de paso" que luego harán la llamada real.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            path = self.path_for(key)
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                os.utime(path, None)
+                self.hits += 1
+                return self.url_for(key)
+
+            # el archivo pudo borrarse a mano (o desalojarlo otro worker)
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            elif os.path.exists(path):
+                # MEDIA_DIR es común a todos los workers: lo escribió otro proceso
+                # (con estado compartido ya lo contó él)
+                self._index(key, os.path.getsize(path))
+                if self.shared is None:
+                    self._evict()
+                os.utime(path, None)
+                self.hits += 1
+                return self.url_for(key)
+            if record_miss:
+                self.misses += 1
+            return None
+
+    def has_url(self, url: str) -> bool:
+        """
+        True si el archivo de una URL /media/<key>.mp3 sigue en disco
+        (ChatMessage.audio_url puede apuntar a un audio que el LRU ya desalojó).
+        """
+        return os.path.exists(os.path.join(self.directory, os.path.basename(url)))
+
+    def temp_path_for(self, key: str) -> str:
+        """
+        Ruta temporal única para ir escribiendo un audio antes de publicarlo.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        return f"{self.path_for(key)}.{uuid.uuid4().hex}.part"
+
+    def store(self, key: str, audio_bytes: bytes) -> str:
+        """
+        Guarda el audio de forma atómica y devuelve su URL.
+        """
+        tmp_path = self.temp_path_for(key)
+        with open(tmp_path, "wb") as f:
+            f.write(audio_bytes)
+        return self.store_file(key, tmp_path)
+
+    def store_file(self, key: str, tmp_path: str) -> str:
+        """
+        Publica en el caché un archivo ya escrito (p.ej. el tee de un stream) y devuelve su URL.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            size = os.path.getsize(tmp_path)
+            path = self.path_for(key)
+            # el mismo audio pudo publicarlo otro worker: reemplazarlo no suma bytes
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._index(key, size)
+            if self.shared is None:
+                self._evict()
+            else:
+                self._account_shared(key, size - previous)
+            return self.url_for(key)
+
+    async def alookup(self, key: str, record_miss: bool = True) -> Optional[str]:
+        return await asyncio.to_thread(self.lookup, key, record_miss)
+
+    async def ahas_url(self, url: str) -> bool:
+        return await asyncio.to_thread(self.has_url, url)
+
+    async def astore(self, key: str, audio_bytes: bytes) -> str:
+        return await asyncio.to_thread(self.store, key, audio_bytes)
+
+    async def astore_file(self, key: str, tmp_path: str) -> str:
+        return await asyncio.to_thread(self.store_file, key, tmp_path)
+
+    def _index(self, key: str, size: int) -> None:
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key)
+        self._entries[key] = size
+        self._total_bytes += size
+
+    def _evict(self) -> None:
+        # Nunca desalojamos la entrada recién añadida
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+            self.evictions += 1
+
+    def _account_shared(self, key: str, delta: int) -> None:
+        total = self.shared.incr(_TOTAL_KEY, delta, _TOTAL_TTL_SECONDS)
+        # None: estado compartido ocupado, lo corrige el próximo recálculo;
+        # total == delta: el contador no existía (primer uso o venció)
+        if total is not None and (total == delta or total > self.max_bytes):
+            self._evict_shared(keep=key)
+
+    def _evict_shared(self, keep: str) -> None:
+        found = []
+        for filename in os.listdir(self.directory):
+            if not self._is_cache_file(filename):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                continue  # lo desalojó otro worker mientras listábamos
+            found.append((st.st_mtime, filename[:_KEY_LENGTH], st.st_size))
+
+        total = sum(size for _, _, size in found)
+        for _, key, size in sorted(found):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self.path_for(key))
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+        self.shared.set(_TOTAL_KEY, total, _TOTAL_TTL_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure_loaded()
+            lookups = self.hits + self.misses
+            total_bytes = self._total_bytes
+            if self.shared is not None:
+                total_bytes = self.shared.get(_TOTAL_KEY) or total_bytes
+            return {
+                "entries": len(self._entries),
+                "total_bytes": total_bytes,
+                "shared_accounting": self.shared is not None,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+def _make_tts_cache() -> TTSCache:
+    # en memoria no hace falta: el índice del proceso ya lleva la cuenta
+    backend = shared_state("tts_cache", 16)
+    return TTSCache(
+        settings.MEDIA_DIR, settings.TTS_CACHE_MAX_BYTES, shared=backend if backend.shared else None
+    )
+
+
+tts_cache = _make_tts_cache()
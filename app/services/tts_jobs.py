@@ -0,0 +1,248 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.db import models
+from app.db.session import AsyncSessionLocal
+from app.services.elevenlabs_client import tts_generate_audio_url
+from app.services.shared_state import SharedStateBackend, shared_state
+
+logger = logging.getLogger(__name__)
+
+# Estados que ve el cliente al consultar el audio de un mensaje
+TTS_PENDING = "pending"
+TTS_READY = "ready"
+TTS_FAILED = "failed"
+TTS_UNAVAILABLE = "unavailable"  # TTS apagado, cola llena o job desconocido
+
+# Cuántos jobs terminados recordamos para poder responder a los polls
+_FINISHED_JOBS_KEPT = 1000
+# Estado publicado en el estado compartido para los polls que caen en otro worker
+_STATUS_TTL_SECONDS = 60 * 60
+_STATUS_POLL_SECONDS = 0.25
+
+
+@dataclass
+class TTSJob:
+    message_id: int
+    text: str
+    status: str = TTS_PENDING
+    audio_url: Optional[str] = None
+    attempts: int = 0
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class TTSJobQueue:
+    """
+    Cola acotada de síntesis TTS con un pool fijo de workers dentro del proceso.
+    Cuando un job termina, actualiza ChatMessage.audio_url en la BD.
+    El estado de cada job se publica en el estado compartido: un poll que llega a
+    otro worker de uvicorn ve el mismo estado que el worker que hace la síntesis.
+    """
+
+    def __init__(
+        self,
+        status_backend: SharedStateBackend,
+        workers: int,
+        max_size: int,
+        max_retries: int,
+        retry_backoff_seconds: float,
+    ):
+        self.status_backend = status_backend
+        self.workers = workers
+        self.max_size = max_size
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[int, TTSJob]" = OrderedDict()  # message_id -> job
+
+        self.enqueued = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """
+        Arranca los workers en el event loop actual.
+        """
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"tts-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._queue = None
+
+    def enqueue(self, message_id: int, text: str) -> Optional[TTSJob]:
+        """
+        Encola la síntesis del mensaje. Devuelve None si la cola está llena.
+        """
+        if not self.running:
+            self.start()
+
+        job = TTSJob(message_id=message_id, text=text)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return None
+
+        self._remember(job)
+        # enqueue es sync: con el archivo ocupado el "pending" puede no publicarse;
+        # el resultado final (_publish) sí espera el lock fuera del event loop
+        self.status_backend.set(str(job.message_id), self._state(job), _STATUS_TTL_SECONDS)
+        self.enqueued += 1
+        return job
+
+    @staticmethod
+    def _state(job: TTSJob) -> Dict[str, Any]:
+        return {"status": job.status, "audio_url": job.audio_url}
+
+    async def _publish(self, job: TTSJob) -> None:
+        await self.status_backend.aset(str(job.message_id), self._state(job), _STATUS_TTL_SECONDS)
+
+    def _snapshot(self, message_id: int) -> Optional[TTSJob]:
+        """
+        Copia del job armada desde el estado compartido (lo encoló otro worker).
+        """
+        return self._from_state(message_id, self.status_backend.get(str(message_id)))
+
+    async def _asnapshot(self, message_id: int) -> Optional[TTSJob]:
+        return self._from_state(message_id, await self.status_backend.aget(str(message_id)))
+
+    @staticmethod
+    def _from_state(message_id: int, state: Optional[Dict[str, Any]]) -> Optional[TTSJob]:
+        if state is None:
+            return None
+        job = TTSJob(message_id=message_id, text="", status=state["status"], audio_url=state["audio_url"])
+        if job.status != TTS_PENDING:
+            job.done.set()
+        return job
+
+    def get(self, message_id: int) -> Optional[TTSJob]:
+        job = self._jobs.get(message_id)
+        return job if job is not None else self._snapshot(message_id)
+
+    async def wait(self, message_id: int, timeout: float) -> Optional[TTSJob]:
+        """
+        Espera (hasta timeout segundos) a que termine el job del mensaje.
+        """
+        job = self._jobs.get(message_id)
+        if job is None:
+            return await self._wait_shared(message_id, timeout)
+        if timeout <= 0:
+            return job
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job
+
+    async def _wait_shared(self, message_id: int, timeout: float) -> Optional[TTSJob]:
+        # el job corre en otro worker: polling al estado compartido
+        deadline = asyncio.get_running_loop().time() + timeout
+        job = await self._asnapshot(message_id)
+        while job is not None and job.status == TTS_PENDING:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(_STATUS_POLL_SECONDS, remaining))
+            job = await self._asnapshot(message_id)
+        return job
+
+    def _remember(self, job: TTSJob) -> None:
+        self._jobs[job.message_id] = job
+        self._jobs.move_to_end(job.message_id)
+        # Olvidar los jobs terminados más viejos (los pendientes siempre se quedan)
+        if len(self._jobs) > _FINISHED_JOBS_KEPT:
+            for message_id, old in list(self._jobs.items()):
+                if len(self._jobs) <= _FINISHED_JOBS_KEPT:
+                    break
+                if old.done.is_set():
+                    del self._jobs[message_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception:
+                logger.exception("TTS job for message %s crashed", job.message_id)
+                job.status = TTS_FAILED
+                job.done.set()
+                await self._publish(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: TTSJob) -> None:
+        audio_url = None
+        while job.attempts <= self.max_retries:
+            job.attempts += 1
+            audio_url = await tts_generate_audio_url(job.text)
+            if audio_url:
+                break
+            if job.attempts <= self.max_retries:
+                await asyncio.sleep(self.retry_backoff_seconds * job.attempts)
+
+        if not audio_url:
+            self.failed += 1
+            job.status = TTS_FAILED
+            job.done.set()
+            await self._publish(job)
+            return
+
+        await _save_audio_url(job.message_id, audio_url)
+        self.succeeded += 1
+        job.audio_url = audio_url
+        job.status = TTS_READY
+        job.done.set()
+        await self._publish(job)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_size": self.max_size,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+        }
+
+
+async def _save_audio_url(message_id: int, audio_url: str) -> None:
+    # los workers corren en el event loop: la escritura va por el engine async
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(models.ChatMessage)
+            .where(models.ChatMessage.id == message_id)
+            .values(audio_url=audio_url)
+        )
+        await db.commit()
+
+
+tts_jobs = TTSJobQueue(
+    status_backend=shared_state("tts_job", settings.TTS_QUEUE_MAX_SIZE + _FINISHED_JOBS_KEPT),
+    workers=settings.TTS_WORKERS,
+    max_size=settings.TTS_QUEUE_MAX_SIZE,
+    max_retries=settings.TTS_MAX_RETRIES,
+    retry_backoff_seconds=settings.TTS_RETRY_BACKOFF_SECONDS,
+)
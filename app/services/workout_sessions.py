@@ -0,0 +1,192 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.schemas.workout import (
+    WorkoutSessionOut,
+    WorkoutSetCreate,
+    WorkoutSetOut,
+    WorkoutSetResultsBatch,
+    WorkoutSetResultsOut,
+)
+from app.services.plan_cache import plan_cache
+from app.services.rollups import refresh_rollups_for_session
+
+
+class InvalidSetResultsError(ValueError):
+    """El lote trae sets repetidos o que no son de la sesión."""
+
+
+class OperationConflictError(ValueError):
+    """El operation_id ya se usó para otra sesión."""
+
+
+def create_session_with_sets(
+    db: Session,
+    user_id: int,
+    sets: List[WorkoutSetCreate],
+    fatigue_before: Optional[float] = None,
+    sleep_hours_last_night: Optional[float] = None,
+    notes: Optional[str] = None,
+) -> WorkoutSessionOut:
+    """
+    Crea una sesión PLANNED con todos sus sets en una sola transacción.
+    - La sesión es un INSERT; los sets van en un único INSERT masivo con RETURNING.
+    - La respuesta se arma con lo que ya tenemos en memoria, sin refresh:
+      el número de statements no depende de cuántos sets tenga la sesión.
+    """
+    session = models.WorkoutSession(
+        user_id=user_id,
+        started_at=datetime.utcnow(),
+        status=models.SessionStatus.PLANNED,
+        fatigue_before=fatigue_before,
+        sleep_hours_last_night=sleep_hours_last_night,
+        notes=notes,
+    )
+    db.add(session)
+    db.flush()  # para tener session.id
+
+    rows = [
+        {
+            "session_id": session.id,
+            "exercise_id": s.exercise_id,
+            "exercise_order": s.exercise_order,
+            "set_number": s.set_number,
+            "target_reps": s.target_reps,
+            "target_weight": s.target_weight,
+            "auto_adjusted": False,
+        }
+        for s in sets
+    ]
+    created_sets: List[WorkoutSetOut] = []
+    if rows:
+        # RETURNING de todas las columnas: la respuesta sale de lo que insertó la BD,
+        # sin depender del orden en que vuelvan las filas
+        returned = db.execute(
+            insert(models.WorkoutSet).returning(*models.WorkoutSet.__table__.c),
+            rows,
+        )
+        created_sets = sorted(
+            (WorkoutSetOut.model_validate(row) for row in returned),
+            key=lambda s: s.id,
+        )
+
+    # Armar la respuesta antes del commit: después del commit los atributos
+    # quedan expirados y leerlos costaría otro SELECT.
+    out = WorkoutSessionOut(
+        id=session.id,
+        user_id=session.user_id,
+        started_at=session.started_at,
+        finished_at=None,
+        status=session.status,
+        fatigue_before=session.fatigue_before,
+        sleep_hours_last_night=session.sleep_hours_last_night,
+        notes=session.notes,
+        sets=created_sets,
+    )
+    db.commit()
+    return out
+
+
+def _replayed(
+    operation: models.SetResultsOperation,
+    session: models.WorkoutSession,
+) -> WorkoutSetResultsOut:
+    if operation.session_id != session.id:
+        raise OperationConflictError(
+            f"operation_id {operation.operation_id} was already used for session {operation.session_id}"
+        )
+    return WorkoutSetResultsOut(
+        operation_id=operation.operation_id,
+        session_id=operation.session_id,
+        updated_sets=operation.updated_sets,
+        replayed=True,
+    )
+
+
+def apply_set_results(
+    db: Session,
+    session: models.WorkoutSession,
+    batch: WorkoutSetResultsBatch,
+) -> WorkoutSetResultsOut:
+    """
+    Registra actual_reps / actual_weight / rpe / comment de muchos sets de una sesión.
+    - Idempotente por operation_id: un replay devuelve el resultado original sin escribir.
+    - Valida que todos los sets sean de la sesión (una sola query) antes de escribir.
+    - Aplica todo en un UPDATE masivo por primary key, en la misma transacción que
+      el registro de la operación (y los rollups si la sesión ya estaba completada).
+    """
+    existing = (
+        db.query(models.SetResultsOperation)
+        .filter(models.SetResultsOperation.operation_id == batch.operation_id)
+        .first()
+    )
+    if existing:
+        return _replayed(existing, session)
+
+    set_ids = [r.set_id for r in batch.results]
+    if len(set(set_ids)) != len(set_ids):
+        raise InvalidSetResultsError("Each set can appear only once per batch")
+
+    found = {
+        set_id
+        for (set_id,) in db.query(models.WorkoutSet.id).filter(
+            models.WorkoutSet.session_id == session.id,
+            models.WorkoutSet.id.in_(set_ids),
+        )
+    }
+    missing = [set_id for set_id in set_ids if set_id not in found]
+    if missing:
+        raise InvalidSetResultsError(f"Sets {missing} do not belong to session {session.id}")
+
+    # solo los campos que mandó el cliente; un set sin campos no se toca
+    rows = [
+        {"id": r.set_id, **r.model_dump(exclude_unset=True, exclude={"set_id"})}
+        for r in batch.results
+    ]
+    rows = [row for row in rows if len(row) > 1]
+    if rows:
+        db.execute(update(models.WorkoutSet), rows)
+
+    # después del commit los atributos de `session` quedan expirados
+    session_id, user_id = session.id, session.user_id
+    db.add(
+        models.SetResultsOperation(
+            operation_id=batch.operation_id,
+            session_id=session_id,
+            updated_sets=len(rows),
+        )
+    )
+
+    completed = session.status == models.SessionStatus.COMPLETED
+    if completed:
+        # cambian reps/peso de una sesión ya contada en los rollups
+        refresh_rollups_for_session(db, session)
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # otro request con el mismo operation_id ganó la carrera: es un replay
+        db.rollback()
+        existing = (
+            db.query(models.SetResultsOperation)
+            .filter(models.SetResultsOperation.operation_id == batch.operation_id)
+            .first()
+        )
+        if existing is None:
+            raise
+        return _replayed(existing, session)
+
+    if completed:
+        plan_cache.invalidate_user(user_id)
+
+    return WorkoutSetResultsOut(
+        operation_id=batch.operation_id,
+        session_id=session_id,
+        updated_sets=len(rows),
+        replayed=False,
+    )
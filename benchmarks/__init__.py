@@ -0,0 +1 @@
+# Benchmarks y generadores de datos sintéticos (no se importan desde la app)
@@ -0,0 +1,297 @@
+"""
+Benchmark de la API completa, en proceso (sin red) y con LLM/TTS simulados.
+
+    python -m benchmarks.bench_api --db ./bench_api.db --scenario mixed --requests 2000 --concurrency 32
+
+- Si la BD no existe se genera con benchmarks.dataset (--users/--months).
+- La app se maneja con httpx.ASGITransport dentro de su lifespan.
+- El LLM y ElevenLabs son los backends "stub" (LLM_BACKEND / TTS_BACKEND): sin red ni claves,
+  con latencia, velocidad de tokens y tasa de errores configurables.
+- Por endpoint se reporta p50/p95/p99, throughput, errores y queries SQL por request;
+  con --output se guarda todo en JSON para comparar corridas.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    "chat": {"chat_general": 3, "chat_session": 2, "chat_general_stream": 1},
+    "tts": {"tts_stream": 3, "tts_test": 1},
+    "sessions": {"sessions_auto": 1, "session_get": 3, "session_finish": 1},
+    "metrics": {
+        "user_stats": 2,
+        "strength_progression": 2,
+        "volume_analysis": 1,
+        "muscle_group_frequency": 1,
+        "consistency_analysis": 1,
+    },
+    "mixed": {
+        "chat_general": 3,
+        "chat_session": 2,
+        "sessions_auto": 1,
+        "session_get": 2,
+        "session_finish": 1,
+        "user_stats": 2,
+        "strength_progression": 1,
+        "volume_analysis": 1,
+        "muscle_group_frequency": 1,
+        "consistency_analysis": 1,
+    },
+}
+
+# Contador de queries de la request en curso (lo hereda el threadpool de Starlette)
+_query_counter: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar(
+    "bench_query_counter", default=None
+)
+
+
+def _prepare_environment(args: argparse.Namespace) -> None:
+    """
+    La configuración se lee al importar app.*, así que se fija antes de cualquier import.
+    """
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    os.environ["MEDIA_DIR"] = tempfile.mkdtemp(prefix="arnold_bench_media_")
+    # proveedores locales: el resto de la app (caché, single-flight, breaker) corre igual
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["TTS_BACKEND"] = "stub"
+    # el dataset sintético ya trae catálogo y usuarios: sin demo en el arranque
+    os.environ["SEED_DEMO_DATA"] = "false"
+    os.environ["STUB_SEED"] = str(args.seed)
+    os.environ["STUB_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["STUB_LLM_ERROR_RATE"] = str(args.llm_error_rate)
+    os.environ["STUB_TTS_LATENCY_MS"] = str(args.tts_latency_ms)
+    os.environ["STUB_TTS_ERROR_RATE"] = str(args.tts_error_rate)
+
+
+def _install_query_counter(engine) -> None:
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter = _query_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+def _pick_ids(engine, sample: int, seed: int) -> Tuple[List[int], List[Tuple[int, int]]]:
+    """
+    Usuarios y sesiones existentes sobre los que se reparten las requests.
+    Las sesiones van como (session_id, user_id): /chat/session responde 404
+    si la sesión no es del usuario.
+    """
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        user_ids = [r[0] for r in conn.execute(text("SELECT id FROM users"))]
+        sessions = [
+            (r[0], r[1])
+            for r in conn.execute(
+                text("SELECT id, user_id FROM workout_sessions ORDER BY id DESC LIMIT :n"), {"n": sample * 10}
+            )
+        ]
+    rnd = random.Random(seed)
+    return rnd.sample(user_ids, min(sample, len(user_ids))), sessions
+
+
+def _build_requests(
+    user_ids: List[int], sessions: List[Tuple[int, int]]
+) -> Dict[str, Callable[[random.Random], tuple]]:
+    """
+    endpoint -> función que devuelve (método, path, params, json) aleatorios.
+    """
+    texts = ["¿Qué como antes de entrenar?", "La última serie se sintió muy pesada.", "Fácil, subo peso?"]
+    session_ids = [session_id for session_id, _ in sessions]
+
+    def chat_session(r: random.Random) -> tuple:
+        session_id, owner_id = r.choice(sessions)
+        return (
+            "POST", "/chat/session", None,
+            {"user_id": owner_id, "session_id": session_id, "text": r.choice(texts)},
+        )
+
+    return {
+        "chat_general": lambda r: (
+            "POST", "/chat/general", None, {"user_id": r.choice(user_ids), "text": r.choice(texts)},
+        ),
+        "chat_general_stream": lambda r: (
+            "POST", "/chat/general/stream", None, {"user_id": r.choice(user_ids), "text": r.choice(texts)},
+        ),
+        "chat_session": chat_session,
+        # ~200 textos distintos: mezcla de aciertos y fallos del caché de audio
+        "tts_stream": lambda r: (
+            "POST", "/tts/stream", None, {"text": f"Serie {r.randint(1, 200)}: controla la bajada y respira."},
+        ),
+        "tts_test": lambda r: ("POST", "/tts/test", None, {"text": f"Descansa {r.randint(1, 200)} segundos."}),
+        "sessions_auto": lambda r: ("POST", "/sessions/auto", {"user_id": r.choice(user_ids)}, None),
+        "session_get": lambda r: ("GET", f"/sessions/{r.choice(session_ids)}", None, None),
+        "session_finish": lambda r: ("POST", f"/sessions/{r.choice(session_ids)}/finish", None, None),
+        "user_stats": lambda r: ("GET", f"/users/{r.choice(user_ids)}/stats", None, None),
+        "strength_progression": lambda r: (
+            "GET", f"/users/{r.choice(user_ids)}/strength-progression", None, None,
+        ),
+        "volume_analysis": lambda r: ("GET", f"/users/{r.choice(user_ids)}/volume-analysis", None, None),
+        "muscle_group_frequency": lambda r: (
+            "GET", f"/users/{r.choice(user_ids)}/muscle-group-frequency", None, None,
+        ),
+        "consistency_analysis": lambda r: (
+            "GET", f"/users/{r.choice(user_ids)}/consistency-analysis", None, None,
+        ),
+    }
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _summarize(samples: Dict[str, List[Tuple[float, int, bool]]], elapsed: float) -> Dict[str, dict]:
+    report = {}
+    for name, rows in sorted(samples.items()):
+        latencies = sorted(ms for ms, _, _ in rows)
+        report[name] = {
+            "requests": len(rows),
+            "errors": sum(1 for _, _, ok in rows if not ok),
+            "p50_ms": round(_percentile(latencies, 50), 2),
+            "p95_ms": round(_percentile(latencies, 95), 2),
+            "p99_ms": round(_percentile(latencies, 99), 2),
+            "mean_ms": round(statistics.fmean(latencies), 2),
+            "throughput_rps": round(len(rows) / elapsed, 1),
+            "avg_queries": round(statistics.fmean(q for _, q, _ in rows), 1),
+        }
+    return report
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    import httpx
+
+    from app.db.session import async_engine, async_writer_engine, engine, writer_engine
+    from app.main import app
+
+    _install_query_counter(engine)
+    _install_query_counter(async_engine.sync_engine)
+    # modo SQLite de alta concurrencia: las escrituras van por engines aparte
+    if writer_engine is not None:
+        _install_query_counter(writer_engine)
+    if async_writer_engine is not None:
+        _install_query_counter(async_writer_engine.sync_engine)
+
+    user_ids, sessions = _pick_ids(engine, args.sample_users, args.seed)
+    builders = _build_requests(user_ids, sessions)
+    weights = SCENARIOS[args.scenario]
+    names = list(weights)
+
+    samples: Dict[str, List[Tuple[float, int, bool]]] = {name: [] for name in names}
+    remaining = [args.requests]
+
+    async def worker(client: httpx.AsyncClient, worker_id: int) -> None:
+        rnd = random.Random(args.seed + worker_id)
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            name = rnd.choices(names, weights=[weights[n] for n in names])[0]
+            method, path, params, body = builders[name](rnd)
+
+            counter = [0]
+            token = _query_counter.set(counter)
+            t0 = time.perf_counter()
+            try:
+                resp = await client.request(method, path, params=params, json=body)
+                ok = resp.status_code < 400
+            except Exception:
+                ok = False
+            finally:
+                _query_counter.reset(token)
+            samples[name].append(((time.perf_counter() - t0) * 1000, counter[0], ok))
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            t0 = time.perf_counter()
+            await asyncio.gather(*(worker(client, i) for i in range(args.concurrency)))
+            elapsed = time.perf_counter() - t0
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "db": os.path.abspath(args.db),
+            "scenario": args.scenario,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency_ms,
+            "tts_latency_ms": args.tts_latency_ms,
+            "llm_error_rate": args.llm_error_rate,
+            "tts_error_rate": args.tts_error_rate,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(args.requests / elapsed, 1),
+        },
+        "endpoints": _summarize({k: v for k, v in samples.items() if v}, elapsed),
+    }
+
+
+def _print_report(result: dict) -> None:
+    meta = result["meta"]
+    print(
+        f"escenario={meta['scenario']} requests={meta['requests']} concurrencia={meta['concurrency']} "
+        f"tiempo={meta['elapsed_s']}s throughput={meta['throughput_rps']} req/s"
+    )
+    print(f"{'endpoint':<24}{'n':>6}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>8}{'queries':>9}")
+    for name, row in result["endpoints"].items():
+        print(
+            f"{name:<24}{row['requests']:>6}{row['errors']:>5}{row['p50_ms']:>9.2f}"
+            f"{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['throughput_rps']:>8.1f}{row['avg_queries']:>9.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="./bench_api.db")
+    parser.add_argument("--users", type=int, default=200, help="Usuarios si hay que generar la BD")
+    parser.add_argument("--months", type=int, default=6, help="Meses de historia si hay que generar la BD")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sample-users", type=int, default=50, help="Usuarios distintos que reciben tráfico")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--tts-latency-ms", type=float, default=500.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fracción de llamadas al LLM stub que fallan")
+    parser.add_argument("--tts-error-rate", type=float, default=0.0, help="Fracción de llamadas al TTS stub que fallan")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="Guarda el reporte en JSON")
+    args = parser.parse_args()
+
+    _prepare_environment(args)
+
+    if not os.path.exists(args.db):
+        from sqlalchemy import create_engine
+
+        from benchmarks.dataset import DatasetConfig, generate_dataset
+
+        t0 = time.perf_counter()
+        counts = generate_dataset(
+            create_engine(f"sqlite:///{args.db}"),
+            DatasetConfig(users=args.users, months=args.months),
+        )
+        print(f"dataset generado en {time.perf_counter() - t0:.1f}s: {counts}")
+
+    result = asyncio.run(run_benchmark(args))
+    _print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
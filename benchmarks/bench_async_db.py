@@ -0,0 +1,340 @@
+"""
+Benchmark de la capa de BD: sesiones sync dentro de corutinas vs AsyncSession,
+con carga concurrente mezclada de chat y métricas.
+
+    python -m benchmarks.bench_async_db --db ./bench_api.db --requests 2000 --concurrency 32
+
+- "sync": como estaban las rutas async antes, con Session sync llamada directo
+  desde la corutina (cada query bloquea el event loop y la conexión queda tomada
+  mientras se espera al LLM).
+- "async": como están ahora (AsyncSession, helpers compartidos vía run_sync y la
+  conexión devuelta al pool antes de esperar al LLM).
+- "async_batched": igual que "async" pero las métricas corren sus tres helpers
+  en un solo run_sync, para separar el costo de cada salto run_sync.
+- Chat: guarda el mensaje, arma el contexto, espera la latencia del LLM simulado y guarda la respuesta.
+- Métricas: conteo de sesiones, volumen total y totales por grupo muscular.
+- Por defecto --concurrency (32) supera al pool (5 + 10): en modo sync el checkout
+  bloquea el loop hasta --pool-timeout y la request falla; esos fallos se cuentan
+  aparte como "agotado" (pool exhaustion).
+- Se reporta p50/p95/p99 por tipo, throughput y el lag del event loop
+  (cuánto se atrasa un tick de 10 ms: es lo que sufre cualquier otra request).
+- Aparte, sin concurrencia (--overhead-requests secuenciales de métricas), se mide
+  la latencia que agrega run_sync frente a llamar los helpers directo: con
+  aiosqlite cada query salta a su hilo, así que una request async sin contención
+  es más lenta que la sync aunque no bloquee el loop.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.models import ChatType
+from app.services.chat_context import build_chat_context
+from app.services.rollups import get_muscle_group_totals, get_total_volume
+from app.services.training_stats import get_session_counts
+from benchmarks.dataset import DatasetConfig, generate_dataset
+
+_TICK_SECONDS = 0.01
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _message(user_id: int, role: str, text_: str) -> models.ChatMessage:
+    return models.ChatMessage(user_id=user_id, chat_type=ChatType.GENERAL, role=role, text=text_)
+
+
+def sync_workload(
+    db_path: str, llm_latency: float, pool_size: int, pool_timeout: float
+) -> Dict[str, Callable[[int], Awaitable[None]]]:
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False},
+        pool_size=pool_size,
+        pool_timeout=pool_timeout,
+    )
+    SessionFactory = sessionmaker(bind=engine, autoflush=False)
+
+    async def chat(user_id: int) -> None:
+        db = SessionFactory()
+        try:
+            user = db.get(models.User, user_id)
+            db.add(_message(user_id, "user", "¿Qué entreno hoy?"))
+            db.commit()
+            build_chat_context(db, user, ChatType.GENERAL)
+            await asyncio.sleep(llm_latency)
+            db.add(_message(user_id, "arnold", "Respuesta simulada."))
+            db.commit()
+        finally:
+            db.close()
+
+    async def metrics(user_id: int) -> None:
+        db = SessionFactory()
+        try:
+            cutoff = (datetime.utcnow() - timedelta(days=28)).date()
+            get_session_counts(db, user_id)
+            get_total_volume(db, user_id)
+            get_muscle_group_totals(db, user_id, cutoff)
+        finally:
+            db.close()
+
+    return {"chat": chat, "metrics": metrics}
+
+
+def async_workload(
+    db_path: str, llm_latency: float, pool_size: int, pool_timeout: float
+) -> Dict[str, Callable[[int], Awaitable[None]]]:
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_path}", pool_size=pool_size, pool_timeout=pool_timeout
+    )
+    SessionFactory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def chat(user_id: int) -> None:
+        async with SessionFactory() as db:
+            user = await db.get(models.User, user_id)
+            db.add(_message(user_id, "user", "¿Qué entreno hoy?"))
+            await db.commit()
+            await db.run_sync(build_chat_context, user, ChatType.GENERAL)
+            await db.commit()
+            await asyncio.sleep(llm_latency)
+            db.add(_message(user_id, "arnold", "Respuesta simulada."))
+            await db.commit()
+
+    async def metrics(user_id: int) -> None:
+        async with SessionFactory() as db:
+            cutoff = (datetime.utcnow() - timedelta(days=28)).date()
+            await db.run_sync(get_session_counts, user_id)
+            await db.run_sync(get_total_volume, user_id)
+            await db.run_sync(get_muscle_group_totals, user_id, cutoff)
+
+    return {"chat": chat, "metrics": metrics}
+
+
+def _metrics_totals(db, user_id: int, cutoff) -> None:
+    get_session_counts(db, user_id)
+    get_total_volume(db, user_id)
+    get_muscle_group_totals(db, user_id, cutoff)
+
+
+def async_batched_workload(
+    db_path: str, llm_latency: float, pool_size: int, pool_timeout: float
+) -> Dict[str, Callable[[int], Awaitable[None]]]:
+    workload = async_workload(db_path, llm_latency, pool_size, pool_timeout)
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_path}", pool_size=pool_size, pool_timeout=pool_timeout
+    )
+    SessionFactory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def metrics(user_id: int) -> None:
+        async with SessionFactory() as db:
+            cutoff = (datetime.utcnow() - timedelta(days=28)).date()
+            await db.run_sync(_metrics_totals, user_id, cutoff)
+
+    return {"chat": workload["chat"], "metrics": metrics}
+
+
+async def run_mode(
+    workload: Dict[str, Callable[[int], Awaitable[None]]],
+    user_ids: List[int],
+    args: argparse.Namespace,
+) -> dict:
+    samples: Dict[str, List[Tuple[float, str]]] = {name: [] for name in workload}
+    remaining = [args.requests]
+    lags: List[float] = []
+    running = [True]
+
+    async def ticker() -> None:
+        while running[0]:
+            t0 = time.perf_counter()
+            await asyncio.sleep(_TICK_SECONDS)
+            lags.append((time.perf_counter() - t0 - _TICK_SECONDS) * 1000)
+
+    async def worker(worker_id: int) -> None:
+        rnd = random.Random(args.seed + worker_id)
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            kind = "chat" if rnd.random() < args.chat_ratio else "metrics"
+            t0 = time.perf_counter()
+            try:
+                await workload[kind](rnd.choice(user_ids))
+                outcome = "ok"
+            except PoolTimeoutError:
+                outcome = "exhausted"
+            except Exception:
+                outcome = "error"
+            samples[kind].append(((time.perf_counter() - t0) * 1000, outcome))
+            # Tras un fallo sin await de por medio, cederle el loop a las demás
+            # corutinas; si no, un worker sin conexión vuelve a bloquear en seguida
+            await asyncio.sleep(0)
+
+    tick = asyncio.ensure_future(ticker())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - t0
+    running[0] = False
+    await tick
+
+    report = {
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(sum(len(rows) for rows in samples.values()) / elapsed, 1),
+        "loop_lag_p99_ms": round(_percentile(sorted(lags), 99), 2),
+        "loop_lag_max_ms": round(max(lags, default=0.0), 2),
+        "kinds": {},
+    }
+    for kind, rows in samples.items():
+        if not rows:
+            continue
+        latencies = sorted(ms for ms, _ in rows)
+        report["kinds"][kind] = {
+            "requests": len(rows),
+            "errors": sum(1 for _, outcome in rows if outcome == "error"),
+            "pool_exhausted": sum(1 for _, outcome in rows if outcome == "exhausted"),
+            "p50_ms": round(_percentile(latencies, 50), 2),
+            "p95_ms": round(_percentile(latencies, 95), 2),
+            "p99_ms": round(_percentile(latencies, 99), 2),
+            "mean_ms": round(statistics.fmean(latencies), 2),
+        }
+    return report
+
+
+async def run_overhead(
+    workload: Dict[str, Callable[[int], Awaitable[None]]],
+    user_ids: List[int],
+    requests: int,
+    seed: int,
+) -> dict:
+    """Métricas en serie, sin contención: aísla el costo fijo de cada modo."""
+    rnd = random.Random(seed)
+    latencies = []
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        await workload["metrics"](rnd.choice(user_ids))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    return {
+        "requests": requests,
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+    }
+
+
+def _print_report(result: dict) -> None:
+    print(f"{'':<16}{'reqs':>6}{'err':>5}{'agotado':>9}")
+    for mode, row in result["modes"].items():
+        print(
+            f"{mode:<14} tiempo={row['elapsed_s']}s throughput={row['throughput_rps']} req/s "
+            f"lag loop p99={row['loop_lag_p99_ms']}ms max={row['loop_lag_max_ms']}ms"
+        )
+        for kind, k in row["kinds"].items():
+            print(
+                f"  {kind:<14}{k['requests']:>6}{k['errors']:>5}{k['pool_exhausted']:>9}  "
+                f"p50={k['p50_ms']:.1f}ms p95={k['p95_ms']:.1f}ms p99={k['p99_ms']:.1f}ms"
+            )
+
+    overhead = result.get("run_sync_overhead")
+    if not overhead:
+        return
+    print("métricas en serie (costo de run_sync sin contención):")
+    base = overhead.get("sync")
+    for mode, row in overhead.items():
+        delta = ""
+        if base and mode != "sync":
+            delta = (
+                f"  ({row['p50_ms'] - base['p50_ms']:+.1f}ms p50, "
+                f"{row['mean_ms'] - base['mean_ms']:+.1f}ms media vs sync)"
+            )
+        print(f"  {mode:<14}p50={row['p50_ms']:.1f}ms media={row['mean_ms']:.1f}ms p99={row['p99_ms']:.1f}ms{delta}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="./bench_api.db")
+    parser.add_argument("--users", type=int, default=200, help="Usuarios si hay que generar la BD")
+    parser.add_argument("--months", type=int, default=6, help="Meses de historia si hay que generar la BD")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument(
+        "--concurrency", type=int, default=32,
+        help="Por encima del pool (5 + 10): el modo sync agota conexiones y bloquea el loop",
+    )
+    parser.add_argument("--chat-ratio", type=float, default=0.5, help="Fracción de requests de chat (el resto, métricas)")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--pool-size", type=int, default=5, help="pool_size de ambos engines (overflow 10)")
+    parser.add_argument(
+        "--pool-timeout", type=float, default=0.2,
+        help="Espera máxima por una conexión; en modo sync, con más concurrencia que conexiones, "
+        "el loop queda bloqueado esperando una conexión que solo puede devolver otra corutina "
+        "y la request falla como pool agotado",
+    )
+    parser.add_argument("--modes", default="sync,async,async_batched")
+    parser.add_argument(
+        "--overhead-requests", type=int, default=200,
+        help="Requests de métricas en serie para medir el costo de run_sync (0 lo omite)",
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="Guarda el reporte en JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        t0 = time.perf_counter()
+        counts = generate_dataset(
+            create_engine(f"sqlite:///{args.db}"),
+            DatasetConfig(users=args.users, months=args.months),
+        )
+        print(f"dataset generado en {time.perf_counter() - t0:.1f}s: {counts}")
+
+    with create_engine(f"sqlite:///{args.db}").connect() as conn:
+        user_ids = [r[0] for r in conn.execute(text("SELECT id FROM users"))]
+
+    builders = {"sync": sync_workload, "async": async_workload, "async_batched": async_batched_workload}
+    result = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "db": os.path.abspath(args.db),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "chat_ratio": args.chat_ratio,
+            "llm_latency_ms": args.llm_latency_ms,
+            "pool_size": args.pool_size,
+            "pool_timeout": args.pool_timeout,
+            "overhead_requests": args.overhead_requests,
+        },
+        "modes": {},
+        "run_sync_overhead": {},
+    }
+    for mode in args.modes.split(","):
+        workload = builders[mode](args.db, args.llm_latency_ms / 1000, args.pool_size, args.pool_timeout)
+        result["modes"][mode] = asyncio.run(run_mode(workload, user_ids, args))
+        if args.overhead_requests > 0:
+            result["run_sync_overhead"][mode] = asyncio.run(
+                run_overhead(workload, user_ids, args.overhead_requests, args.seed)
+            )
+
+    _print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark de índices: tiempos de las queries calientes antes y después de ensure_indexes.
+
+    python -m benchmarks.bench_indexes --sets 2000000 --db /tmp/arnold_bench.db
+
+Genera (si no existe) una BD SQLite sintética con benchmarks.dataset, borra los índices compuestos,
+mide, los vuelve a crear con app.db.migrations.ensure_indexes y mide otra vez.
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db import models
+from app.db.migrations import ensure_indexes
+from app.db.session import Base
+from app.services.rollups import get_best_e1rm_per_day, refresh_user_days
+from app.services.training_stats import get_muscle_group_volume, get_session_counts
+from benchmarks.dataset import DatasetConfig, generate_dataset
+
+
+def hot_queries(user_id: int, session_id: int) -> Dict[str, Callable[[Session], object]]:
+    now = datetime.utcnow()
+    return {
+        "session_counts": lambda db: get_session_counts(db, user_id),
+        "planner_7d_group_volume": lambda db: get_muscle_group_volume(db, user_id, now - timedelta(days=7)),
+        "strength_progression": lambda db: get_best_e1rm_per_day(db, user_id),
+        "rollup_refresh_one_day": lambda db: (
+            refresh_user_days(db, user_id, [(now - timedelta(days=3)).date()]),
+            db.rollback(),
+        ),
+        "coach_pending_sets": lambda db: db.query(models.WorkoutSet)
+        .filter(models.WorkoutSet.session_id == session_id, models.WorkoutSet.actual_reps.is_(None))
+        .all(),
+        "chat_history": lambda db: db.query(models.ChatMessage)
+        .filter(models.ChatMessage.user_id == user_id, models.ChatMessage.chat_type == models.ChatType.SESSION)
+        .order_by(models.ChatMessage.timestamp.desc())
+        .limit(20)
+        .all(),
+    }
+
+
+def time_queries(SessionFactory, queries, repeat: int) -> Dict[str, float]:
+    results = {}
+    for name, fn in queries.items():
+        samples: List[float] = []
+        for _ in range(repeat):
+            db = SessionFactory()
+            try:
+                t0 = time.perf_counter()
+                fn(db)
+                samples.append((time.perf_counter() - t0) * 1000)
+            finally:
+                db.close()
+        results[name] = statistics.median(samples)
+    return results
+
+
+def drop_model_indexes(engine) -> None:
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        conn.execute(text("ANALYZE"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="./bench_indexes.db")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--sets", type=int, default=2_000_000, help="Sets aproximados a generar")
+    parser.add_argument("--sets-per-session", type=int, default=12)
+    parser.add_argument("--sessions-per-week", type=float, default=3.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{args.db}")
+    SessionFactory = sessionmaker(bind=engine, autoflush=False)
+
+    if not os.path.exists(args.db) or os.path.getsize(args.db) == 0:
+        # meses de historia necesarios para llegar a ~args.sets
+        sets_per_month = args.users * args.sessions_per_week * 30.4 / 7 * args.sets_per_session
+        config = DatasetConfig(
+            users=args.users,
+            months=max(1, math.ceil(args.sets / sets_per_month)),
+            sessions_per_week=args.sessions_per_week,
+            sets_per_session=args.sets_per_session,
+        )
+        t0 = time.perf_counter()
+        counts = generate_dataset(engine, config)
+        print(f"BD sintética generada en {time.perf_counter() - t0:.1f}s: {counts}")
+
+    with engine.connect() as conn:
+        n_sets = conn.execute(text("SELECT COUNT(*) FROM workout_sets")).scalar()
+        user_id = args.users // 2 or 1
+        session_id = conn.execute(
+            text("SELECT MAX(id) FROM workout_sessions WHERE user_id = :u"), {"u": user_id}
+        ).scalar()
+    print(f"{n_sets} sets, midiendo user_id={user_id}")
+
+    queries = hot_queries(user_id, session_id)
+
+    drop_model_indexes(engine)
+    before = time_queries(SessionFactory, queries, args.repeat)
+
+    t0 = time.perf_counter()
+    created = ensure_indexes(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"{len(created)} índices creados en {time.perf_counter() - t0:.1f}s")
+    after = time_queries(SessionFactory, queries, args.repeat)
+
+    print(f"{'query':<28}{'sin índices (ms)':>18}{'con índices (ms)':>18}{'speedup':>10}")
+    for name in queries:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<28}{before[name]:>18.2f}{after[name]:>18.2f}{speedup:>9.1f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {"sets": n_sets, "users": args.users, "before_ms": before, "after_ms": after, "indexes": created},
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Benchmark del modo SQLite de alta concurrencia con escrituras concurrentes.
+
+    python -m benchmarks.bench_sqlite --db ./bench_api.db --requests 3000 --concurrency 32
+
+Modos (todos con AsyncSession sobre aiosqlite, pool 5 + 10):
+- "default": journal rollback (DELETE), sin PRAGMAs, cada sesión escribe por su conexión.
+- "wal": WAL + synchronous/cache_size/mmap_size/busy_timeout, sin escritor único.
+- "wal_writer": lo anterior + WriterRoutingSession (las escrituras hacen cola en una conexión).
+- "wal_writer_mixed": como en la app con SQLITE_HIGH_CONCURRENCY, dos escritores:
+  chat escribe por el escritor async y set_update por el escritor sync en el
+  threadpool (como /sessions/.../sets). Cada cola es de su engine; entre los dos
+  escritores el lock del archivo se resuelve con busy_timeout.
+
+Operaciones:
+- chat: dos commits por mensaje (usuario + Arnold), como /chat/general.
+- set_update: read-modify-write de un set dentro de una transacción, como el ajuste de sesión.
+- read: conteo de sesiones + volumen total, como /users/{id}/stats.
+
+Se reporta throughput, errores ("database is locked") y p50/p95/p99 por operación.
+Cada modo corre sobre una copia de la BD para que empiecen iguales.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.models import ChatType
+from app.db.sqlite import WriterRoutingSession, install_sqlite_pragmas, sqlite_pragmas
+from app.services.rollups import get_total_volume
+from app.services.training_stats import get_session_counts
+from benchmarks.dataset import DatasetConfig, generate_dataset
+
+MODES = ("default", "wal", "wal_writer", "wal_writer_mixed")
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _prepare_copy(source: str, workdir: str, mode: str) -> str:
+    path = os.path.join(workdir, f"{mode}.db")
+    shutil.copyfile(source, path)
+    # el modo del journal queda guardado en el archivo
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA journal_mode=DELETE" if mode == "default" else "PRAGMA journal_mode=WAL")
+    return path
+
+
+def build_workload(
+    path: str, mode: str, pool_timeout: float
+) -> Tuple[Dict[str, Callable[[random.Random], Awaitable[None]]], List]:
+    url = f"sqlite+aiosqlite:///{path}"
+    engines = [create_async_engine(url, pool_size=5, max_overflow=10, pool_timeout=pool_timeout)]
+    session_options = {"autoflush": False, "expire_on_commit": False}
+
+    if mode != "default":
+        install_sqlite_pragmas(engines[0].sync_engine, sqlite_pragmas())
+    if mode in ("wal_writer", "wal_writer_mixed"):
+        writer = create_async_engine(url, pool_size=1, max_overflow=0, pool_timeout=pool_timeout)
+        install_sqlite_pragmas(writer.sync_engine, sqlite_pragmas())
+        engines.append(writer)
+        session_options.update(sync_session_class=WriterRoutingSession, writer=writer.sync_engine)
+
+    SessionFactory = async_sessionmaker(engines[0], **session_options)
+    SyncSessionFactory = None
+    if mode == "wal_writer_mixed":
+        # mismo armado que app.db.session: engine sync de lectura + su propio escritor
+        sync_url = f"sqlite:///{path}"
+        sync_options = {"connect_args": {"check_same_thread": False}, "pool_timeout": pool_timeout}
+        sync_reader = create_engine(sync_url, pool_size=5, max_overflow=10, **sync_options)
+        sync_writer = create_engine(sync_url, pool_size=1, max_overflow=0, **sync_options)
+        for eng in (sync_reader, sync_writer):
+            install_sqlite_pragmas(eng, sqlite_pragmas())
+        engines.extend([sync_reader, sync_writer])
+        SyncSessionFactory = sessionmaker(
+            bind=sync_reader, autoflush=False, class_=WriterRoutingSession, writer=sync_writer
+        )
+
+    with sqlite3.connect(path) as conn:
+        user_ids = [r[0] for r in conn.execute("SELECT id FROM users")]
+        set_ids = [r[0] for r in conn.execute("SELECT id FROM workout_sets ORDER BY random() LIMIT 5000")]
+
+    async def chat(rnd: random.Random) -> None:
+        user_id = rnd.choice(user_ids)
+        async with SessionFactory() as db:
+            for role, body in (("user", "¿Qué entreno hoy?"), ("arnold", "Pierna, sin excusas.")):
+                db.add(models.ChatMessage(user_id=user_id, chat_type=ChatType.GENERAL, role=role, text=body))
+                await db.commit()
+
+    def sync_set_update(set_id: int) -> None:
+        with SyncSessionFactory() as db:
+            wset = db.execute(select(models.WorkoutSet).where(models.WorkoutSet.id == set_id)).scalar_one()
+            wset.actual_reps = (wset.actual_reps or wset.target_reps) + 1
+            db.commit()
+
+    async def set_update(rnd: random.Random) -> None:
+        if SyncSessionFactory is not None:
+            # ruta sync: FastAPI la corre en el threadpool
+            await asyncio.to_thread(sync_set_update, rnd.choice(set_ids))
+            return
+        async with SessionFactory() as db:
+            wset = (
+                await db.execute(select(models.WorkoutSet).where(models.WorkoutSet.id == rnd.choice(set_ids)))
+            ).scalar_one()
+            wset.actual_reps = (wset.actual_reps or wset.target_reps) + 1
+            await db.commit()
+
+    async def read(rnd: random.Random) -> None:
+        user_id = rnd.choice(user_ids)
+        async with SessionFactory() as db:
+            await db.run_sync(get_session_counts, user_id)
+            await db.run_sync(get_total_volume, user_id)
+
+    return {"chat": chat, "set_update": set_update, "read": read}, engines
+
+
+async def run_mode(
+    workload: Dict[str, Callable[[random.Random], Awaitable[None]]],
+    args: argparse.Namespace,
+) -> dict:
+    weights = {"chat": args.chat_weight, "set_update": args.update_weight, "read": args.read_weight}
+    names = list(weights)
+    samples: Dict[str, List[Tuple[float, bool]]] = {name: [] for name in names}
+    errors: Dict[str, int] = {}
+    remaining = [args.requests]
+
+    async def worker(worker_id: int) -> None:
+        rnd = random.Random(args.seed + worker_id)
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            kind = rnd.choices(names, weights=[weights[n] for n in names])[0]
+            t0 = time.perf_counter()
+            try:
+                await workload[kind](rnd)
+                ok = True
+            except Exception as exc:
+                ok = False
+                key = str(getattr(exc, "orig", exc)).splitlines()[0][:80]
+                errors[key] = errors.get(key, 0) + 1
+            samples[kind].append(((time.perf_counter() - t0) * 1000, ok))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    report = {
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "errors": errors,
+        "kinds": {},
+    }
+    for kind, rows in samples.items():
+        if not rows:
+            continue
+        latencies = sorted(ms for ms, _ in rows)
+        report["kinds"][kind] = {
+            "requests": len(rows),
+            "errors": sum(1 for _, ok in rows if not ok),
+            "p50_ms": round(_percentile(latencies, 50), 2),
+            "p95_ms": round(_percentile(latencies, 95), 2),
+            "p99_ms": round(_percentile(latencies, 99), 2),
+            "mean_ms": round(statistics.fmean(latencies), 2),
+        }
+    return report
+
+
+async def _run(path: str, mode: str, args: argparse.Namespace) -> dict:
+    workload, engines = build_workload(path, mode, args.pool_timeout)
+    try:
+        return await run_mode(workload, args)
+    finally:
+        for eng in engines:
+            result = eng.dispose()
+            if asyncio.iscoroutine(result):
+                await result
+
+
+def _print_report(result: dict) -> None:
+    for mode, row in result["modes"].items():
+        print(f"{mode:<17} tiempo={row['elapsed_s']}s throughput={row['throughput_rps']} op/s")
+        for kind, k in row["kinds"].items():
+            print(
+                f"  {kind:<11}{k['requests']:>6}{k['errors']:>5}  p50={k['p50_ms']:.1f}ms "
+                f"p95={k['p95_ms']:.1f}ms p99={k['p99_ms']:.1f}ms"
+            )
+        for message, count in row["errors"].items():
+            print(f"  error x{count}: {message}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="./bench_api.db")
+    parser.add_argument("--users", type=int, default=200, help="Usuarios si hay que generar la BD")
+    parser.add_argument("--months", type=int, default=6, help="Meses de historia si hay que generar la BD")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--chat-weight", type=float, default=0.4)
+    parser.add_argument("--update-weight", type=float, default=0.2)
+    parser.add_argument("--read-weight", type=float, default=0.4)
+    parser.add_argument("--pool-timeout", type=float, default=30.0)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="Guarda el reporte en JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        t0 = time.perf_counter()
+        counts = generate_dataset(
+            create_engine(f"sqlite:///{args.db}"),
+            DatasetConfig(users=args.users, months=args.months),
+        )
+        print(f"dataset generado en {time.perf_counter() - t0:.1f}s: {counts}")
+    with create_engine(f"sqlite:///{args.db}").connect() as conn:
+        # un WAL pendiente de la BD original tiene que quedar dentro del archivo antes de copiarlo
+        conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+
+    result = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "db": os.path.abspath(args.db),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "pragmas": sqlite_pragmas(),
+        },
+        "modes": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="arnold_bench_sqlite_")
+    try:
+        for mode in args.modes.split(","):
+            path = _prepare_copy(args.db, workdir, mode)
+            result["modes"][mode] = asyncio.run(_run(path, mode, args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    _print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark del arranque de un worker: import de app.main y lifespan completo.
+
+    python -m benchmarks.bench_startup --runs 10 --workers 4
+
+Cada medición es un proceso nuevo (como un worker de uvicorn recién lanzado):
+- import: solo `import app.main` (lo que paga cada worker, recarga o test que importa la app).
+- lifespan: import + arranque (bootstrap de la BD bajo lock, clientes, catálogo) + apagado.
+- lifespan_no_bootstrap: igual pero con DB_AUTO_BOOTSTRAP=false (esquema ya preparado aparte).
+- eager_clients: importa openai y httpx antes de la app: lo que costaba cargarlos al arrancar.
+--workers lanza varios procesos a la vez contra la misma BD SQLite (la carrera del bootstrap).
+La primera corrida de "lifespan" crea el esquema y la demo en una BD nueva: se reporta aparte.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+_CHILD = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+if {eager}:
+    import httpx, openai
+import app.main
+imported = time.perf_counter() - t0
+started = None
+if {lifespan}:
+    async def _run():
+        async with app.main.app.router.lifespan_context(app.main.app):
+            return time.perf_counter() - t0
+    started = asyncio.run(_run())
+print(json.dumps({{
+    "import_s": imported,
+    "startup_s": started,
+    "openai_loaded": "openai" in sys.modules,
+    "httpx_loaded": "httpx" in sys.modules,
+}}))
+"""
+
+MODES = {
+    "import": {"eager": False, "lifespan": False, "env": {}},
+    "lifespan": {"eager": False, "lifespan": True, "env": {}},
+    "lifespan_no_bootstrap": {"eager": False, "lifespan": True, "env": {"DB_AUTO_BOOTSTRAP": "false"}},
+    "eager_clients": {"eager": True, "lifespan": False, "env": {}},
+}
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _launch(mode: str, env: Dict[str, str], workers: int) -> List[dict]:
+    spec = MODES[mode]
+    code = _CHILD.format(eager=spec["eager"], lifespan=spec["lifespan"])
+    child_env = {**env, **spec["env"]}
+    t0 = time.perf_counter()
+    procs = [
+        subprocess.Popen([sys.executable, "-c", code], env=child_env, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    rows = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"el proceso de {mode} terminó con código {proc.returncode}")
+        row = json.loads(out.strip().splitlines()[-1])
+        row["wall_s"] = time.perf_counter() - t0
+        rows.append(row)
+    return rows
+
+
+def _summary(rows: List[dict], key: str) -> dict:
+    values = sorted(r[key] for r in rows if r[key] is not None)
+    if not values:
+        return {}
+    return {
+        "p50_ms": round(_percentile(values, 50) * 1000, 1),
+        "p95_ms": round(_percentile(values, 95) * 1000, 1),
+        "min_ms": round(values[0] * 1000, 1),
+        "mean_ms": round(statistics.fmean(values) * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Mediciones por modo")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos lanzados a la vez en cada medición")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--output", default=None, help="Guarda el reporte en JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="arnold_bench_startup_")
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [repo_root, os.environ.get("PYTHONPATH")])),
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'arnold.db')}",
+        "MEDIA_DIR": os.path.join(workdir, "media"),
+        "BOOTSTRAP_LOCK_FILE": os.path.join(workdir, "bootstrap.lock"),
+        "LLM_BACKEND": "stub",
+        "TTS_BACKEND": "stub",
+    }
+
+    result = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "runs": args.runs,
+            "workers": args.workers,
+        },
+        "modes": {},
+    }
+    try:
+        modes = args.modes.split(",")
+        if "lifespan" in modes:
+            # BD nueva: esta corrida hace el DDL y el seed (los demás workers esperan el lock)
+            first = _launch("lifespan", env, args.workers)
+            result["cold_bootstrap"] = {"startup": _summary(first, "startup_s")}
+
+        for mode in modes:
+            rows: List[dict] = []
+            for _ in range(args.runs):
+                rows.extend(_launch(mode, env, args.workers))
+            result["modes"][mode] = {
+                "import": _summary(rows, "import_s"),
+                "startup": _summary(rows, "startup_s"),
+                "openai_loaded": any(r["openai_loaded"] for r in rows),
+                "httpx_loaded": any(r["httpx_loaded"] for r in rows),
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if "cold_bootstrap" in result:
+        print(f"bootstrap en frío (BD nueva): startup p50={result['cold_bootstrap']['startup']['p50_ms']}ms")
+    for mode, row in result["modes"].items():
+        line = f"{mode:<22} import p50={row['import']['p50_ms']}ms p95={row['import']['p95_ms']}ms"
+        if row["startup"]:
+            line += f"  startup p50={row['startup']['p50_ms']}ms p95={row['startup']['p95_ms']}ms"
+        line += f"  openai={'sí' if row['openai_loaded'] else 'no'} httpx={'sí' if row['httpx_loaded'] else 'no'}"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
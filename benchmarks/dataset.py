@@ -0,0 +1,261 @@
+"""
+Generador de datasets sintéticos realistas para capacity planning.
+
+    python -m benchmarks.dataset --db ./bench_api.db --users 1000 --months 12
+
+Todo se inserta con inserts masivos (executemany por bloques) y al final se
+reconstruyen los rollups de métricas.
+"""
+import argparse
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.session import Base
+from app.services.rollups import rebuild_rollups
+
+EXERCISES = [
+    ("Bench Press", "chest", "barbell", "intermediate", 60.0),
+    ("Incline Dumbbell Press", "chest", "dumbbell", "intermediate", 24.0),
+    ("Chest Fly Machine", "chest", "machine", "beginner", 40.0),
+    ("Push Up", "chest", "bodyweight", "beginner", None),
+    ("Lat Pulldown", "back", "machine", "beginner", 55.0),
+    ("Barbell Row", "back", "barbell", "intermediate", 60.0),
+    ("Seated Cable Row", "back", "cable", "beginner", 50.0),
+    ("Pull Up", "back", "bodyweight", "intermediate", None),
+    ("Back Squat", "legs", "barbell", "intermediate", 80.0),
+    ("Leg Press", "legs", "machine", "beginner", 140.0),
+    ("Romanian Deadlift", "legs", "barbell", "intermediate", 70.0),
+    ("Walking Lunge", "legs", "dumbbell", "beginner", 16.0),
+    ("Overhead Press", "shoulders", "barbell", "intermediate", 35.0),
+    ("Lateral Raise", "shoulders", "dumbbell", "beginner", 7.0),
+    ("Barbell Curl", "arms", "barbell", "beginner", 28.0),
+    ("Triceps Pushdown", "arms", "cable", "beginner", 30.0),
+    ("Dumbbell Hammer Curl", "arms", "dumbbell", "beginner", 12.0),
+    ("Dips", "arms", "bodyweight", "intermediate", None),
+]
+
+GOALS = ["hypertrophy", "fat_loss", "strength", "Build Muscle"]
+LEVELS = ["beginner", "intermediate", "advanced"]
+
+USER_LINES = [
+    "La última serie se sintió muy pesada.",
+    "Fácil, creo que puedo subir peso.",
+    "¿Qué como antes de entrenar?",
+    "Dormí poco, ¿bajo la intensidad?",
+    "Me molesta un poco el hombro.",
+    "¿Cuántas series hago hoy?",
+]
+ARNOLD_LINES = [
+    "Bien hecho, baja un 5% el peso en la siguiente serie y cuida la técnica.",
+    "Perfecto, sube 2.5 kg y mantén las reps.",
+    "Come carbohidratos y algo de proteína 1-2 horas antes.",
+    "Sí, hoy mantén el volumen más bajo y evita el fallo.",
+    "Si duele, para ese ejercicio y consulta a un profesional.",
+    "Tres series de 8-12 repeticiones por ejercicio van perfecto.",
+]
+
+_CHUNK = 20_000
+
+
+@dataclass
+class DatasetConfig:
+    users: int = 100
+    months: int = 6
+    sessions_per_week: float = 3.0
+    sets_per_session: int = 12
+    messages_per_session: int = 2
+    general_messages_per_user: int = 20
+    seed: int = 42
+
+
+def _flush(conn, pending: Dict[type, List[dict]], force: bool = False) -> None:
+    """
+    Inserta los bloques pendientes cuando alguno se llena.
+    Siempre en orden sesiones -> sets -> mensajes para respetar las FKs.
+    """
+    if not force and all(len(rows) < _CHUNK for rows in pending.values()):
+        return
+    for model, rows in pending.items():
+        if rows:
+            conn.execute(insert(model), rows)
+            rows.clear()
+
+
+def generate_dataset(engine: Engine, config: DatasetConfig) -> Dict[str, int]:
+    """
+    Crea el esquema y llena la BD. Devuelve el número de filas por tabla.
+    """
+    rnd = random.Random(config.seed)
+    Base.metadata.create_all(bind=engine)
+
+    now = datetime.utcnow()
+    days = int(config.months * 30.4)
+    exercises_per_session = min(len(EXERCISES), max(1, -(-config.sets_per_session // 3)))
+    counts = {"users": config.users, "exercises": len(EXERCISES), "sessions": 0, "sets": 0, "messages": 0}
+
+    with engine.begin() as conn:
+        conn.execute(
+            insert(models.Exercise),
+            [
+                {"id": i + 1, "name": name, "muscle_group": group, "equipment": equip, "level": level}
+                for i, (name, group, equip, level, _) in enumerate(EXERCISES)
+            ],
+        )
+        conn.execute(
+            insert(models.User),
+            [
+                {
+                    "id": u,
+                    "name": f"Synthetic Athlete {u}",
+                    "goal": rnd.choice(GOALS),
+                    "experience_level": rnd.choice(LEVELS),
+                    "weight_kg": round(rnd.uniform(55, 110), 1),
+                    "height_cm": round(rnd.uniform(155, 200), 1),
+                }
+                for u in range(1, config.users + 1)
+            ],
+        )
+
+        session_rows: List[dict] = []
+        set_rows: List[dict] = []
+        message_rows: List[dict] = []
+        pending = {
+            models.WorkoutSession: session_rows,
+            models.WorkoutSet: set_rows,
+            models.ChatMessage: message_rows,
+        }
+        session_id = 0
+
+        for user_id in range(1, config.users + 1):
+            strength = rnd.uniform(0.6, 1.4)
+            # cada usuario entrena con su propia frecuencia alrededor de la media
+            weekly = max(0.5, rnd.gauss(config.sessions_per_week, 1.0))
+            n_sessions = int(days / 7 * weekly)
+
+            for k in range(n_sessions):
+                session_id += 1
+                progress = k / max(1, n_sessions)
+                days_ago = days - int(k * days / max(1, n_sessions))
+                started_at = now - timedelta(days=days_ago, hours=rnd.randint(6, 21), minutes=rnd.randint(0, 59))
+
+                if days_ago <= 1:
+                    status = models.SessionStatus.PLANNED
+                elif rnd.random() < 0.08:
+                    status = models.SessionStatus.CANCELED
+                else:
+                    status = models.SessionStatus.COMPLETED
+                completed = status == models.SessionStatus.COMPLETED
+
+                session_rows.append({
+                    "id": session_id,
+                    "user_id": user_id,
+                    "started_at": started_at,
+                    "finished_at": started_at + timedelta(minutes=rnd.randint(40, 90)) if completed else None,
+                    "status": status.name,
+                    "fatigue_before": rnd.randint(2, 8),
+                    "sleep_hours_last_night": round(rnd.uniform(5, 9), 1),
+                })
+
+                # 3 series por ejercicio hasta completar sets_per_session
+                chosen = rnd.sample(range(len(EXERCISES)), exercises_per_session)
+                for i in range(config.sets_per_session):
+                    ex_index = chosen[(i // 3) % len(chosen)]
+                    base_weight = EXERCISES[ex_index][4]
+                    target_weight = (
+                        round(base_weight * strength * (1 + 0.2 * progress) / 2.5) * 2.5
+                        if base_weight is not None
+                        else None
+                    )
+                    target_reps = rnd.choice([6, 8, 10, 12])
+                    set_rows.append({
+                        "session_id": session_id,
+                        "exercise_id": ex_index + 1,
+                        "exercise_order": i // 3 + 1,
+                        "set_number": i % 3 + 1,
+                        "target_reps": target_reps,
+                        "target_weight": target_weight,
+                        "actual_reps": max(1, target_reps - rnd.randint(0, 2)) if completed else None,
+                        "actual_weight": target_weight if completed else None,
+                        "rpe": round(rnd.uniform(6.5, 9.5), 1) if completed else None,
+                        "auto_adjusted": False,
+                    })
+                    counts["sets"] += 1
+
+                for m in range(config.messages_per_session):
+                    line = rnd.randrange(len(USER_LINES))
+                    for role, text, offset in (("user", USER_LINES[line], 0), ("arnold", ARNOLD_LINES[line], 1)):
+                        message_rows.append({
+                            "user_id": user_id,
+                            "session_id": session_id,
+                            "chat_type": models.ChatType.SESSION.name,
+                            "role": role,
+                            "text": text,
+                            "timestamp": started_at + timedelta(minutes=10 * m + offset),
+                        })
+                        counts["messages"] += 1
+
+                _flush(conn, pending)
+
+            counts["sessions"] += n_sessions
+
+            for m in range(config.general_messages_per_user):
+                line = rnd.randrange(len(USER_LINES))
+                timestamp = now - timedelta(days=rnd.randint(0, days), minutes=rnd.randint(0, 1440))
+                for role, text, offset in (("user", USER_LINES[line], 0), ("arnold", ARNOLD_LINES[line], 1)):
+                    message_rows.append({
+                        "user_id": user_id,
+                        "session_id": None,
+                        "chat_type": models.ChatType.GENERAL.name,
+                        "role": role,
+                        "text": text,
+                        "timestamp": timestamp + timedelta(seconds=offset),
+                    })
+                    counts["messages"] += 1
+
+        _flush(conn, pending, force=True)
+
+    db = sessionmaker(bind=engine)()
+    try:
+        rebuild_rollups(db)
+    finally:
+        db.close()
+
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="./bench_api.db")
+    parser.add_argument("--users", type=int, default=DatasetConfig.users)
+    parser.add_argument("--months", type=int, default=DatasetConfig.months)
+    parser.add_argument("--sessions-per-week", type=float, default=DatasetConfig.sessions_per_week)
+    parser.add_argument("--sets-per-session", type=int, default=DatasetConfig.sets_per_session)
+    parser.add_argument("--messages-per-session", type=int, default=DatasetConfig.messages_per_session)
+    parser.add_argument("--general-messages-per-user", type=int, default=DatasetConfig.general_messages_per_user)
+    parser.add_argument("--seed", type=int, default=DatasetConfig.seed)
+    args = parser.parse_args()
+
+    config = DatasetConfig(
+        users=args.users,
+        months=args.months,
+        sessions_per_week=args.sessions_per_week,
+        sets_per_session=args.sets_per_session,
+        messages_per_session=args.messages_per_session,
+        general_messages_per_user=args.general_messages_per_user,
+        seed=args.seed,
+    )
+    t0 = time.perf_counter()
+    counts = generate_dataset(create_engine(f"sqlite:///{args.db}"), config)
+    print(f"dataset generado en {time.perf_counter() - t0:.1f}s: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import tempfile
+import uuid
+
+import httpx
+import pytest
+
+# Settings se lee al importar app.core.config: el entorno de pruebas va antes de cualquier import de app
+_TMP_DIR = tempfile.mkdtemp(prefix="arnold_tests_")
+
+for _name, _value in {
+    "DATABASE_URL": f"sqlite:///{os.path.join(_TMP_DIR, 'arnold.db')}",
+    "MEDIA_DIR": os.path.join(_TMP_DIR, "media"),
+    "BOOTSTRAP_LOCK_FILE": os.path.join(_TMP_DIR, "bootstrap.lock"),
+    "SHARED_STATE_SQLITE_PATH": os.path.join(_TMP_DIR, "shared_state.db"),
+    "SEED_DEMO_DATA": "false",
+    "LLM_BACKEND": "stub",
+    "TTS_BACKEND": "stub",
+    # stubs rápidos: las pruebas no miden latencia
+    "STUB_LLM_LATENCY_MS": "5",
+    "STUB_TTS_LATENCY_MS": "5",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+
+@pytest.fixture
+def run_app():
+    """
+    Corre `test(client)` con la app levantada (lifespan completo) y un cliente httpx en proceso.
+    """
+    from app.main import app
+
+    def run(test):
+        async def main():
+            async with app.router.lifespan_context(app):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    return await test(client)
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def db():
+    from app.db.bootstrap import bootstrap_database
+    from app.db.session import SessionLocal
+
+    bootstrap_database(seed_demo=False)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_exercise(db):
+    from app.db import models
+
+    def make(muscle_group: str = "legs") -> models.Exercise:
+        # los nombres son únicos y la BD se comparte entre pruebas
+        exercise = models.Exercise(name=f"{muscle_group}-{uuid.uuid4().hex[:8]}", muscle_group=muscle_group)
+        db.add(exercise)
+        db.commit()
+        return exercise
+
+    return make
+
+
+@pytest.fixture
+def make_user(db):
+    from app.db import models
+
+    def make(**fields) -> models.User:
+        user = models.User(**{"name": "Test", **fields})
+        db.add(user)
+        db.commit()
+        return user
+
+    return make
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user(goal="fuerza", experience_level="intermedio", weight_kg=80)
@@ -0,0 +1,35 @@
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db import bootstrap, models
+
+
+def _counts(engine):
+    with engine.connect() as conn:
+        return {
+            model.__tablename__: conn.execute(select(func.count()).select_from(model)).scalar()
+            for model in (models.User, models.Exercise, models.WorkoutSession, models.WorkoutSet)
+        }
+
+
+def test_bootstrap_twice_is_idempotent(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    monkeypatch.setattr("app.db.session.engine", engine)
+    monkeypatch.setattr("app.db.session.SessionLocal", sessionmaker(bind=engine, autoflush=False))
+    monkeypatch.setattr(settings, "BOOTSTRAP_LOCK_FILE", str(tmp_path / "bootstrap.lock"))
+    monkeypatch.setattr(bootstrap, "_done", False)
+
+    first = bootstrap.bootstrap_database(seed_demo=True)
+    after_first = _counts(engine)
+    # dentro del mismo proceso la segunda llamada ni toma el lock
+    assert bootstrap.bootstrap_database(seed_demo=True) == {"skipped": True}
+
+    # otro proceso (o un reinicio) sobre la misma BD: no duplica ni crea índices de nuevo
+    monkeypatch.setattr(bootstrap, "_done", False)
+    second = bootstrap.bootstrap_database(seed_demo=True)
+
+    assert first["skipped"] is False and first["indexes_created"] == []
+    assert after_first["users"] == 1 and after_first["workout_sets"] > 0
+    assert second["skipped"] is False and second["indexes_created"] == []
+    assert _counts(engine) == after_first
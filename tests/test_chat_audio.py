@@ -0,0 +1,24 @@
+import os
+
+from app.core.config import settings
+
+
+def test_evicted_audio_is_synthesized_again(run_app, user):
+    async def test(client):
+        reply = await client.post("/chat/general", json={"user_id": user.id, "text": "¿cuánto descanso entre series?"})
+        assert reply.status_code == 200
+        message_id = reply.json()["message"]["id"]
+
+        ready = (await client.get(f"/chat/messages/{message_id}/audio", params={"wait": 5})).json()
+        assert ready["status"] == "ready"
+        path = os.path.join(settings.MEDIA_DIR, os.path.basename(ready["audio_url"]))
+        assert os.path.exists(path)
+
+        # lo que hace el LRU del caché de audio al desalojar
+        os.remove(path)
+
+        again = (await client.get(f"/chat/messages/{message_id}/audio", params={"wait": 5})).json()
+        assert again["status"] == "ready"
+        assert os.path.exists(os.path.join(settings.MEDIA_DIR, os.path.basename(again["audio_url"])))
+
+    run_app(test)
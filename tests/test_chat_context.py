@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.db import models
+from app.db.models import ChatType
+from app.services.chat_context import build_chat_context
+
+
+def _add_messages(db, user, count, start=0, session=None):
+    base = datetime(2026, 1, 1)
+    chat_type = ChatType.SESSION if session is not None else ChatType.GENERAL
+    for i in range(start, start + count):
+        db.add(
+            models.ChatMessage(
+                user_id=user.id,
+                session_id=session.id if session is not None else None,
+                chat_type=chat_type,
+                role="user" if i % 2 == 0 else "arnold",
+                text=f"mensaje {i}",
+                timestamp=base + timedelta(minutes=i),
+            )
+        )
+    db.commit()
+
+
+def test_messages_past_the_window_are_summarized(db, user):
+    # 40 mensajes cortos: todos entran en el presupuesto, los 10 primeros quedan fuera de la ventana
+    _add_messages(db, user, 40)
+
+    context = build_chat_context(db, user, ChatType.GENERAL)
+
+    system = context[0]["content"]
+    assert [m["content"] for m in context[1:]] == [f"mensaje {i}" for i in range(10, 40)]
+    for i in range(10):
+        assert f"mensaje {i}\n" in system + "\n"
+
+    # el siguiente request solo pliega lo que acaba de salir de la ventana
+    _add_messages(db, user, 1, start=40)
+    context = build_chat_context(db, user, ChatType.GENERAL)
+    assert "Arnold: mensaje 9\nUsuario: mensaje 10" in context[0]["content"]
+    assert context[1]["content"] == "mensaje 11"
+
+
+def test_summary_respects_its_token_budget(db, user, monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_CONTEXT_MAX_MESSAGES", 5)
+    _add_messages(db, user, 500)
+
+    system = build_chat_context(db, user, ChatType.GENERAL)[0]["content"]
+    summary = system.split("Resumen de la conversación anterior:\n", 1)[1]
+
+    # se quedan las líneas más recientes, hasta justo antes de la ventana
+    assert summary.endswith("mensaje 494")
+    assert len(summary) // 4 <= settings.CHAT_SUMMARY_MAX_TOKENS
+
+
+def test_foreign_session_is_rejected(db, make_user):
+    owner, other = make_user(name="Dueño"), make_user(name="Otro")
+    session = models.WorkoutSession(user_id=owner.id, status=models.SessionStatus.IN_PROGRESS)
+    db.add(session)
+    db.commit()
+    _add_messages(db, owner, 3, session=session)
+
+    with pytest.raises(ValueError):
+        build_chat_context(db, other, ChatType.SESSION, session)
+
+
+def test_session_chat_with_foreign_session_is_404(run_app, db, make_user):
+    owner, other = make_user(name="Dueño"), make_user(name="Otro")
+    session = models.WorkoutSession(user_id=owner.id, status=models.SessionStatus.IN_PROGRESS)
+    db.add(session)
+    db.commit()
+    _add_messages(db, owner, 2, session=session)
+
+    async def test(client):
+        payload = {"user_id": other.id, "session_id": session.id, "text": "¿cómo voy?"}
+        assert (await client.post("/chat/session", json=payload)).status_code == 404
+        assert (await client.post("/chat/session/stream", json=payload)).status_code == 404
+
+        payload["user_id"] = owner.id
+        assert (await client.post("/chat/session", json=payload)).status_code == 200
+
+    run_app(test)
+
+    # el intento ajeno no dejó mensajes en la sesión
+    assert db.query(models.ChatMessage).filter(models.ChatMessage.session_id == session.id).count() == 4
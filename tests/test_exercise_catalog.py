@@ -0,0 +1,17 @@
+from app.services.exercise_catalog import ExerciseCatalog
+from app.services.shared_state import SQLiteSharedState
+
+
+def test_catalog_change_reaches_other_workers(tmp_path, db, make_exercise):
+    state_path = str(tmp_path / "state.db")
+    seeder, other = (ExerciseCatalog(versions=SQLiteSharedState(state_path, "exercise_catalog", 4)) for _ in range(2))
+    seeder.reload(db)
+    other.reload(db)
+
+    exercise = make_exercise("calves")
+    seeder.changed(db)
+
+    # sin pasar por el read-through por id: by_muscle_group no consulta la BD
+    assert [ex.id for ex in other.by_muscle_group(db, "calves")] == [exercise.id]
+    assert other.stats()["stale_reloads"] == 1
+    assert other.stats()["version"] == seeder.stats()["version"] == 1
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.core.config import settings
+from app.services import llm
+
+
+class _StubOpenAIHandler(BaseHTTPRequestHandler):
+    """
+    Servidor compatible con /v1/chat/completions: responde lo mismo que recibió como último mensaje.
+    """
+
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests.append({"path": self.path, "auth": self.headers.get("Authorization"), "body": body})
+        answer = f"eco: {body['messages'][-1]['content']}"
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for word in answer.split(" "):
+                chunk = {
+                    "id": "stub",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        payload = json.dumps({
+            "id": "stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_llm_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubOpenAIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _StubOpenAIHandler.requests = []
+
+    monkeypatch.setattr(settings, "LLM_BACKEND", "openai")
+    monkeypatch.setattr(settings, "LLM_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "LLM_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(llm, "_backend", None)
+    monkeypatch.setattr(llm, "_client", None)
+    monkeypatch.setattr(llm, "_semaphore", None)
+    try:
+        yield _StubOpenAIHandler.requests
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_generate_response_goes_to_llm_base_url(stub_llm_server):
+    async def run():
+        try:
+            return await llm.generate_arnold_response([{"role": "user", "content": "¿qué entreno hoy?"}])
+        finally:
+            await llm.close_llm_client()
+
+    assert asyncio.run(run()) == "eco: ¿qué entreno hoy?"
+    assert len(stub_llm_server) == 1
+    request = stub_llm_server[0]
+    assert request["path"] == "/v1/chat/completions"
+    assert request["auth"] == "Bearer test-key"
+    assert request["body"]["model"] == settings.LLM_MODEL
+    assert request["body"]["messages"][0]["role"] == "system"
+
+
+def test_stream_response_from_llm_base_url(stub_llm_server):
+    async def run():
+        try:
+            return [t async for t in llm.stream_arnold_response([{"role": "user", "content": "hola coach"}])]
+        finally:
+            await llm.close_llm_client()
+
+    tokens = asyncio.run(run())
+    assert "".join(tokens).strip() == "eco: hola coach"
+    assert stub_llm_server[0]["body"]["stream"] is True
+
+
+def test_client_is_shared_until_closed(stub_llm_server):
+    async def run():
+        first = llm.get_llm_client()
+        assert llm.get_llm_client() is first
+        await llm.close_llm_client()
+        assert llm._client is None
+
+    asyncio.run(run())
+
+
+def test_app_starts_without_llm_api_key(monkeypatch):
+    from app.main import app
+
+    monkeypatch.setattr(settings, "LLM_BACKEND", "openai")
+    monkeypatch.setattr(settings, "LLM_API_KEY", None)
+    monkeypatch.setattr(llm, "_client", None)
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            # sin clave el cliente se crea en la primera llamada, no al arrancar
+            assert llm._client is None
+
+    asyncio.run(run())
@@ -0,0 +1,97 @@
+import time
+
+from app.services.plan_cache import PlanCache, plan_cache
+from app.services.shared_state import InMemorySharedState
+
+
+def _counts():
+    stats = plan_cache.stats()
+    return stats["hits"], stats["misses"]
+
+
+def _plan(session):
+    return [(s["exercise_id"], s["set_number"], s["target_reps"]) for s in session["sets"]]
+
+
+async def _auto(client, user):
+    response = await client.post("/sessions/auto", params={"user_id": user.id})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_repeated_auto_sessions_are_served_from_the_cache(run_app, user, make_exercise):
+    make_exercise("legs")
+    make_exercise("chest")
+
+    async def test(client):
+        hits, misses = _counts()
+        first = await _auto(client, user)
+        second = await _auto(client, user)
+        assert _counts() == (hits + 1, misses + 1)
+        return first, second
+
+    first, second = run_app(test)
+
+    # mismo plan, sesiones y sets distintos
+    assert first["id"] != second["id"]
+    assert _plan(first) == _plan(second)
+
+
+def test_creating_a_session_keeps_the_plan_and_finishing_it_invalidates(run_app, user, make_exercise):
+    squat = make_exercise("legs")
+
+    async def test(client):
+        await _auto(client, user)
+        hits, misses = _counts()
+
+        # una sesión creada (sin completar) no cambia el historial del planner
+        manual = {
+            "user_id": user.id,
+            "sets": [{"exercise_id": squat.id, "exercise_order": 1, "set_number": 1, "target_reps": 5}],
+        }
+        created = (await client.post("/sessions/", json=manual)).json()
+        await _auto(client, user)
+        assert _counts() == (hits + 1, misses)
+
+        # completarla sí: el siguiente plan se vuelve a generar
+        invalidations = plan_cache.stats()["invalidations"]
+        await client.post(f"/sessions/{created['id']}/finish")
+        assert plan_cache.stats()["invalidations"] == invalidations + 1
+        await _auto(client, user)
+        assert _counts() == (hits + 1, misses + 1)
+
+        # re-abrir la sesión completada también la saca del historial
+        await client.post(f"/sessions/{created['id']}/start")
+        await _auto(client, user)
+        assert _counts() == (hits + 1, misses + 2)
+
+    run_app(test)
+
+
+def test_entries_expire_with_the_ttl(db, user, monkeypatch):
+    cache = PlanCache(InMemorySharedState(10), ttl_seconds=0.05)
+    generated = []
+    monkeypatch.setattr(
+        "app.services.plan_cache.generate_session_plan_for_today",
+        lambda db, user: generated.append(user.id) or [],
+    )
+
+    cache.get_plan(db, user)
+    cache.get_plan(db, user)
+    assert (cache.hits, cache.misses, len(generated)) == (1, 1, 1)
+
+    time.sleep(0.06)
+    cache.get_plan(db, user)
+    assert (cache.hits, cache.misses, len(generated)) == (1, 2, 2)
+
+
+def test_an_entry_from_another_day_is_a_miss(db, user, monkeypatch):
+    cache = PlanCache(InMemorySharedState(10), ttl_seconds=3600)
+    monkeypatch.setattr("app.services.plan_cache.generate_session_plan_for_today", lambda db, user: [])
+
+    monkeypatch.setattr(PlanCache, "_today", staticmethod(lambda: "2026-03-01"))
+    cache.get_plan(db, user)
+    monkeypatch.setattr(PlanCache, "_today", staticmethod(lambda: "2026-03-02"))
+    cache.get_plan(db, user)
+
+    assert (cache.hits, cache.misses) == (0, 2)
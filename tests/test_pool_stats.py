@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from app.db.pool_stats import PoolStats, instrumented_pool_class
+
+
+def _engine(tmp_path, stats, **options):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=instrumented_pool_class(QueuePool, stats),
+        **{"pool_size": 1, "max_overflow": 1, "pool_timeout": 0.05, **options},
+    )
+    stats.listen(engine)
+    return engine
+
+
+def test_checkouts_overflow_and_timeouts_are_counted(tmp_path):
+    stats = PoolStats("test")
+    engine = _engine(tmp_path, stats)
+
+    first, second = engine.connect(), engine.connect()
+    # pool_size + max_overflow ocupados: el tercero espera pool_timeout y falla
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    first.close()
+    second.close()
+
+    data = stats.stats()
+    assert (data["checkouts"], data["checkins"], data["connects"]) == (2, 2, 2)
+    assert (data["timeouts"], data["peak_checked_out"], data["peak_overflow"]) == (1, 2, 1)
+    assert data["wait_ms"]["max"] >= 50
+    # la conexión de overflow se cierra al devolverla; la otra vuelve al pool
+    assert (data["closes"], data["pool_size"], data["checked_out"], data["checked_in"]) == (1, 1, 0, 1)
+
+
+def test_counters_survive_dispose(tmp_path):
+    stats = PoolStats("test")
+    engine = _engine(tmp_path, stats)
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    engine.dispose()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    data = stats.stats()
+    assert (data["checkouts"], data["connects"], data["closes"]) == (2, 2, 1)
+    # el pool nuevo que creó dispose() es el que se reporta
+    assert (data["checked_out"], data["checked_in"]) == (0, 1)
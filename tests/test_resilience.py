@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientCaller,
+)
+
+
+class ProviderDown(Exception):
+    pass
+
+
+def _caller(**overrides) -> ResilientCaller:
+    options = {
+        "timeout_seconds": 1.0,
+        "max_retries": 0,
+        "is_retryable": lambda exc: isinstance(exc, ProviderDown),
+    }
+    options.update(overrides)
+    caller = ResilientCaller("test", **options)
+    caller.breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=0.05)
+    return caller
+
+
+def _open_until_half_open(breaker: CircuitBreaker) -> None:
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    time.sleep(breaker.reset_seconds + 0.01)
+
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=0.05)
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # una sola prueba a la vez
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+    assert breaker.transitions == {"closed->open": 1, "open->half_open": 1, "half_open->closed": 1}
+
+
+def test_failed_probe_opens_again():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=0.05)
+    _open_until_half_open(breaker)
+
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+
+def test_probe_cancelled_during_backoff_is_released(monkeypatch):
+    # backoff largo: la cancelación llega mientras duerme entre intentos
+    monkeypatch.setattr(settings, "RETRY_BACKOFF_BASE_SECONDS", 10.0)
+    monkeypatch.setattr(settings, "RETRY_BACKOFF_MAX_SECONDS", 10.0)
+    monkeypatch.setattr("app.services.resilience.random.uniform", lambda lo, hi: hi)
+    caller = _caller(max_retries=2)
+    _open_until_half_open(caller.breaker)
+
+    async def failing():
+        raise ProviderDown()
+
+    async def ok():
+        return "ok"
+
+    async def main():
+        probe = asyncio.ensure_future(caller.call(failing))
+        await asyncio.sleep(0.05)
+        assert caller.retries == 1
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        # la siguiente llamada puede ser la prueba y cierra el circuito
+        return await caller.call(ok)
+
+    assert asyncio.run(main()) == "ok"
+    assert caller.breaker.state == CLOSED
+
+
+def test_cancelled_call_does_not_release_someone_elses_probe():
+    caller = _caller()
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def slow():
+            gate.set()
+            await asyncio.sleep(10)
+
+        # llamada que entró con el circuito cerrado y sigue en curso
+        old = asyncio.ensure_future(caller.call(slow))
+        await gate.wait()
+        _open_until_half_open(caller.breaker)
+        assert caller.breaker.allow()  # la prueba de otra request
+        old.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await old
+
+    asyncio.run(main())
+    assert not caller.breaker.allow()
+
+
+def test_open_circuit_short_circuits():
+    caller = _caller()
+    caller.breaker.record_failure()
+    caller.breaker.record_failure()
+
+    async def never():
+        raise AssertionError("no debería llamarse")
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(caller.call(never))
+    assert caller.short_circuits == 1
+
+
+def test_timeout_before_hedge_cancels_the_first_call():
+    caller = _caller(timeout_seconds=0.05, hedge_after_seconds=1.0)
+    cancelled = []
+
+    async def hanging():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await caller.call(hanging)
+        await asyncio.sleep(0)
+        # antes de que asyncio.run cancele lo que quede colgado al cerrar el loop
+        return list(cancelled)
+
+    assert asyncio.run(main()) == [True]
+    assert caller.hedges == 0 and caller.timeouts == 1
+
+
+def test_hedge_wins_and_cancels_the_slow_call():
+    caller = _caller(timeout_seconds=1.0, hedge_after_seconds=0.02)
+    calls = []
+
+    async def first_slow():
+        calls.append(len(calls))
+        try:
+            await asyncio.sleep(10 if len(calls) == 1 else 0)
+        except asyncio.CancelledError:
+            calls.append("cancelada")
+            raise
+        return "rápida"
+
+    async def main():
+        result = await caller.call(first_slow)
+        await asyncio.sleep(0)
+        return result, "cancelada" in calls
+
+    assert asyncio.run(main()) == ("rápida", True)
+    assert caller.hedges == 1 and caller.hedge_wins == 1
@@ -0,0 +1,151 @@
+import pytest
+
+from app.api.routes import chat as chat_routes
+from app.services.response_cache import ResponseCache, is_standalone_question, response_cache
+from app.services.shared_state import InMemorySharedState
+
+
+def _cache(threshold=0.8, scope="user"):
+    return ResponseCache(
+        InMemorySharedState(100),
+        enabled=True,
+        max_entries=100,
+        ttl_seconds=60,
+        similarity_threshold=threshold,
+        scope=scope,
+    )
+
+
+@pytest.mark.parametrize(
+    "stored, asked",
+    [
+        ("¿Cuánta proteína debo comer al día si peso 70 kg?", "cuanta proteina debo comer al dia si peso 90 kg"),
+        ("¿Es bueno entrenar en ayunas?", "¿No es bueno entrenar en ayunas?"),
+        ("¿Puedo entrenar pierna con agujetas?", "¿Puedo entrenar pierna sin agujetas?"),
+    ],
+)
+def test_similar_questions_need_same_numbers_and_negations(stored, asked):
+    cache = _cache()
+    cache.store(1, "perfil", stored, "respuesta", 1.0)
+
+    assert cache.lookup(1, "perfil", asked) is None
+
+
+def test_similar_question_hits_below_threshold():
+    cache = _cache()
+    cache.store(1, "perfil", "¿Qué como antes de entrenar por la mañana?", "avena y fruta", 1.0)
+
+    assert cache.lookup(1, "perfil", "que como antes de entrenar por la manana") == "avena y fruta"
+    assert cache.lookup(1, "perfil", "¿Qué como antes de entrenar en la mañana?") == "avena y fruta"
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_default_threshold_is_exact_only():
+    cache = _cache(threshold=response_cache.similarity_threshold)
+    cache.store(1, "perfil", "¿Qué como antes de entrenar por la mañana?", "avena y fruta", 1.0)
+
+    assert cache.lookup(1, "perfil", "¿Qué como antes de entrenar en la mañana?") is None
+
+
+def test_user_scope_follows_the_profile():
+    cache = _cache()
+    cache.store(1, "peso: 70 kg", "¿cuánta proteína necesito?", "140 g", 1.0)
+
+    assert cache.lookup(1, "peso: 70 kg", "¿cuánta proteína necesito?") == "140 g"
+    assert cache.lookup(1, "peso: 90 kg", "¿cuánta proteína necesito?") is None
+    assert cache.lookup(2, "peso: 70 kg", "¿cuánta proteína necesito?") is None
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+
+    async def fake_generate(messages, mode="general"):
+        calls.append(messages)
+        return f"respuesta {len(calls)}"
+
+    monkeypatch.setattr(chat_routes, "generate_arnold_response", fake_generate)
+    return calls
+
+
+def test_follow_ups_are_not_cached(run_app, make_user, llm_calls):
+    first, second = make_user(name="Ana"), make_user(name="Beto")
+
+    async def test(client):
+        for user in (first, second):
+            await client.post("/chat/general", json={"user_id": user.id, "text": "¿Qué entreno hoy?"})
+        # "sí" con historial: mismo texto para los dos, respuestas que dependen de cada conversación
+        a = await client.post("/chat/general", json={"user_id": first.id, "text": "sí"})
+        b = await client.post("/chat/general", json={"user_id": first.id, "text": "sí"})
+        return a.json()["message"]["text"], b.json()["message"]["text"]
+
+    assert run_app(test) == ("respuesta 3", "respuesta 4")
+    assert len(llm_calls) == 4
+
+
+def test_global_scope_answers_without_profile(run_app, make_user, llm_calls, monkeypatch):
+    monkeypatch.setattr(response_cache, "scope", "global")
+    first, second = make_user(name="Carla", weight_kg=61), make_user(name="Dani", weight_kg=95)
+
+    async def test(client):
+        question = "¿Cuántos días a la semana entreno? ref-global"
+        a = await client.post("/chat/general", json={"user_id": first.id, "text": question})
+        b = await client.post("/chat/general", json={"user_id": second.id, "text": question})
+        return a.json()["message"]["text"], b.json()["message"]["text"]
+
+    assert run_app(test) == ("respuesta 1", "respuesta 1")
+    assert len(llm_calls) == 1
+    prompt = str(llm_calls[0])
+    assert "Carla" not in prompt and "61" not in prompt
+
+
+def test_stream_caches_under_the_question(run_app, make_user, monkeypatch):
+    monkeypatch.setattr(response_cache, "scope", "global")
+    first, second = make_user(name="Eva"), make_user(name="Fede")
+    question = "¿Cuánto calentar antes de sentadilla? ref-stream"
+
+    async def test(client):
+        async with client.stream("POST", "/chat/general/stream", json={"user_id": first.id, "text": question}) as r:
+            body = "".join([chunk async for chunk in r.aiter_text()])
+        assert "event: done" in body
+        hits = response_cache.exact_hits
+        await client.post("/chat/general", json={"user_id": second.id, "text": question})
+        return response_cache.exact_hits - hits
+
+    assert run_app(test) == 1
+
+
+def test_user_scope_serves_repeated_standalone_questions(run_app, make_user, llm_calls):
+    assert response_cache.scope == "user"
+    user = make_user(name="Gabi")
+    question = "¿Cuánta agua debo tomar al entrenar? ref-user"
+
+    async def test(client):
+        hits = response_cache.exact_hits
+        texts = []
+        for _ in range(3):
+            r = await client.post("/chat/general", json={"user_id": user.id, "text": question})
+            texts.append(r.json()["message"]["text"])
+        return texts, response_cache.exact_hits - hits
+
+    texts, hits = run_app(test)
+    # la segunda y la tercera llegan con historial y salen igual del caché
+    assert hits == 2
+    assert len(llm_calls) == 1
+    assert texts == ["respuesta 1"] * 3
+    # generada solo con el perfil y la pregunta: vale en cualquier punto de la conversación
+    assert [m["role"] for m in llm_calls[0]] == ["system", "user"]
+
+
+@pytest.mark.parametrize(
+    "question, standalone",
+    [
+        ("¿Cuánta proteína necesito al día?", True),
+        ("sí", False),
+        ("¿y mañana qué entreno?", False),
+        ("¿Por qué me recomiendas eso ahora?", False),
+        ("¿Puedo cambiar el ejercicio anterior por otro?", False),
+    ],
+)
+def test_standalone_questions(question, standalone):
+    assert is_standalone_question(question) is standalone
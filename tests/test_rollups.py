@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from app.db import models
+from app.services.rollups import ROLLUP_MODELS, get_best_e1rm_per_day, get_total_volume, rebuild_rollups
+
+
+def _completed_session(db, user, started_at, sets):
+    session = models.WorkoutSession(user_id=user.id, started_at=started_at, status=models.SessionStatus.COMPLETED)
+    session.sets = [
+        models.WorkoutSet(exercise_id=ex.id, set_number=i + 1, target_reps=reps, actual_reps=reps, actual_weight=weight)
+        for i, (ex, reps, weight) in enumerate(sets)
+    ]
+    db.add(session)
+    db.commit()
+    return session
+
+
+def test_strength_progression_reads_daily_bests(run_app, db, user, make_exercise):
+    squat, bench = make_exercise("legs"), make_exercise("chest")
+    # dos sesiones el mismo día: cuenta el mejor set del día
+    _completed_session(db, user, datetime(2026, 3, 2, 8), [(squat, 5, 100.0), (bench, 8, 60.0)])
+    _completed_session(db, user, datetime(2026, 3, 2, 19), [(squat, 3, 110.0)])
+    _completed_session(db, user, datetime(2026, 3, 9, 8), [(squat, 5, 105.0), (squat, 0, 200.0)])
+    # sin completar: no entra en los rollups
+    db.add(models.WorkoutSession(user_id=user.id, started_at=datetime(2026, 3, 10), status=models.SessionStatus.PLANNED))
+    db.commit()
+    rebuild_rollups(db, user_id=user.id)
+
+    async def test(client):
+        body = (await client.get(f"/users/{user.id}/strength-progression")).json()
+        by_exercise = {e["exercise_id"]: e for e in body["exercises"]}
+        assert [(p["date"], round(p["estimated_1rm"], 3)) for p in by_exercise[squat.id]["data"]] == [
+            ("2026-03-02", round(110.0 * (1 + 3 / 30), 3)),
+            ("2026-03-09", round(105.0 * (1 + 5 / 30), 3)),
+        ]
+        assert by_exercise[bench.id]["exercise_name"] == bench.name
+
+        filtered = (
+            await client.get(
+                f"/users/{user.id}/strength-progression",
+                params={"from": "2026-03-03", "to": "2026-03-09", "exercise_id": squat.id},
+            )
+        ).json()
+        assert [p["date"] for e in filtered["exercises"] for p in e["data"]] == ["2026-03-09"]
+
+    run_app(test)
+
+
+def test_migration_backfills_new_rollup_tables(tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.db.migrations import upgrade
+    from app.db.session import Base
+
+    # BD de antes de los rollups: historial completo, sin tablas de rollup
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with Session(bind=engine) as db:
+        user = models.User(name="Vieja")
+        squat = models.Exercise(name="Squat", muscle_group="legs")
+        db.add_all([user, squat])
+        db.commit()
+        _completed_session(db, user, datetime(2025, 11, 3, 8), [(squat, 5, 100.0)])
+        user_id = user.id
+    for model in reversed(ROLLUP_MODELS):
+        model.__table__.drop(bind=engine)
+
+    upgrade(engine)
+
+    with Session(bind=engine) as db:
+        assert get_total_volume(db, user_id) == 500.0
+        assert len(get_best_e1rm_per_day(db, user_id)) == 1
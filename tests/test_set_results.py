@@ -0,0 +1,121 @@
+import uuid
+
+from app.services.rollups import get_total_volume
+
+
+async def _create_session(client, user, exercise, sets=2):
+    payload = {
+        "user_id": user.id,
+        "sets": [
+            {"exercise_id": exercise.id, "exercise_order": 1, "set_number": n + 1, "target_reps": 5, "target_weight": 100.0}
+            for n in range(sets)
+        ],
+    }
+    response = await client.post("/sessions/", json=payload)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _op() -> str:
+    return uuid.uuid4().hex
+
+
+async def _stored_set(client, session_id, set_id):
+    sets = (await client.get(f"/sessions/{session_id}")).json()["sets"]
+    return next(s for s in sets if s["id"] == set_id)
+
+
+def test_replay_returns_the_original_result_without_writing(run_app, user, make_exercise):
+    squat = make_exercise("legs")
+
+    async def test(client):
+        session = await _create_session(client, user, squat)
+        set_id = session["sets"][0]["id"]
+        url = f"/sessions/{session['id']}/sets/results"
+        batch = {"operation_id": _op(), "results": [{"set_id": set_id, "actual_reps": 5, "actual_weight": 100.0}]}
+
+        first = (await client.post(url, json=batch)).json()
+        assert (first["updated_sets"], first["replayed"]) == (1, False)
+        replay = (await client.post(url, json=batch)).json()
+        assert (replay["updated_sets"], replay["replayed"]) == (1, True)
+
+        # el mismo operation_id con otro payload es un replay: no se aplica
+        changed = {**batch, "results": [{"set_id": set_id, "actual_reps": 1, "actual_weight": 20.0}]}
+        response = await client.post(url, json=changed)
+        assert response.status_code == 200 and response.json()["replayed"] is True
+        stored = await _stored_set(client, session["id"], set_id)
+        assert (stored["actual_reps"], stored["actual_weight"]) == (5, 100.0)
+
+    run_app(test)
+
+
+def test_operation_id_of_another_session_conflicts(run_app, user, make_exercise):
+    squat = make_exercise("legs")
+
+    async def test(client):
+        first, second = await _create_session(client, user, squat), await _create_session(client, user, squat)
+        operation_id = _op()
+        batch = {"operation_id": operation_id, "results": [{"set_id": first["sets"][0]["id"], "actual_reps": 5}]}
+        assert (await client.post(f"/sessions/{first['id']}/sets/results", json=batch)).status_code == 200
+
+        reused = {"operation_id": operation_id, "results": [{"set_id": second["sets"][0]["id"], "actual_reps": 5}]}
+        response = await client.post(f"/sessions/{second['id']}/sets/results", json=reused)
+        assert response.status_code == 409
+
+    run_app(test)
+
+
+def test_sets_of_another_session_are_rejected(run_app, user, make_exercise):
+    squat = make_exercise("legs")
+
+    async def test(client):
+        mine, other = await _create_session(client, user, squat), await _create_session(client, user, squat)
+        batch = {
+            "operation_id": _op(),
+            "results": [
+                {"set_id": mine["sets"][0]["id"], "actual_reps": 5},
+                {"set_id": other["sets"][0]["id"], "actual_reps": 5},
+            ],
+        }
+        response = await client.post(f"/sessions/{mine['id']}/sets/results", json=batch)
+        assert response.status_code == 422
+
+        # nada del lote se aplicó
+        stored = await _stored_set(client, mine["id"], mine["sets"][0]["id"])
+        assert stored["actual_reps"] is None
+
+        # repetir un set en el mismo lote también es un lote inválido
+        repeated = {"operation_id": _op(), "results": [{"set_id": mine["sets"][0]["id"]}] * 2}
+        assert (await client.post(f"/sessions/{mine['id']}/sets/results", json=repeated)).status_code == 422
+
+    run_app(test)
+
+
+def test_missing_session_returns_404(run_app):
+    async def test(client):
+        batch = {"operation_id": _op(), "results": [{"set_id": 1, "actual_reps": 5}]}
+        return (await client.post("/sessions/999999999/sets/results", json=batch)).status_code
+
+    assert run_app(test) == 404
+
+
+def test_results_on_a_completed_session_refresh_the_rollups(run_app, db, user, make_exercise):
+    squat = make_exercise("legs")
+
+    async def test(client):
+        session = await _create_session(client, user, squat)
+        set_ids = [s["id"] for s in session["sets"]]
+        url = f"/sessions/{session['id']}/sets/results"
+        first = {"operation_id": _op(), "results": [{"set_id": set_ids[0], "actual_reps": 5, "actual_weight": 100.0}]}
+        await client.post(url, json=first)
+        assert (await client.post(f"/sessions/{session['id']}/finish")).status_code == 200
+        # el set sin resultados cuenta con sus targets (5 x 100)
+        volume_at_finish = get_total_volume(db, user.id)
+
+        # resultados que llegan tarde (cliente offline) a una sesión ya completada
+        late = {"operation_id": _op(), "results": [{"set_id": set_ids[1], "actual_reps": 10, "actual_weight": 100.0}]}
+        assert (await client.post(url, json=late)).json()["replayed"] is False
+        db.expire_all()
+        return volume_at_finish, get_total_volume(db, user.id)
+
+    assert run_app(test) == (1000.0, 1500.0)
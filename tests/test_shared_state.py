@@ -0,0 +1,78 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from app.services.shared_state import SQLiteSharedState
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteSharedState(str(tmp_path / "state.db"), "test", 100)
+
+
+@pytest.fixture
+def locked(backend):
+    """
+    Otro "worker" con una transacción de escritura abierta sobre el archivo.
+    """
+    backend.set("k", "valor", 60)
+    other = sqlite3.connect(backend.path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    yield other
+    other.execute("ROLLBACK")
+    other.close()
+
+
+def test_event_loop_degrades_instead_of_waiting_for_the_lock(backend, locked):
+    async def on_loop():
+        t0 = time.perf_counter()
+        backend.set("otra", 1, 60)
+        results = (backend.add("lease", "yo", 60), backend.incr("n", 1, 60))
+        return results, time.perf_counter() - t0
+
+    (added, count), elapsed = asyncio.run(on_loop())
+
+    assert (added, count) == (False, None)
+    assert elapsed < 1.0
+    locked.execute("ROLLBACK")
+    locked.execute("BEGIN IMMEDIATE")
+    assert backend.get("otra") is None
+    # leer en WAL no necesita el lock de escritura
+    assert backend.get("k") == "valor"
+
+
+def test_async_methods_wait_for_the_lock_off_the_loop(backend, locked):
+    async def on_loop():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.3, locked.execute, "ROLLBACK")
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tick = asyncio.ensure_future(ticker())
+        count = await backend.aincr("n", 1, 60)
+        added = await backend.aadd("lease", "yo", 60)
+        tick.cancel()
+        return count, added, ticks
+
+    count, added, ticks = asyncio.run(on_loop())
+
+    locked.execute("BEGIN IMMEDIATE")
+    assert (count, added) == (1, True)
+    # el event loop siguió corriendo mientras se esperaba el lock
+    assert ticks >= 10
+
+
+def test_outside_the_event_loop_lock_errors_propagate(backend, locked, monkeypatch):
+    monkeypatch.setattr("app.services.shared_state._BLOCKING_TIMEOUT_SECONDS", 0.05)
+    # instancia nueva: la conexión del hilo se abre con el timeout parcheado
+    other_worker = SQLiteSharedState(backend.path, backend.namespace, 100)
+
+    with pytest.raises(sqlite3.OperationalError):
+        other_worker.incr("n", 1, 60)
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from app.services.shared_state import SQLiteSharedState
+from app.services.single_flight import SingleFlight, make_flight_key
+
+
+class ProviderDown(Exception):
+    pass
+
+
+def _counting(result, delay=0.05, calls=None):
+    calls = [] if calls is None else calls
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return fn, calls
+
+
+def test_identical_calls_share_one_execution():
+    flights = SingleFlight("test", max_in_flight=10)
+    fn, calls = _counting("respuesta")
+    other, other_calls = _counting("otra")
+
+    async def main():
+        return await asyncio.gather(
+            *(flights.do("k", fn) for _ in range(5)),
+            flights.do("otra-key", other),
+        )
+
+    results = asyncio.run(main())
+
+    assert results == ["respuesta"] * 5 + ["otra"]
+    assert (len(calls), len(other_calls)) == (1, 1)
+    assert flights.stats() == {"in_flight": 0, "max_in_flight": 10, "calls": 6, "coalesced": 4, "bypassed": 0}
+
+
+def test_the_exception_reaches_every_waiter():
+    flights = SingleFlight("test", max_in_flight=10)
+    error = ProviderDown("caído")
+    fn, calls = _counting(error)
+
+    async def main():
+        return await asyncio.gather(*(flights.do("k", fn) for _ in range(3)), return_exceptions=True)
+
+    assert asyncio.run(main()) == [error] * 3
+    assert len(calls) == 1
+
+
+def test_cancelling_the_initiator_does_not_cancel_the_call():
+    flights = SingleFlight("test", max_in_flight=10)
+    fn, calls = _counting("respuesta", delay=0.1)
+
+    async def main():
+        initiator = asyncio.ensure_future(flights.do("k", fn))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flights.do("k", fn))
+        await asyncio.sleep(0.01)
+        # el cliente que inició la llamada se desconecta
+        initiator.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await initiator
+        return await follower
+
+    assert asyncio.run(main()) == "respuesta"
+    assert len(calls) == 1
+
+
+def test_full_table_calls_directly():
+    flights = SingleFlight("test", max_in_flight=1)
+    fn, calls = _counting("respuesta")
+
+    async def main():
+        return await asyncio.gather(flights.do("a", fn), flights.do("b", fn), flights.do("a", fn))
+
+    assert asyncio.run(main()) == ["respuesta"] * 3
+    assert len(calls) == 2
+    assert (flights.coalesced, flights.bypassed) == (1, 1)
+
+
+def _two_workers(tmp_path):
+    # dos procesos con el mismo archivo de estado compartido
+    path = str(tmp_path / "state.db")
+    return (
+        SingleFlight("test", 10, shared=SQLiteSharedState(path, "flight_test", 100), lease_seconds=5),
+        SingleFlight("test", 10, shared=SQLiteSharedState(path, "flight_test", 100), lease_seconds=5),
+    )
+
+
+def test_other_worker_reads_the_published_result(tmp_path):
+    owner, waiter = _two_workers(tmp_path)
+    key = make_flight_key("pregunta", {"user": 1})
+    owner_fn, owner_calls = _counting({"texto": "respuesta"}, delay=0.2)
+    waiter_fn, waiter_calls = _counting({"texto": "no debería llamarse"})
+
+    async def main():
+        first = asyncio.ensure_future(owner.do(key, owner_fn))
+        await asyncio.sleep(0.05)
+        return await asyncio.gather(first, waiter.do(key, waiter_fn))
+
+    assert asyncio.run(main()) == [{"texto": "respuesta"}] * 2
+    assert (len(owner_calls), len(waiter_calls)) == (1, 0)
+    assert (waiter.remote_waits, waiter.remote_hits) == (1, 1)
+
+
+def test_waiter_calls_itself_when_the_lease_owner_fails(tmp_path):
+    owner, waiter = _two_workers(tmp_path)
+    owner_fn, _ = _counting(ProviderDown("caído"), delay=0.2)
+    waiter_fn, waiter_calls = _counting("respuesta propia")
+
+    async def main():
+        first = asyncio.ensure_future(owner.do("k", owner_fn))
+        await asyncio.sleep(0.05)
+        return await asyncio.gather(first, waiter.do("k", waiter_fn), return_exceptions=True)
+
+    failed, result = asyncio.run(main())
+
+    assert isinstance(failed, ProviderDown)
+    assert result == "respuesta propia"
+    assert len(waiter_calls) == 1
+    assert (waiter.remote_waits, waiter.remote_hits) == (1, 0)
@@ -0,0 +1,111 @@
+import json
+import os
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, text, update
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db import models
+from app.db.session import Base
+from app.db.sqlite import WriterRoutingSession, install_sqlite_pragmas, sqlite_pragmas
+
+_PRAGMAS = ("journal_mode", "synchronous", "cache_size", "mmap_size", "busy_timeout")
+
+# PRAGMAs leídos de cada engine de app.db.session con el modo de alta concurrencia activado
+_READ_PRAGMAS = """
+import asyncio, json
+from sqlalchemy import text
+from app.db import session
+
+PRAGMAS = %r
+
+def read(conn):
+    return {name: conn.execute(text(f"PRAGMA {name}")).scalar() for name in PRAGMAS}
+
+async def read_async(engine):
+    async with engine.connect() as conn:
+        return await conn.run_sync(read)
+
+with session.engine.connect() as conn:
+    sync_values = read(conn)
+with session.writer_engine.connect() as conn:
+    writer_values = read(conn)
+
+print(json.dumps({
+    "single_writer": session.SQLITE_SINGLE_WRITER,
+    "sync": sync_values,
+    "sync_writer": writer_values,
+    "async": asyncio.run(read_async(session.async_engine)),
+    "async_writer": asyncio.run(read_async(session.async_writer_engine)),
+}))
+"""
+
+
+def _read(conn):
+    return {name: conn.execute(text(f"PRAGMA {name}")).scalar() for name in _PRAGMAS}
+
+
+def test_install_sqlite_pragmas_applies_them_on_every_connection(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SQLITE_SYNCHRONOUS", "FULL")
+    monkeypatch.setattr(settings, "SQLITE_CACHE_SIZE_KB", 2048)
+    monkeypatch.setattr(settings, "SQLITE_MMAP_SIZE_BYTES", 1024 * 1024)
+    monkeypatch.setattr(settings, "SQLITE_BUSY_TIMEOUT_MS", 1234)
+    engine = create_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    install_sqlite_pragmas(engine)
+
+    with engine.connect() as first, engine.connect() as second:
+        values = [_read(first), _read(second)]
+
+    # synchronous: 0=OFF, 1=NORMAL, 2=FULL
+    expected = {"journal_mode": "wal", "synchronous": 2, "cache_size": -2048, "mmap_size": 1024 * 1024, "busy_timeout": 1234}
+    assert values == [expected, expected]
+    assert sqlite_pragmas()["journal_mode"] == "WAL"
+
+
+def test_high_concurrency_flag_configures_every_engine(tmp_path):
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'arnold.db'}",
+        "SQLITE_HIGH_CONCURRENCY": "true",
+        "SQLITE_BUSY_TIMEOUT_MS": "4321",
+    }
+    env.pop("ASYNC_DATABASE_URL", None)
+    # las engines se crean al importar app.db.session: proceso aparte con el flag activado
+    out = subprocess.run(
+        [sys.executable, "-c", _READ_PRAGMAS % (_PRAGMAS,)],
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert result.pop("single_writer") is True
+    for name, values in result.items():
+        assert (values["journal_mode"], values["busy_timeout"]) == ("wal", 4321), name
+
+
+def test_writer_routing_session_moves_to_the_writer_after_the_first_write(tmp_path):
+    url = f"sqlite:///{tmp_path / 'routing.db'}"
+    reader, writer = create_engine(url), create_engine(url)
+    Base.metadata.create_all(bind=writer)
+    make_session = sessionmaker(bind=reader, class_=WriterRoutingSession, writer=writer)
+
+    with make_session() as db:
+        assert db.get_bind() is reader
+        db.add(models.User(name="Routing"))
+        db.flush()
+        # el resto de la transacción (lecturas incluidas) va por el escritor
+        assert db.get_bind() is writer
+        assert db.query(models.User).filter_by(name="Routing").count() == 1
+        db.commit()
+
+        assert db.get_bind() is reader
+        assert db.query(models.User).filter_by(name="Routing").count() == 1
+        db.execute(update(models.User).values(name="Routing2"))
+        assert db.get_bind() is writer
+        db.rollback()
+        assert db.get_bind() is reader
@@ -0,0 +1,86 @@
+import itertools
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db import models
+from app.services.planner import _get_least_trained_muscle_group
+from app.services.training_stats import compute_set_volume, get_muscle_group_volume, set_volume_expr
+
+# target_reps es NOT NULL; lo demás puede faltar (bodyweight = sin peso)
+ACTUAL_REPS = [None, 0, -3, 8]
+TARGET_REPS = [0, -2, 10]
+ACTUAL_WEIGHTS = [None, 0.0, -5.0, 42.5]
+TARGET_WEIGHTS = [None, 0.0, -10.0, 20.0]
+MUSCLE_GROUPS = ["back", "chest", "legs"]
+
+
+@pytest.fixture
+def edge_case_sets(db, user, make_exercise):
+    exercises = [make_exercise(group) for group in MUSCLE_GROUPS]
+    session = models.WorkoutSession(
+        user_id=user.id,
+        started_at=datetime.utcnow() - timedelta(days=1),
+        status=models.SessionStatus.COMPLETED,
+    )
+    combos = itertools.product(ACTUAL_REPS, TARGET_REPS, ACTUAL_WEIGHTS, TARGET_WEIGHTS)
+    session.sets = [
+        models.WorkoutSet(
+            exercise_id=exercises[i % len(exercises)].id,
+            set_number=i + 1,
+            actual_reps=actual_reps,
+            target_reps=target_reps,
+            actual_weight=actual_weight,
+            target_weight=target_weight,
+        )
+        for i, (actual_reps, target_reps, actual_weight, target_weight) in enumerate(combos)
+    ]
+    db.add(session)
+    db.commit()
+    return session.sets
+
+
+def test_set_volume_expr_matches_python(db, edge_case_sets):
+    ids = [s.id for s in edge_case_sets]
+    sql_volumes = dict(
+        db.query(models.WorkoutSet.id, set_volume_expr()).filter(models.WorkoutSet.id.in_(ids)).all()
+    )
+    for workout_set in edge_case_sets:
+        assert sql_volumes[workout_set.id] == pytest.approx(compute_set_volume(workout_set)), (
+            workout_set.actual_reps,
+            workout_set.target_reps,
+            workout_set.actual_weight,
+            workout_set.target_weight,
+        )
+
+
+def test_muscle_group_volume_matches_python(db, user, edge_case_sets):
+    expected = {}
+    for workout_set in edge_case_sets:
+        group = workout_set.exercise.muscle_group
+        expected[group] = expected.get(group, 0.0) + compute_set_volume(workout_set)
+
+    volumes = get_muscle_group_volume(db, user.id, since=datetime.utcnow() - timedelta(days=7))
+
+    assert volumes == pytest.approx(expected)
+    assert _get_least_trained_muscle_group(db, user.id) == min(expected, key=lambda g: (expected[g], g))
+
+
+def test_bodyweight_sets_count_reps(db, user, make_exercise):
+    pushups = make_exercise("chest")
+    session = models.WorkoutSession(
+        user_id=user.id,
+        started_at=datetime.utcnow() - timedelta(days=2),
+        status=models.SessionStatus.COMPLETED,
+    )
+    session.sets = [
+        models.WorkoutSet(exercise_id=pushups.id, set_number=1, target_reps=15, actual_reps=12),
+        models.WorkoutSet(exercise_id=pushups.id, set_number=2, target_reps=15),
+    ]
+    db.add(session)
+    db.commit()
+
+    volumes = get_muscle_group_volume(db, user.id, since=datetime.utcnow() - timedelta(days=7))
+
+    assert volumes == {"chest": pytest.approx(12.0 + 15.0)}
+    assert volumes["chest"] == pytest.approx(sum(compute_set_volume(s) for s in session.sets))
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import threading
+
+from app.services.shared_state import SQLiteSharedState
+from app.services.tts_cache import TTSCache, make_tts_cache_key
+
+
+def _workers(tmp_path, count, max_bytes):
+    # mismo MEDIA_DIR y mismo archivo de estado compartido, como N workers de uvicorn
+    state_path = str(tmp_path / "state.db")
+    return [
+        TTSCache(str(tmp_path / "media"), max_bytes, shared=SQLiteSharedState(state_path, "tts_cache", 16))
+        for _ in range(count)
+    ]
+
+
+def _disk_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def test_byte_cap_is_shared_by_all_workers(tmp_path):
+    workers = _workers(tmp_path, 3, max_bytes=10_000)
+
+    for i in range(30):
+        key = make_tts_cache_key(f"texto {i}", "voz", "modelo", {})
+        workers[i % len(workers)].store(key, b"x" * 1_000)
+
+    assert _disk_bytes(workers[0].directory) <= 10_000
+    assert workers[0].stats()["total_bytes"] == _disk_bytes(workers[0].directory)
+    assert sum(w.evictions for w in workers) == 20
+
+
+def test_audio_stored_twice_is_counted_once(tmp_path):
+    first, second = _workers(tmp_path, 2, max_bytes=10_000)
+    key = make_tts_cache_key("mismo texto", "voz", "modelo", {})
+
+    first.store(key, b"x" * 1_000)
+    second.store(key, b"x" * 1_000)
+
+    assert first.stats()["total_bytes"] == 1_000
+    assert second.lookup(key) == first.url_for(key)
+
+
+def test_async_methods_wait_for_the_cache_off_the_loop(tmp_path):
+    cache = TTSCache(str(tmp_path / "media"), 10_000)
+    key = make_tts_cache_key("texto", "voz", "modelo", {})
+
+    async def on_loop():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        # otro hilo (p.ej. una ruta sync) tiene el caché ocupado
+        cache._lock.acquire()
+        threading.Timer(0.2, cache._lock.release).start()
+        tick = asyncio.ensure_future(ticker())
+        url = await cache.astore(key, b"x" * 1_000)
+        found = await cache.alookup(key)
+        exists = await cache.ahas_url(url)
+        tick.cancel()
+        return url, found, exists, ticks
+
+    url, found, exists, ticks = asyncio.run(on_loop())
+
+    assert found == url and exists
+    # el event loop siguió corriendo mientras se esperaba el lock
+    assert ticks >= 10
@@ -0,0 +1,149 @@
+import asyncio
+import time
+import uuid
+
+from app.db import models
+from app.services.shared_state import InMemorySharedState
+from app.services.tts_jobs import TTS_FAILED, TTS_PENDING, TTS_READY, TTSJobQueue
+
+
+def _queue(status_backend=None, **overrides) -> TTSJobQueue:
+    options = {"workers": 1, "max_size": 10, "max_retries": 0, "retry_backoff_seconds": 0.0}
+    options.update(overrides)
+    return TTSJobQueue(status_backend or InMemorySharedState(100), **options)
+
+
+def _message(db, user) -> models.ChatMessage:
+    msg = models.ChatMessage(user_id=user.id, chat_type=models.ChatType.GENERAL, role="arnold", text="a darle")
+    db.add(msg)
+    db.commit()
+    return msg
+
+
+def test_full_queue_answers_unavailable(run_app, user, monkeypatch):
+    release = asyncio.Event()
+
+    async def stuck(text):
+        await release.wait()
+        return None
+
+    monkeypatch.setattr("app.services.tts_jobs.tts_generate_audio_url", stuck)
+    # un solo hueco en la cola y el worker ocupado con el primer job
+    queue = _queue(max_size=1)
+    monkeypatch.setattr("app.api.routes.chat.tts_jobs", queue)
+
+    async def test(client):
+        statuses = []
+        for _ in range(3):
+            # preguntas distintas: ni el caché de respuestas ni el de audio las sirven
+            question = f"¿cuántas series hago hoy? {uuid.uuid4().hex}"
+            reply = await client.post("/chat/general", json={"user_id": user.id, "text": question})
+            statuses.append(reply.json()["audio_status"])
+            await asyncio.sleep(0.01)
+        release.set()
+        await queue.stop()
+        return statuses
+
+    assert run_app(test) == [TTS_PENDING, TTS_PENDING, "unavailable"]
+    assert (queue.enqueued, queue.rejected) == (2, 1)
+
+
+def test_retries_with_growing_backoff_then_fails(db, user, monkeypatch):
+    calls = []
+
+    async def failing(text):
+        calls.append(time.perf_counter())
+        return None
+
+    monkeypatch.setattr("app.services.tts_jobs.tts_generate_audio_url", failing)
+    queue = _queue(max_retries=2, retry_backoff_seconds=0.03)
+    msg = _message(db, user)
+
+    async def main():
+        queue.enqueue(msg.id, msg.text)
+        job = await queue.wait(msg.id, timeout=5)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main())
+
+    assert (job.status, job.attempts, queue.failed) == (TTS_FAILED, 3, 1)
+    gaps = [b - a for a, b in zip(calls, calls[1:])]
+    # backoff lineal: 1x y 2x retry_backoff_seconds
+    assert gaps[0] >= 0.03 and gaps[1] >= 0.06
+    db.refresh(msg)
+    assert msg.audio_url is None
+
+
+def test_success_after_a_retry_writes_the_audio_url(db, user, monkeypatch):
+    results = iter([None, "/media/arnold.mp3"])
+
+    async def flaky(text):
+        return next(results)
+
+    monkeypatch.setattr("app.services.tts_jobs.tts_generate_audio_url", flaky)
+    queue = _queue(max_retries=1)
+    msg = _message(db, user)
+
+    async def main():
+        queue.enqueue(msg.id, msg.text)
+        job = await queue.wait(msg.id, timeout=5)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main())
+
+    assert (job.status, job.audio_url, job.attempts) == (TTS_READY, "/media/arnold.mp3", 2)
+    assert queue.stats()["succeeded"] == 1
+    db.refresh(msg)
+    assert msg.audio_url == "/media/arnold.mp3"
+
+
+def test_wait_on_a_job_of_another_worker_polls_the_shared_state(db, user, monkeypatch):
+    async def slow(text):
+        await asyncio.sleep(0.3)
+        return "/media/otro-worker.mp3"
+
+    monkeypatch.setattr("app.services.tts_jobs.tts_generate_audio_url", slow)
+    # dos "workers" de uvicorn: colas distintas, mismo estado compartido
+    shared = InMemorySharedState(100)
+    owner, other = _queue(shared), _queue(shared)
+    msg = _message(db, user)
+
+    async def main():
+        owner.enqueue(msg.id, msg.text)
+        pending = other.get(msg.id)
+        early = await other.wait(msg.id, timeout=0.05)
+        ready = await other.wait(msg.id, timeout=5)
+        unknown = await other.wait(msg.id + 1_000_000, timeout=0.05)
+        await owner.stop()
+        return pending, early, ready, unknown
+
+    pending, early, ready, unknown = asyncio.run(main())
+
+    assert pending.status == TTS_PENDING and not pending.done.is_set()
+    assert early.status == TTS_PENDING
+    assert (ready.status, ready.audio_url) == (TTS_READY, "/media/otro-worker.mp3")
+    assert unknown is None
+    # la cola del otro worker no tomó el job
+    assert other.stats()["enqueued"] == 0
+
+
+def test_stub_backend_audio_is_written_back(db, user):
+    queue = _queue()
+    msg = _message(db, user)
+    # texto nuevo: el stub sintetiza de verdad en vez de salir del caché de audio
+    msg.text = f"vamos con la sentadilla {uuid.uuid4().hex}"
+    db.commit()
+
+    async def main():
+        queue.enqueue(msg.id, msg.text)
+        job = await queue.wait(msg.id, timeout=5)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main())
+
+    assert job.status == TTS_READY and job.audio_url.startswith("/media/")
+    db.refresh(msg)
+    assert msg.audio_url == job.audio_url
@@ -0,0 +1,73 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from app.db import models
+from app.schemas.workout import WorkoutSetCreate
+from app.services.workout_sessions import create_session_with_sets
+
+
+def _sets(exercise, n):
+    return [
+        WorkoutSetCreate(exercise_id=exercise.id, exercise_order=1, set_number=i + 1, target_reps=8, target_weight=60.0)
+        for i in range(n)
+    ]
+
+
+@contextmanager
+def _count_statements():
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", count)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", count)
+
+
+def test_create_returns_the_sets_it_inserted(run_app, user, make_exercise):
+    squat = make_exercise("legs")
+
+    async def test(client):
+        payload = {"user_id": user.id, "notes": "pierna", "sets": [s.model_dump() for s in _sets(squat, 3)]}
+        created = (await client.post("/sessions/", json=payload)).json()
+        stored = (await client.get(f"/sessions/{created['id']}")).json()
+        return created, stored
+
+    created, stored = run_app(test)
+
+    assert [s["set_number"] for s in created["sets"]] == [1, 2, 3]
+    assert sorted(created["sets"], key=lambda s: s["id"]) == sorted(stored["sets"], key=lambda s: s["id"])
+    assert (created["status"], created["notes"]) == ("planned", "pierna")
+
+
+def test_statements_do_not_grow_with_the_number_of_sets(db, user, make_exercise):
+    squat = make_exercise("legs")
+
+    with _count_statements() as few:
+        create_session_with_sets(db, user.id, _sets(squat, 1))
+    with _count_statements() as many:
+        out = create_session_with_sets(db, user.id, _sets(squat, 12))
+
+    assert len(out.sets) == 12
+    assert len(many) == len(few)
+
+
+def test_a_failing_set_rolls_back_the_session(db, user, make_exercise):
+    squat = make_exercise("legs")
+    before = db.query(models.WorkoutSession).filter_by(user_id=user.id).count()
+    # target_reps es NOT NULL: el INSERT de los sets falla después de crear la sesión
+    broken = _sets(squat, 2) + [WorkoutSetCreate.model_construct(exercise_id=squat.id, exercise_order=1, set_number=3, target_reps=None)]
+
+    with pytest.raises(IntegrityError):
+        create_session_with_sets(db, user.id, broken)
+    db.rollback()
+
+    assert db.query(models.WorkoutSession).filter_by(user_id=user.id).count() == before
+    assert db.query(models.WorkoutSet).join(models.WorkoutSession).filter(models.WorkoutSession.user_id == user.id).count() == 0